@@ -0,0 +1,306 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from output_sink import read_jsonl
+from records import CATEGORIES, Book, QuoteTable
+
+PERCENTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+
+def _read_records(path):
+    if path.endswith('.jsonl'):
+        return list(read_jsonl(path))
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def load_books(source):
+    """
+    Loads scraped books into a typed DataFrame.
+
+    Args:
+        source: A path to books.jsonl (nombre_livres.py) or a .json file, a .parquet/.feather
+            dataset (book_details.py), a list of {'category', 'title', 'price'} dictionaries
+            or of Book records (see records.py), or a mapping of category name to
+            (title, price) tuples.
+
+    Returns:
+        pandas.DataFrame: Columns 'category' (categorical), 'title' and 'price' (float32).
+    """
+    if isinstance(source, pd.DataFrame):
+        frame = source
+    elif isinstance(source, dict):
+        frame = pd.DataFrame(
+            [(category, title, price) for category, books in source.items() for title, price in books],
+            columns=['category', 'title', 'price'],
+        )
+    elif isinstance(source, str) and source.endswith('.parquet'):
+        frame = pd.read_parquet(source, columns=['category', 'title', 'price'])
+    elif isinstance(source, str) and source.endswith('.feather'):
+        frame = pd.read_feather(source, columns=['category', 'title', 'price'])
+    else:
+        records = _read_records(source) if isinstance(source, str) else list(source)
+        if records and all(isinstance(record, Book) for record in records):
+            # The interned category IDs are the codes, so no category string is gathered;
+            # categories are then sorted like those of astype('category')
+            codes = np.fromiter((book.category_id for book in records), dtype=np.int32, count=len(records))
+            categories = _interned_categorical(codes, CATEGORIES.names).remove_unused_categories()
+            frame = pd.DataFrame({
+                'category': categories.reorder_categories(sorted(categories.categories)),
+                'title': [book.title for book in records],
+                'price': [book.price for book in records],
+            })
+        else:
+            frame = pd.DataFrame.from_records(records, columns=['category', 'title', 'price'])
+    return frame.astype({'category': 'category', 'title': 'string', 'price': 'float32'})
+
+def load_quotes(source):
+    """
+    Loads quotes into a typed quote table and a long table of (quote, tag) pairs.
+
+    Args:
+        source: A path to a quotes .json or .jsonl file, a QuoteTable (see records.py),
+            or a list of {'text', 'author', 'tags'} dictionaries. Files are read
+            through a QuoteTable, so a large corpus is never held as dictionaries.
+
+    Returns:
+        tuple: (quotes, tags). quotes has one row per quote with 'text' and a
+        categorical 'author'; tags has one row per tag occurrence with the
+        'quote_id' (row of quotes), a categorical 'author' and a categorical 'tag'.
+    """
+    if isinstance(source, str):
+        source = QuoteTable.load(source)
+    if isinstance(source, QuoteTable):
+        return _table_frames(source)
+    raw = pd.DataFrame.from_records(source, columns=['text', 'author', 'tags'])
+    quotes = pd.DataFrame({'text': raw['text'].astype('string'), 'author': _categorical(raw['author'])})
+
+    exploded = raw['tags'].explode().dropna()
+    rows = exploded.index.to_numpy(dtype=np.int32)
+    tags = pd.DataFrame({
+        'quote_id': rows,
+        'author': pd.Categorical.from_codes(quotes['author'].cat.codes.to_numpy()[rows],
+                                            categories=quotes['author'].cat.categories),
+        'tag': _categorical(exploded),
+    })
+    return quotes, tags
+
+def _table_frames(table):
+    # The interned IDs of the table are already category codes in order of first appearance
+    offsets = np.frombuffer(table.tag_offsets, dtype=np.int64)
+    rows = np.repeat(np.arange(len(table), dtype=np.int32), np.diff(offsets))
+    authors = _interned_categorical(np.frombuffer(table.author_ids, dtype=np.int32), table.authors.names)
+    quotes = pd.DataFrame({
+        'text': pd.array([table.text(index) for index in range(len(table))], dtype='string'),
+        'author': authors,
+    })
+    tags = pd.DataFrame({
+        'quote_id': rows,
+        'author': authors[rows],
+        'tag': _interned_categorical(np.frombuffer(table.tag_ids, dtype=np.int32), table.tags.names),
+    })
+    return quotes, tags
+
+def _interned_categorical(codes, names):
+    # A missing value (None) is interned like a name, but is not a category
+    if None in names:
+        missing = names.index(None)
+        names = names[:missing] + names[missing + 1:]
+        codes = np.where(codes == missing, -1, codes - (codes > missing))
+    return pd.Categorical.from_codes(codes, categories=names)
+
+def _categorical(values):
+    # Categories in order of first appearance, so that ties between equal counts
+    # are broken the way the dictionary loops they replace broke them
+    values = np.asarray(values, dtype=object)
+    return pd.Categorical(values, categories=pd.unique(values[pd.notna(values)]))
+
+def category_statistics(books, percentiles=PERCENTILES):
+    """
+    Computes per-category price statistics.
+
+    Args:
+        books (pandas.DataFrame): Frame returned by load_books.
+        percentiles (tuple): Quantiles to report, between 0 and 1.
+
+    Returns:
+        pandas.DataFrame: One row per category with count, mean, min, max and the
+        requested percentiles (p50 is the median); means are rounded to 2 decimals.
+        The summation order differs from calculate_statistics, so a mean that falls
+        on half a cent may round the other way; use calculate_statistics for the
+        figures the scrapers print.
+    """
+    grouped = books.groupby('category', observed=True)['price']
+    stats = grouped.agg(['count', 'min', 'max'])
+    # Prices are whole pence: rounding the float32 values back to cents restores the
+    # float64 prices, and averages are accumulated in float64, as float32 sums drift
+    means = books['price'].astype('float64').round(2).groupby(books['category'], observed=True).mean()
+    stats.insert(1, 'mean', means.round(2))
+    quantiles = grouped.quantile(list(percentiles)).unstack()
+    quantiles.columns = [f"p{round(q * 100)}" for q in quantiles.columns]
+    return stats.join(quantiles)
+
+def price_histogram(books, bins=10):
+    """
+    Counts the books per price bin.
+
+    Args:
+        books (pandas.DataFrame): Frame returned by load_books.
+        bins (int or sequence): Number of equal-width bins or the bin edges.
+
+    Returns:
+        pandas.Series: Book counts indexed by price interval.
+    """
+    return pd.cut(books['price'], bins=bins).value_counts(sort=False)
+
+def top_tags(tags, k=10):
+    """
+    Returns the k most frequent tags; equal counts keep their order of first appearance.
+
+    Args:
+        tags (pandas.DataFrame): Tag table returned by load_quotes.
+        k (int): Number of tags to return.
+
+    Returns:
+        pandas.Series: Occurrence counts of the top tags, most frequent first.
+    """
+    counts = pd.Series(np.bincount(tags['tag'].cat.codes, minlength=len(tags['tag'].cat.categories)),
+                       index=tags['tag'].cat.categories)
+    return counts.nlargest(k, keep='first')
+
+def author_tag_cooccurrence(tags):
+    """
+    Counts how often each author uses each tag.
+
+    Args:
+        tags (pandas.DataFrame): Tag table returned by load_quotes.
+
+    Returns:
+        pandas.DataFrame: Authors as rows, tags as columns, counts as values.
+    """
+    return tags.groupby(['author', 'tag'], observed=True).size().unstack(fill_value=0)
+
+def tag_cooccurrence(tags, top=None):
+    """
+    Counts the pairs of tags that appear on the same quote.
+
+    Args:
+        tags (pandas.DataFrame): Tag table returned by load_quotes.
+        top (int): If given, only the `top` most frequent pairs are returned.
+
+    Returns:
+        pandas.Series: Pair counts indexed by (tag_a, tag_b) with tag_a < tag_b.
+    """
+    pairs = tags[['quote_id', 'tag']].copy()
+    pairs['code'] = pairs['tag'].cat.codes
+    merged = pairs.merge(pairs, on='quote_id', suffixes=('_a', '_b'))
+    merged = merged[merged['code_a'] < merged['code_b']]
+    counts = merged.groupby(['tag_a', 'tag_b'], observed=True).size().sort_values(ascending=False)
+    return counts.head(top) if top else counts
+
+def synthetic_books(rows, categories=50, seed=0):
+    """
+    Generates a books frame of the given size for benchmarking.
+
+    Args:
+        rows (int): Number of books.
+        categories (int): Number of distinct categories.
+        seed (int): Random seed.
+
+    Returns:
+        pandas.DataFrame: A frame with the load_books columns and types.
+    """
+    rng = np.random.default_rng(seed)
+    names = [f"Category {i}" for i in range(categories)]
+    return pd.DataFrame({
+        'category': pd.Categorical.from_codes(rng.integers(0, categories, rows), categories=names),
+        'title': pd.array(np.char.add('Book ', np.arange(rows).astype(str)), dtype='string'),
+        'price': rng.uniform(10, 60, rows).round(2).astype('float32'),
+    })
+
+def synthetic_quotes(rows, authors=500, tag_vocabulary=1000, max_tags=5, seed=0):
+    """
+    Generates a quote tag table of the given size for benchmarking.
+
+    Args:
+        rows (int): Number of quotes.
+        authors (int): Number of distinct authors.
+        tag_vocabulary (int): Number of distinct tags.
+        max_tags (int): Maximum number of tags per quote.
+        seed (int): Random seed.
+
+    Returns:
+        pandas.DataFrame: A tag table with the load_quotes columns and types.
+    """
+    rng = np.random.default_rng(seed)
+    tags_per_quote = rng.integers(1, max_tags + 1, rows)
+    quote_ids = np.repeat(np.arange(rows, dtype=np.int32), tags_per_quote)
+    quote_authors = rng.integers(0, authors, rows)
+    # Zipf-like tag popularity, as on the real site
+    popularity = 1.0 / np.arange(1, tag_vocabulary + 1)
+    tag_codes = rng.choice(tag_vocabulary, size=len(quote_ids), p=popularity / popularity.sum())
+    return pd.DataFrame({
+        'quote_id': quote_ids,
+        'author': pd.Categorical.from_codes(quote_authors[quote_ids], categories=[f"Author {i}" for i in range(authors)]),
+        'tag': pd.Categorical.from_codes(tag_codes, categories=[f"tag{i}" for i in range(tag_vocabulary)]),
+    })
+
+def main():
+    """
+    Prints the statistics of scraped files, or times them on synthetic data.
+
+    Args:
+        None
+
+    Returns:
+        None
+    """
+    parser = argparse.ArgumentParser(description="Statistics of scraped books and quotes.")
+    parser.add_argument('--books', default=os.path.join('output', 'books.jsonl'),
+                        help="Books file (.jsonl, .parquet or .feather).")
+    parser.add_argument('--quotes', default=os.path.join('output', 'quotes.json'),
+                        help="Quotes file (.json or .jsonl).")
+    parser.add_argument('--synthetic', type=int, default=0,
+                        help="Time the statistics on this many synthetic rows instead of reading files.")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        timings = []
+        started = time.perf_counter()
+        books = synthetic_books(args.synthetic)
+        tags = synthetic_quotes(args.synthetic)
+        timings.append(('generate', time.perf_counter() - started))
+        for name, compute in [
+            ('category statistics', lambda: category_statistics(books)),
+            ('price histogram', lambda: price_histogram(books)),
+            ('top tags', lambda: top_tags(tags)),
+            ('author/tag co-occurrence', lambda: author_tag_cooccurrence(tags)),
+            ('tag co-occurrence', lambda: tag_cooccurrence(tags, top=10)),
+        ]:
+            started = time.perf_counter()
+            compute()
+            timings.append((name, time.perf_counter() - started))
+        print(f"{args.synthetic} books, {args.synthetic} quotes ({len(tags)} tag occurrences):")
+        for name, seconds in timings:
+            print(f" - {name}: {seconds:.3f}s")
+        return
+
+    if os.path.exists(args.books):
+        books = load_books(args.books)
+        print("Per-category price statistics:")
+        print(category_statistics(books).to_string())
+        print("\nPrice histogram:")
+        print(price_histogram(books).to_string())
+
+    if os.path.exists(args.quotes):
+        quotes, tags = load_quotes(args.quotes)
+        print(f"\n{len(quotes)} quotes by {quotes['author'].nunique()} authors. Top tags:")
+        print(top_tags(tags).to_string())
+        print("\nMost frequent tag pairs:")
+        print(tag_cooccurrence(tags, top=10).to_string())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from standin_server import StandinSite
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Entry points measured, as (name, script, arguments); {books} and {quotes} are the stand-in URLs
+SCENARIOS = [
+    ('nombre_livres', 'nombre_livres.py', ['--base-url', '{books}']),
+    ('nombre_livres_concurrent', 'nombre_livres.py',
+     ['--base-url', '{books}', '--workers', '4', '--page-workers', '2', '--max-per-host', '8']),
+    ('travel_category', 'travel_category.py', ['{books}catalogue/category/books/travel_2/index.html']),
+    ('nombre_livres_parse_workers', 'nombre_livres.py',
+     ['--base-url', '{books}', '--workers', '4', '--page-workers', '2', '--parse-workers', '4']),
+    ('book_details', 'book_details.py', ['--base-url', '{books}', '--workers', '8']),
+    ('book_details_parse_workers', 'book_details.py',
+     ['--base-url', '{books}', '--workers', '8', '--parse-workers', '4']),
+    ('crawl_workers_details', 'crawl_workers.py', ['--job', 'details', '--base-url', '{books}', '--workers', '4']),
+    ('question_2_to_6', 'question_2_to_6.py', ['--base-url', '{quotes}', '--workers', '4']),
+    ('question_2_to_6_api', 'question_2_to_6.py', ['--base-url', '{quotes}', '--source', 'api']),
+    ('quote_sources_js', 'quote_sources.py', ['--base-url', '{quotes}', '--source', 'js']),
+    ('random_question', 'random_question.py', ['--base-url', '{quotes}']),
+    ('random_question_concurrent', 'random_question.py',
+     ['--base-url', '{quotes}', '--strategy', 'concurrent', '--concurrency', '8']),
+    ('music_einstein', 'music_einstein.py', ['--base-url', '{quotes}']),
+    ('music_einstein_all', 'music_einstein.py', ['--base-url', '{quotes}', '--all', '--workers', '8']),
+    ('scrapy_engine', 'scrapy_engine.py', ['--books-url', '{books}', '--quotes-url', '{quotes}']),
+]
+
+# The scrape suite as four scripts run one after the other, and as one Scrapy process (see --suite)
+SUITE_SCRIPTS = ('nombre_livres', 'question_2_to_6', 'music_einstein', 'random_question')
+SUITE_ENGINE = 'scrapy_engine'
+
+# Metrics compared against a baseline, and whether a higher value is better
+METRICS = {'pages_per_s': True, 'cpu_s': False, 'peak_rss_mb': False}
+
+def run_scenario(site, script, arguments, env):
+    """
+    Runs one entry point against the stand-in in a fresh working directory.
+
+    Args:
+        site (StandinSite): The running stand-in.
+        script (str): The script file name.
+        arguments (list): Its command-line arguments, with {books}/{quotes} placeholders.
+        env (dict): Environment of the process.
+
+    Returns:
+        dict: Wall time, pages per second, p50/p99 service time of the stand-in,
+        CPU time and peak RSS of the process, and its exit status.
+    """
+    arguments = [argument.format(books=site.books_url, quotes=site.quotes_url) for argument in arguments]
+    with tempfile.TemporaryDirectory() as workdir:
+        log_path = os.path.join(workdir, 'run.log')
+        site.reset_stats()
+        started = time.perf_counter()
+        with open(log_path, 'w', encoding='utf-8') as log:
+            process = subprocess.Popen([sys.executable, os.path.join(REPO_DIR, script), *arguments],
+                                       cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+            # wait4 reports the resource usage of this child alone
+            _, status, usage = os.wait4(process.pid, 0)
+            process.returncode = os.waitstatus_to_exitcode(status)
+        wall = time.perf_counter() - started
+        stats = site.stats()
+        failure = None
+        if process.returncode != 0:
+            with open(log_path, encoding='utf-8') as log:
+                failure = log.read()[-2000:]
+
+    return {
+        'wall_s': wall,
+        'requests': stats['requests'],
+        'errors': stats['errors'],
+        'pages_per_s': stats['requests'] / wall,
+        'p50_ms': stats['p50'] * 1000,
+        'p99_ms': stats['p99'] * 1000,
+        'cpu_s': usage.ru_utime + usage.ru_stime,
+        'peak_rss_mb': usage.ru_maxrss / 1024,  # ru_maxrss is in KiB on Linux
+        'returncode': process.returncode,
+        'failure': failure,
+    }
+
+def compare(results, baseline, tolerance):
+    """
+    Lists the metrics that got worse than the baseline by more than the tolerance.
+
+    Args:
+        results (dict): Results of this run, by scenario.
+        baseline (dict): Results of a previous run, by scenario.
+        tolerance (float): Allowed relative change, 0.2 for 20%.
+
+    Returns:
+        list: Descriptions of the regressions.
+    """
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            before, after = previous[metric], result[metric]
+            worse = after < before * (1 - tolerance) if higher_is_better else after > before * (1 + tolerance)
+            if worse:
+                regressions.append(f"{name}: {metric} {before:.2f} -> {after:.2f}")
+    return regressions
+
+def main():
+    """
+    Runs the scenarios against a local stand-in of the websites and reports their performance.
+
+    Args:
+        None
+
+    Returns:
+        None
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the scrapers offline against a local stand-in.")
+    parser.add_argument('--scenario', action='append', choices=[name for name, _, _ in SCENARIOS],
+                        help="Scenario to run (repeatable); all by default.")
+    parser.add_argument('--latency', type=float, default=0.005, help="Delay of every response, in seconds.")
+    parser.add_argument('--jitter', type=float, default=0.002, help="Random variation of the delay, in seconds.")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of requests answered with a 503.")
+    parser.add_argument('--rate-limit', default='1000',
+                        help="SCRAPER_RATE_LIMIT of the scrapers, in requests per second per host.")
+    parser.add_argument('--suite', action='store_true',
+                        help="Compare the total wall time of the four scripts with the Scrapy engine running "
+                             "the same jobs in one process.")
+    parser.add_argument('--save', help="Write the results to this JSON file.")
+    parser.add_argument('--baseline', help="Compare with the results saved in this JSON file.")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="Relative change of a metric reported as a regression.")
+    args = parser.parse_args()
+
+    env = {
+        **os.environ,
+        'PYTHONPATH': REPO_DIR,
+        'SCRAPER_CACHE': '0',
+        'SCRAPER_RATE_LIMIT': args.rate_limit,
+    }
+    names = set(args.scenario or ())
+    if args.suite:
+        names.update((*SUITE_SCRIPTS, SUITE_ENGINE))
+    selected = [scenario for scenario in SCENARIOS if not names or scenario[0] in names]
+
+    results = {}
+    print(f"{'scenario':<28}{'requests':>9}{'pages/s':>10}{'p50 ms':>9}{'p99 ms':>9}"
+          f"{'CPU s':>8}{'RSS MB':>8}{'wall s':>8}")
+    with StandinSite(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate) as site:
+        for name, script, arguments in selected:
+            result = run_scenario(site, script, arguments, env)
+            results[name] = result
+            print(f"{name:<28}{result['requests']:>9}{result['pages_per_s']:>10.1f}{result['p50_ms']:>9.1f}"
+                  f"{result['p99_ms']:>9.1f}{result['cpu_s']:>8.2f}{result['peak_rss_mb']:>8.1f}{result['wall_s']:>8.2f}")
+            if result['failure']:
+                print(f"  exited with status {result['returncode']}:\n{result['failure']}")
+
+    if args.suite:
+        scripts_wall = sum(results[name]['wall_s'] for name in SUITE_SCRIPTS)
+        engine_wall = results[SUITE_ENGINE]['wall_s']
+        print(f"\nSuite: {scripts_wall:.2f}s for the four scripts in a row, {engine_wall:.2f}s for the Scrapy "
+              f"engine ({scripts_wall / engine_wall:.1f}x).")
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=4)
+
+    failed = [name for name, result in results.items() if result['returncode'] != 0]
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+    if failed or regressions:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
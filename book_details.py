@@ -0,0 +1,168 @@
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+
+import pandas as pd
+
+import metrics
+from extractors import extract_book_detail, extract_book_links, parse_html
+from http_client import create_session
+from nombre_livres import HostGate, extract_categories
+from pagination import crawl_pages
+from pipeline import ParserPool, parse_document
+
+# Column types of the dataset: compact numeric types and a categorical category column
+DATASET_DTYPES = {
+    'url': 'string',
+    'upc': 'string',
+    'title': 'string',
+    'category': 'category',
+    'price': 'float32',
+    'availability': 'int16',
+    'rating': 'Int8',
+    'num_reviews': 'Int16',
+    'description': 'string',
+}
+
+def scrape_product_urls(category_url, get, page_workers=1):
+    """
+    Collects the absolute product page URLs listed by a category, in page order.
+
+    Args:
+        category_url (str): The URL of the first page of the category.
+        get (callable): Function used to fetch a URL, a session's get.
+        page_workers (int): Number of pages of the category fetched at the same time.
+
+    Returns:
+        list: The product page URLs.
+    """
+    def fetch_page(url, page_number):
+        response = get(url)
+        if response.status_code != 200:
+            print(f"Failed to retrieve page at {url}, status code: {response.status_code}")
+            return None
+        return parse_html(response.content)
+
+    def extract_page(tree, page_number):
+        # Every page of a category sits in the same directory as its first page
+        return [urljoin(category_url, href) for href in extract_book_links(tree)] or None
+
+    return crawl_pages(category_url, fetch_page, extract_page, workers=page_workers)
+
+def fetch_book_details(product_urls, get, workers=8, parser_pool=None):
+    """
+    Fetches and parses product pages concurrently, each distinct URL once.
+
+    Args:
+        product_urls (iterable): Product page URLs, possibly with duplicates.
+        get (callable): Function used to fetch a URL, a session's get.
+        workers (int): Number of product pages fetched at the same time.
+        parser_pool (ParserPool): Optional pool of parser processes the pages are parsed in
+            while the fetching threads go on fetching (see pipeline.py).
+
+    Returns:
+        list: One dictionary of book fields (see extractors.extract_book_detail)
+        plus its 'url' per distinct product page that could be retrieved.
+    """
+    # The same book is listed under "Books" and under its own category
+    unique_urls = list(dict.fromkeys(product_urls))
+
+    def fetch(url):
+        response = get(url)
+        if response.status_code != 200:
+            print(f"Failed to retrieve product page at {url}, status code: {response.status_code}")
+            return None
+        if parser_pool:
+            return url, parser_pool.submit(parse_document, extract_book_detail, response.content)
+        return {'url': url, **extract_book_detail(parse_html(response.content))}
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        books = [book for book in executor.map(fetch, unique_urls) if book is not None]
+    if parser_pool:
+        books = [{'url': url, **future.result()} for url, future in books]
+    return books
+
+def books_to_dataframe(books):
+    """
+    Builds the typed dataset of the book details.
+
+    Args:
+        books (list): Dictionaries returned by fetch_book_details.
+
+    Returns:
+        pandas.DataFrame: One row per book with the DATASET_DTYPES column types.
+    """
+    frame = pd.DataFrame.from_records(books, columns=list(DATASET_DTYPES))
+    return frame.astype(DATASET_DTYPES)
+
+@metrics.timed('save')
+def save_dataset(frame, path):
+    """
+    Writes the dataset as Parquet or Feather, depending on the file extension.
+
+    Args:
+        frame (pandas.DataFrame): The dataset.
+        path (str): Output path ending in .parquet or .feather.
+
+    Returns:
+        None
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    if path.endswith('.feather'):
+        frame.to_feather(path)
+    else:
+        frame.to_parquet(path, index=False)
+
+def main():
+    """
+    Crawls every category listing, then the product page of every distinct book,
+    and writes the columnar dataset.
+
+    Args:
+        None
+
+    Returns:
+        None
+    """
+    parser = argparse.ArgumentParser(description="Crawl the product pages of books.toscrape.com.")
+    parser.add_argument('--workers', type=int, default=8,
+                        help="Number of listing and product pages fetched concurrently.")
+    parser.add_argument('--max-per-host', type=int, default=8,
+                        help="Maximum number of requests in flight per host.")
+    parser.add_argument('--output', default=os.path.join('output', 'books.parquet'),
+                        help="Output file, .parquet or .feather.")
+    parser.add_argument('--parse-workers', type=int, default=0,
+                        help="Number of parser processes (0 parses in the fetching threads).")
+    parser.add_argument('--base-url', default="https://books.toscrape.com/",
+                        help="Base URL of the books website.")
+    args = parser.parse_args()
+
+    base_url = args.base_url
+    session = create_session(pool_size=max(args.workers, 10))
+    gate = HostGate(session.get, max_per_host=args.max_per_host)
+    started = time.monotonic()
+
+    category_links = extract_categories(base_url, get=session.get)
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        listings = executor.map(lambda url: scrape_product_urls(url, gate.get), category_links.values())
+        product_urls = [url for listing in listings for url in listing]
+    print(f"\nFound {len(product_urls)} product links, {len(set(product_urls))} distinct.")
+
+    if args.parse_workers:
+        with ParserPool(args.parse_workers) as parser_pool:
+            books = fetch_book_details(product_urls, gate.get, workers=args.workers, parser_pool=parser_pool)
+    else:
+        books = fetch_book_details(product_urls, gate.get, workers=args.workers)
+    frame = books_to_dataframe(books)
+    save_dataset(frame, args.output)
+
+    elapsed = time.monotonic() - started
+    print(f"Saved {len(frame)} books to '{args.output}' ({os.path.getsize(args.output) / 1024:.1f} KiB) "
+          f"in {elapsed:.1f}s, {frame.memory_usage(deep=True).sum() / 1024:.1f} KiB in memory.")
+
+if __name__ == "__main__":
+    main()
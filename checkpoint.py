@@ -0,0 +1,171 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import metrics
+
+class Checkpoint:
+    """
+    Crawl state saved to disk so an interrupted crawl can resume where it stopped.
+
+    The state records every completed page with the records extracted from it
+    and the links needed to continue from it (next URL, page total), the
+    listings that were fully crawled, and the queue of URLs still to fetch.
+    It is written atomically (temporary file + rename) at most every
+    `interval` seconds, and on close.
+
+    With a `sink` (output_sink.JsonlSink), each save also records the size of
+    the output file. Records reach the sink inside recording(), so a save never
+    sees half a page; on resume the sink is cut back to the recorded size, which
+    drops the records of the pages completed after the last save, and those
+    pages are fetched and written again, exactly once.
+    """
+
+    def __init__(self, path, interval=5.0, sink=None):
+        self.path = path
+        self.interval = interval
+        self.sink = sink
+        self.pages = {}
+        self.completed = []
+        self.pending = {}
+        self._lock = threading.Lock()
+        # Held while a page is written to the sink and completed, and while the state is saved
+        self._page_lock = threading.RLock()
+        self._last_save = 0.0
+        self._dirty = False
+
+    @classmethod
+    def load(cls, path, interval=5.0, sink=None):
+        """
+        Reads a checkpoint written by a previous run.
+
+        Args:
+            path (str): Path of the checkpoint file.
+            interval (float): Minimum delay in seconds between two saves.
+            sink (JsonlSink): Optional output opened in append mode; it is cut back to the
+                size recorded with the checkpoint, or emptied if there is no checkpoint.
+
+        Returns:
+            Checkpoint: The saved state, or an empty checkpoint if the file does not exist.
+        """
+        checkpoint = cls(path, interval, sink)
+        sink_size = 0
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                state = json.load(f)
+            checkpoint.pages = state['pages']
+            checkpoint.completed = state['completed']
+            checkpoint.pending = dict.fromkeys(state['pending'])
+            sink_size = state.get('sink_size')
+        if sink and sink_size is not None:
+            sink.truncate(sink_size)
+        return checkpoint
+
+    @contextmanager
+    def recording(self):
+        """Context in which a page is written to the sink and completed, without a save in between."""
+        with self._page_lock:
+            yield
+
+    def page(self, url):
+        """
+        Returns the saved state of a completed page.
+
+        Args:
+            url (str): The URL of the page.
+
+        Returns:
+            dict or None: The page 'records', 'next_url' and 'total_pages', or None if the page was not completed.
+        """
+        with self._lock:
+            return self.pages.get(url)
+
+    def enqueue(self, urls):
+        """Adds URLs to the queue of pages still to fetch."""
+        with self._lock:
+            for url in urls:
+                if url not in self.pages:
+                    self.pending[url] = None
+            self._dirty = True
+
+    def complete_page(self, url, records, next_url=None, total_pages=None):
+        """
+        Records a page as completed, with the records extracted from it.
+
+        Args:
+            url (str): The URL of the page.
+            records (list): The JSON-serializable records of the page.
+            next_url (str): The URL of the following page, if any.
+            total_pages (int): The page total printed by the pager, if any.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self.pages[url] = {'records': records, 'next_url': next_url, 'total_pages': total_pages}
+            self.pending.pop(url, None)
+            self._dirty = True
+        self.save()
+
+    def is_completed(self, key):
+        with self._lock:
+            return key in self.completed
+
+    def complete(self, key):
+        """Records a whole listing (a category, for instance) as crawled."""
+        with self._lock:
+            if key not in self.completed:
+                self.completed.append(key)
+            self.pending.pop(key, None)
+            self._dirty = True
+        self.save()
+
+    def save(self, force=False):
+        """
+        Writes the state atomically if it changed and the save interval has elapsed.
+
+        Args:
+            force (bool): Write now regardless of the interval.
+
+        Returns:
+            None
+        """
+        with self._page_lock, self._lock:
+            if not self._dirty or (not force and time.monotonic() - self._last_save < self.interval):
+                return
+            with metrics.timer('checkpoint'):
+                self._write()
+
+    def _write(self):
+        # Called with both locks held, so the sink holds whole pages only
+        state = {
+            'pages': self.pages,
+            'completed': self.completed,
+            'pending': list(self.pending),
+        }
+        if self.sink:
+            state['sink_size'] = self.sink.sync()
+        state = json.dumps(state, ensure_ascii=False)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(state)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._last_save = time.monotonic()
+        self._dirty = False
+
+    def close(self):
+        self.save(force=True)
+
+    def discard(self):
+        """Removes the checkpoint file once the crawl has finished."""
+        with self._lock:
+            self._dirty = False
+            if os.path.exists(self.path):
+                os.remove(self.path)
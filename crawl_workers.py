@@ -0,0 +1,245 @@
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import threading
+import time
+from urllib.parse import urljoin
+
+import requests
+
+from extractors import extract_book_detail, extract_book_links, extract_books, extract_category_links, \
+    extract_quotes, parse_html, parse_price
+from frontier import Frontier
+from http_client import create_session
+from output_sink import JsonlSink
+from pagination import find_next_url, parse_page_count, plan_page_urls
+from rate_limiter import shared_limiter
+
+def listing_pages(tree, url):
+    # The other pages of a listing: all of them from the pager of the first page, else the
+    # "next" link; the frontier drops the pages already queued
+    next_url = find_next_url(tree, url)
+    if not next_url:
+        return []
+    total_pages = parse_page_count(tree)
+    return (plan_page_urls(next_url, total_pages) if total_pages else None) or [next_url]
+
+def listing_price(title, price_text):
+    # As in nombre_livres.py: an unreadable price is reported and counted as 0.0
+    price = parse_price(price_text)
+    if price is None:
+        print(f"Could not convert price: {price_text} for book: {title}")
+        return 0.0
+    return price
+
+def handle_index(tree, url, data):
+    """
+    Handles the home page of the books site: queues the first page of every category.
+
+    Args:
+        tree (lxml.html.HtmlElement): The parsed page.
+        url (str): Its URL.
+        data (dict): The context queued with the URL.
+
+    Returns:
+        tuple: (records, links), links being (url, kind, data) tuples to queue.
+    """
+    links = [(urljoin(url, href), 'listing', {'category': name})
+             for name, href in extract_category_links(tree) if name.lower() != 'books']
+    return [], links
+
+def handle_listing(tree, url, data):
+    """Extracts the books of a category page, and queues the other pages of the category."""
+    records = [{'category': data['category'], 'title': title, 'price': listing_price(title, price_text)}
+               for title, price_text in extract_books(tree)]
+    return records, [(page_url, 'listing', data) for page_url in listing_pages(tree, url)]
+
+def handle_product_listing(tree, url, data):
+    """Queues the product pages listed by a category page, and the other pages of the category."""
+    links = [(urljoin(url, href), 'product', None) for href in extract_book_links(tree)]
+    links += [(page_url, 'listing', data) for page_url in listing_pages(tree, url)]
+    return [], links
+
+def handle_product(tree, url, data):
+    """Extracts the fields of a product page."""
+    return [{'url': url, **extract_book_detail(tree)}], []
+
+def handle_quotes(tree, url, data):
+    """Extracts the quotes of a listing page, and queues the next page."""
+    next_url = find_next_url(tree, url)
+    return extract_quotes(tree), [(next_url, 'quotes', None)] if next_url else []
+
+# Crawl jobs: the default first URL and its kind, and the handler of every kind of URL
+JOBS = {
+    'books': ("https://books.toscrape.com/", 'index', {'index': handle_index, 'listing': handle_listing}),
+    'details': ("https://books.toscrape.com/", 'index',
+                {'index': handle_index, 'listing': handle_product_listing, 'product': handle_product}),
+    'quotes': ("https://quotes.toscrape.com/", 'quotes', {'quotes': handle_quotes}),
+}
+
+def queue_links(frontier, links):
+    # One transaction per kind and context rather than per URL
+    groups = {}
+    for url, kind, data in links:
+        groups.setdefault((kind, json.dumps(data)), []).append(url)
+    for (kind, data), urls in groups.items():
+        frontier.add(urls, kind, json.loads(data))
+
+def keep_leases(path, worker, held, lock, stop, lease_seconds):
+    # Renews the leases of the URLs the worker still holds, three times per lease period,
+    # from a connection of its own (SQLite connections stay in their thread)
+    with Frontier(path, lease_seconds=lease_seconds, bloom_capacity=1) as frontier:
+        while not stop.wait(lease_seconds / 3):
+            with lock:
+                urls = list(held)
+            if urls:
+                frontier.renew(worker, urls)
+
+def work(path, job, worker, batch=4, lease_seconds=60.0, idle=0.1, rate_share=1):
+    """
+    Runs one worker: leases URLs from the frontier, fetches and handles them, until the crawl is over.
+
+    The leases of the URLs not handled yet are renewed in the background, so a
+    slow fetch does not hand them to another worker; they only expire when the
+    worker dies.
+
+    Args:
+        path (str): Path of the frontier database.
+        job (str): Name of the crawl job (see JOBS).
+        worker (str): Identifier of the worker, unique across processes and machines.
+        batch (int): Number of URLs leased at a time.
+        lease_seconds (float): Time after which an unacknowledged URL goes to another worker.
+        idle (float): Pause in seconds when nothing is queued but other workers still hold leases.
+        rate_share (int): Number of workers sharing the per-host caps of SCRAPER_RATE_LIMIT.
+
+    Returns:
+        int: Number of pages the worker fetched.
+    """
+    handlers = JOBS[job][2]
+    fetched = 0
+    # Each worker process has its own limiter: together they keep to the caps
+    shared_limiter().share(rate_share)
+    held = set()
+    lock = threading.Lock()
+    stop = threading.Event()
+    renewer = threading.Thread(target=keep_leases, args=(path, worker, held, lock, stop, lease_seconds), daemon=True)
+    renewer.start()
+    try:
+        with create_session(pool_size=batch) as session, Frontier(path, lease_seconds=lease_seconds) as frontier:
+            while True:
+                leased = frontier.lease(worker, batch)
+                if not leased:
+                    # Pages still leased may queue more links: wait for them before stopping
+                    if frontier.finished():
+                        return fetched
+                    time.sleep(idle)
+                    continue
+                with lock:
+                    held.update(url for url, _, _ in leased)
+                for url, kind, data in leased:
+                    try:
+                        fetched += handle(session, frontier, worker, handlers, url, kind, data)
+                    finally:
+                        with lock:
+                            held.discard(url)
+    finally:
+        stop.set()
+        renewer.join()
+
+def handle(session, frontier, worker, handlers, url, kind, data):
+    """
+    Fetches and handles one leased URL, then acknowledges it, or gives it back if it could not be fetched.
+
+    Args:
+        session (requests.Session): The worker's session.
+        frontier (Frontier): The worker's connection to the frontier.
+        worker (str): Identifier of the worker.
+        handlers (dict): The handler of every kind of URL of the job.
+        url (str): The leased URL.
+        kind (str): Its kind.
+        data (dict): The context queued with it.
+
+    Returns:
+        int: 1 if a response was received, else 0.
+    """
+    try:
+        response = session.get(url)
+    except requests.RequestException as e:
+        print(f"[{worker}] Request failed: {e}")
+        frontier.fail(worker, url)
+        return 0
+    if response.status_code != 200:
+        print(f"[{worker}] Failed to retrieve {url}, status code: {response.status_code}")
+        frontier.fail(worker, url)
+        return 1
+    records, links = handlers[kind](parse_html(response.content), url, data)
+    # Links are queued before the ack, so the crawl cannot look finished in between
+    queue_links(frontier, links)
+    frontier.ack(worker, url, records)
+    return 1
+
+def main():
+    """
+    Crawls a site with N worker processes sharing one SQLite frontier, and exports the records.
+
+    Args:
+        None
+
+    Returns:
+        None
+    """
+    parser = argparse.ArgumentParser(description="Crawl with several worker processes sharing one frontier.")
+    parser.add_argument('--job', choices=sorted(JOBS), default='books', help="What to crawl.")
+    parser.add_argument('--workers', type=int, default=4, help="Number of worker processes on this machine.")
+    parser.add_argument('--frontier', help="Frontier database; output/<job>.frontier.db by default.")
+    parser.add_argument('--base-url', help="Base URL of the website; the live site by default.")
+    parser.add_argument('--resume', action='store_true',
+                        help="Continue the crawl of an existing frontier instead of starting over.")
+    parser.add_argument('--join', action='store_true',
+                        help="Only run workers against a frontier started elsewhere (another machine), "
+                             "without seeding or exporting it.")
+    parser.add_argument('--batch', type=int, default=4, help="Number of URLs a worker leases at a time.")
+    parser.add_argument('--lease', type=float, default=60.0,
+                        help="Seconds after which a URL leased by a silent worker goes to another one.")
+    args = parser.parse_args()
+
+    path = args.frontier or os.path.join('output', f'{args.job}.frontier.db')
+    if not args.join:
+        if not args.resume:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+        seed_url, seed_kind, _ = JOBS[args.job]
+        with Frontier(path) as frontier:
+            frontier.add([args.base_url or seed_url], seed_kind)
+
+    started = time.monotonic()
+    # Worker processes are started from a clean interpreter; each has its own session and connections
+    context = multiprocessing.get_context('spawn')
+    host = f"{socket.gethostname()}-{os.getpid()}"
+    processes = [
+        context.Process(target=work, args=(path, args.job, f"{host}-{index}", args.batch, args.lease),
+                        kwargs={'rate_share': args.workers})
+        for index in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    elapsed = time.monotonic() - started
+
+    with Frontier(path) as frontier:
+        counts = frontier.counts()
+        print(f"\n{counts['done']} pages done, {counts['failed']} failed, {counts['queued'] + counts['leased']} "
+              f"left, in {elapsed:.2f}s with {args.workers} workers.")
+        if not args.join:
+            output_path = os.path.join('output', f'{args.job}.frontier.jsonl')
+            with JsonlSink(output_path) as sink:
+                for record in frontier.records():
+                    sink.write(record)
+            print(f"{sink.count} records written to '{output_path}'.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+import hashlib
+import json
+import os
+import threading
+
+def digest(data, size=16):
+    """
+    Hashes bytes into a short hexadecimal fingerprint.
+
+    Args:
+        data (bytes): The content to hash.
+        size (int): Length of the digest in bytes.
+
+    Returns:
+        str: The hexadecimal digest.
+    """
+    return hashlib.blake2b(data, digest_size=size).hexdigest()
+
+def record_digest(record):
+    """
+    Fingerprints the content of a record, independently of its key order.
+
+    Args:
+        record: A JSON-serializable record.
+
+    Returns:
+        str: The hexadecimal digest.
+    """
+    return digest(json.dumps(record, sort_keys=True, ensure_ascii=False).encode('utf-8'), size=8)
+
+class FingerprintStore:
+    """
+    Fingerprints of the previous crawl, so that a scheduled re-crawl only emits what changed.
+
+    For every listing page the store keeps the hash of its bytes, the links
+    needed to continue the crawl from it (next URL, page total) and the keys of
+    its records; for every record, the hash of its content, under its listing
+    (the first URL of crawl_pages) and its `key`. A page whose bytes did not
+    change is neither parsed nor extracted again. The records of the pages that
+    did change are compared with their previous hashes and the added and
+    modified ones are written to `changelog`; finish() then reports the records
+    that disappeared and saves the new fingerprints atomically. `describe`
+    turns a record into the form written to the changelog, for records that are
+    not self-describing dictionaries.
+
+    Records are only reported as removed from listings that were crawled to the
+    end: after a failed page, the unseen records of the listing are kept.
+    """
+
+    def __init__(self, path, key, changelog=None, describe=None):
+        self.path = path
+        self.key = key
+        self.changelog = changelog
+        self.describe = describe
+        self.counts = {'added': 0, 'modified': 0, 'removed': 0, 'unchanged_pages': 0}
+        self._previous_pages = {}
+        self._previous_records = {}
+        self._pages = {}
+        self._records = {}
+        self._digests = {}
+        self._incomplete = set()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path, key, changelog=None, describe=None):
+        """
+        Reads the fingerprints saved by the previous run.
+
+        Args:
+            path (str): Path of the fingerprint file.
+            key (callable): key(record) returning the identifier of a record within its listing.
+            changelog (JsonlSink): Optional sink receiving the changes.
+            describe (callable): Optional describe(listing, record) returning the record
+                as written to the changelog; the record itself by default.
+
+        Returns:
+            FingerprintStore: The store, empty if the file does not exist (every record is then new).
+        """
+        store = cls(path, key, changelog, describe)
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                state = json.load(f)
+            store._previous_pages = state['pages']
+            store._previous_records = state['records']
+        return store
+
+    def unchanged(self, url, content):
+        """
+        Tells whether a page has the same bytes as in the previous run.
+
+        Args:
+            url (str): The URL of the page.
+            content (bytes): The raw page.
+
+        Returns:
+            bool: True if the page did not change; its records then count as seen.
+        """
+        page_digest = digest(content)
+        with self._lock:
+            previous = self._previous_pages.get(url)
+            if previous is None or previous[0] != page_digest:
+                self._digests[url] = page_digest
+                return False
+            self._pages[url] = previous
+            self.counts['unchanged_pages'] += 1
+        return True
+
+    def page(self, url):
+        """
+        Returns the links saved with an unchanged page.
+
+        Args:
+            url (str): The URL of the page.
+
+        Returns:
+            tuple: (next_url, total_pages).
+        """
+        with self._lock:
+            _, next_url, total_pages, _ = self._pages[url]
+        return next_url, total_pages
+
+    def complete_page(self, listing, url, records, next_url=None, total_pages=None, log=True):
+        """
+        Compares the records of a changed page with the previous run and logs the differences.
+
+        Args:
+            listing (str): The listing the page belongs to.
+            url (str): The URL of the page.
+            records (list): The records extracted from the page.
+            next_url (str): The URL of the following page, if any.
+            total_pages (int): The page total printed by the pager, if any.
+            log (bool): Whether to count and log the changes; False for a page restored
+                from a checkpoint, whose changes the interrupted run already logged.
+
+        Returns:
+            None
+        """
+        keys = []
+        with self._lock:
+            previous = self._previous_records.get(listing, {})
+            current = self._records.setdefault(listing, {})
+            for record in records:
+                key = self.key(record)
+                content_digest = record_digest(record)
+                keys.append(key)
+                if current.get(key) == content_digest:
+                    continue
+                current[key] = content_digest
+                before = previous.get(key)
+                if before == content_digest or not log:
+                    continue
+                change = 'added' if before is None else 'modified'
+                self.counts[change] += 1
+                if self.changelog:
+                    if self.describe:
+                        record = self.describe(listing, record)
+                    self.changelog.write({'change': change, 'listing': listing, 'key': key, 'record': record})
+            # A page restored from a checkpoint has no digest: it is extracted again next time
+            self._pages[url] = [self._digests.pop(url, None), next_url, total_pages, keys]
+
+    def keep_page(self, listing, url):
+        """Counts the records of an unchanged page as seen in its listing."""
+        with self._lock:
+            previous = self._previous_records.get(listing, {})
+            current = self._records.setdefault(listing, {})
+            for key in self._pages[url][3]:
+                if key in previous:
+                    current[key] = previous[key]
+
+    def fail(self, listing):
+        """Marks a listing whose crawl stopped on a failed page: none of its records is reported removed."""
+        with self._lock:
+            self._incomplete.add(listing)
+
+    def finish(self, complete=True):
+        """
+        Logs the removed records and saves the fingerprints of this run atomically.
+
+        Args:
+            complete (bool): Whether every listing was crawled in this run; if not (a resumed
+                crawl that skipped finished listings, for instance), listings not crawled keep
+                their records instead of having them reported as removed.
+
+        Returns:
+            dict: The number of added, modified and removed records, and of unchanged pages.
+        """
+        with self._lock:
+            for listing, previous in self._previous_records.items():
+                current = self._records.get(listing)
+                if listing in self._incomplete or (current is None and not complete):
+                    current = self._records.setdefault(listing, {})
+                    for key, content_digest in previous.items():
+                        current.setdefault(key, content_digest)
+                    continue
+                current = current or {}
+                for key in [key for key in previous if key not in current]:
+                    self.counts['removed'] += 1
+                    if self.changelog:
+                        self.changelog.write({'change': 'removed', 'listing': listing, 'key': key})
+
+            state = json.dumps({'pages': self._pages, 'records': self._records}, ensure_ascii=False)
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(state)
+            os.replace(tmp_path, self.path)
+            return dict(self.counts)
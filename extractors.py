@@ -0,0 +1,301 @@
+import json
+import re
+
+from lxml import etree, html
+
+import metrics
+
+# One parser shared by every page: the scraped sites are all served as UTF-8
+HTML_PARSER = html.HTMLParser(encoding='utf-8')
+
+def _has_class(name):
+    return f'contains(concat(" ", normalize-space(@class), " "), " {name} ")'
+
+# Selectors are compiled once at import time instead of walking the tree per call
+QUOTE_NODES = etree.XPath(f'//div[{_has_class("quote")}]')
+QUOTE_TEXT = etree.XPath(f'.//span[{_has_class("text")}]')
+QUOTE_CONTENT = etree.XPath(f'.//span[{_has_class("content")}]')
+QUOTE_AUTHOR = etree.XPath(f'.//small[{_has_class("author")}]')
+QUOTE_AUTHOR_SPAN = etree.XPath(f'.//span[{_has_class("author")}]')
+QUOTE_TAGS = etree.XPath(f'.//a[{_has_class("tag")}]')
+BOOK_NODES = etree.XPath(f'//article[{_has_class("product_pod")}]')
+BOOK_TITLE = etree.XPath('string(.//h3/a/@title)')
+BOOK_PRICE = etree.XPath(f'.//p[{_has_class("price_color")}]')
+BOOK_LINK = etree.XPath('string(.//h3/a/@href)')
+PRODUCT_TITLE = etree.XPath(f'string(//div[{_has_class("product_main")}]/h1)')
+PRODUCT_RATING = etree.XPath(f'string(//div[{_has_class("product_main")}]/p[{_has_class("star-rating")}]/@class)')
+PRODUCT_DESCRIPTION = etree.XPath('string(//div[@id = "product_description"]/following-sibling::p[1])')
+PRODUCT_TABLE_ROWS = etree.XPath('//table//tr')
+BREADCRUMB_LINKS = etree.XPath(f'//ul[{_has_class("breadcrumb")}]/li/a')
+PAGER_CURRENT = etree.XPath(f'string(//li[{_has_class("current")}])')
+NEXT_HREF = etree.XPath(f'string(//li[{_has_class("next")}]/a/@href)')
+CATEGORY_LINKS = etree.XPath(f'//div[{_has_class("side_categories")}]//a')
+INPUT_VALUE = etree.XPath('string(//input[@name = $name]/@value)')
+HAS_INPUT = etree.XPath('boolean(//input[@name = $name])')
+SELECT_OPTIONS = etree.XPath('//select[@name = $name]/option')
+SCRIPT_TEXTS = etree.XPath('//script/text()')
+
+# Start of the quote array inlined in the /js pages: `var data = [...];`
+INLINE_DATA = re.compile(r'\bvar\s+data\s*=\s*(?=\[)')
+JSON_DECODER = json.JSONDecoder()
+
+@metrics.timed('parse')
+def parse_html(content):
+    """
+    Parses a page from the raw response bytes.
+
+    Args:
+        content (bytes): The body of the response, as in response.content.
+
+    Returns:
+        lxml.html.HtmlElement: The root element of the document.
+    """
+    return html.document_fromstring(content, parser=HTML_PARSER)
+
+def node_text(node):
+    """
+    Joins the stripped text pieces of a node, like BeautifulSoup's get_text(strip=True).
+
+    Args:
+        node (lxml.html.HtmlElement): The element to read.
+
+    Returns:
+        str: The text of the node and its descendants.
+    """
+    return ''.join(piece.strip() for piece in node.itertext())
+
+def _first_text(node, *selectors):
+    for selector in selectors:
+        found = selector(node)
+        if found:
+            return node_text(found[0])
+    return None
+
+def extract_quote(node):
+    """
+    Extracts one quote from its div.quote element.
+
+    The text is read from span.text or span.content, and the author from
+    small.author or span.author; a missing field is returned as None.
+
+    Args:
+        node (lxml.html.HtmlElement): The div.quote element.
+
+    Returns:
+        dict: The quote text, author, and tags.
+    """
+    return {
+        'text': _first_text(node, QUOTE_TEXT, QUOTE_CONTENT),
+        'author': _first_text(node, QUOTE_AUTHOR, QUOTE_AUTHOR_SPAN),
+        'tags': [node_text(tag) for tag in QUOTE_TAGS(node)],
+    }
+
+@metrics.timed('extract')
+def extract_quotes(tree):
+    """
+    Extracts every quote of a page.
+
+    Args:
+        tree (lxml.html.HtmlElement): The parsed page.
+
+    Returns:
+        list: A list of dictionaries containing quote text, author, and tags.
+    """
+    return [extract_quote(node) for node in QUOTE_NODES(tree)]
+
+def api_quote(item):
+    """
+    Converts a quote of the JSON API (/api/quotes, and the data inlined in /js pages).
+
+    Args:
+        item (dict): The quote as served, with its author as an object with a 'name'.
+
+    Returns:
+        dict: The quote text, author, and tags, like extract_quote.
+    """
+    author = item.get('author')
+    return {
+        'text': item.get('text'),
+        'author': author.get('name') if isinstance(author, dict) else author,
+        'tags': list(item.get('tags') or []),
+    }
+
+@metrics.timed('extract')
+def extract_api_quotes(payload):
+    """
+    Extracts the quotes of one page of the JSON API (/api/quotes?page=N).
+
+    Args:
+        payload (dict): The decoded JSON response.
+
+    Returns:
+        tuple: (quotes, has_next), the quotes as dictionaries and whether a next page exists.
+    """
+    return [api_quote(item) for item in payload.get('quotes') or []], bool(payload.get('has_next'))
+
+@metrics.timed('extract')
+def extract_inline_quotes(tree):
+    """
+    Extracts the quotes of a JavaScript-rendered page (/js) from the data array of its script.
+
+    The page source holds no quote element, only the array the script renders
+    them from; it is read as JSON, without running the script.
+
+    Args:
+        tree (lxml.html.HtmlElement): The parsed page.
+
+    Returns:
+        list: A list of dictionaries containing quote text, author, and tags; empty if
+        the page has no data array.
+    """
+    for script in SCRIPT_TEXTS(tree):
+        match = INLINE_DATA.search(script)
+        if match:
+            try:
+                data, _ = JSON_DECODER.raw_decode(script, match.end())
+            except ValueError:
+                continue
+            return [api_quote(item) for item in data]
+    return []
+
+@metrics.timed('extract')
+def extract_first_quote(tree):
+    """
+    Extracts the first quote of a page, such as the one shown by /random.
+
+    Args:
+        tree (lxml.html.HtmlElement): The parsed page.
+
+    Returns:
+        dict or None: The quote text, author, and tags, or None if the page has no quote.
+    """
+    nodes = QUOTE_NODES(tree)
+    return extract_quote(nodes[0]) if nodes else None
+
+@metrics.timed('extract')
+def extract_books(tree):
+    """
+    Extracts the title and raw price text of every article.product_pod of a page.
+
+    Args:
+        tree (lxml.html.HtmlElement): The parsed category page.
+
+    Returns:
+        list: A list of (title, price_text) tuples.
+    """
+    books = []
+    for node in BOOK_NODES(tree):
+        price = BOOK_PRICE(node)
+        books.append((BOOK_TITLE(node), price[0].text_content().strip() if price else ''))
+    return books
+
+@metrics.timed('extract')
+def extract_book_links(tree):
+    """
+    Extracts the product page link of every article.product_pod of a page.
+
+    Args:
+        tree (lxml.html.HtmlElement): The parsed category page.
+
+    Returns:
+        list: The hrefs, relative to the page, in page order.
+    """
+    return [BOOK_LINK(node) for node in BOOK_NODES(tree)]
+
+RATINGS = {'One': 1, 'Two': 2, 'Three': 3, 'Four': 4, 'Five': 5}
+AVAILABLE_COUNT = re.compile(r'\((\d+) available\)')
+
+def parse_price(price_text):
+    """
+    Converts a price such as '£51.77' to a float.
+
+    Args:
+        price_text (str): The price as printed on the page.
+
+    Returns:
+        float or None: The price, or None if it cannot be read.
+    """
+    try:
+        return float(price_text.encode('ascii', 'ignore').decode('ascii').strip())
+    except ValueError:
+        return None
+
+@metrics.timed('extract')
+def extract_book_detail(tree):
+    """
+    Extracts the fields of a product page.
+
+    Args:
+        tree (lxml.html.HtmlElement): The parsed product page.
+
+    Returns:
+        dict: The title, UPC, category, price, available count, rating (1-5),
+        number of reviews and description of the book; missing fields are None.
+    """
+    table = {}
+    for row in PRODUCT_TABLE_ROWS(tree):
+        header, value = row.find('th'), row.find('td')
+        if header is not None and value is not None:
+            table[header.text_content().strip()] = value.text_content().strip()
+
+    breadcrumb = BREADCRUMB_LINKS(tree)
+    available = AVAILABLE_COUNT.search(table.get('Availability', ''))
+    reviews = table.get('Number of reviews', '')
+
+    return {
+        'title': PRODUCT_TITLE(tree).strip(),
+        'upc': table.get('UPC'),
+        # Home > Books > <category>
+        'category': breadcrumb[2].text_content().strip() if len(breadcrumb) > 2 else None,
+        'price': parse_price(table.get('Price (incl. tax)', '')),
+        'availability': int(available.group(1)) if available else 0,
+        'rating': RATINGS.get(PRODUCT_RATING(tree).split()[-1]) if PRODUCT_RATING(tree) else None,
+        'num_reviews': int(reviews) if reviews.isdigit() else None,
+        'description': PRODUCT_DESCRIPTION(tree).strip() or None,
+    }
+
+@metrics.timed('extract')
+def extract_category_links(tree):
+    """
+    Extracts the links of the category sidebar.
+
+    Args:
+        tree (lxml.html.HtmlElement): The parsed home page.
+
+    Returns:
+        list: A list of (category_name, href) tuples, in page order.
+    """
+    return [(link.text_content().strip(), link.get('href')) for link in CATEGORY_LINKS(tree)]
+
+def input_value(tree, name):
+    """
+    Reads the value of a named input field, such as a CSRF token or __VIEWSTATE.
+
+    Args:
+        tree (lxml.html.HtmlElement): The parsed page.
+        name (str): The name attribute of the input.
+
+    Returns:
+        str or None: The value of the field ('' if it has none), or None if the field is missing.
+    """
+    if not HAS_INPUT(tree, name=name):
+        return None
+    return INPUT_VALUE(tree, name=name)
+
+def select_options(tree, name):
+    """
+    Reads the choices of a named select field, skipping the '----------' placeholder.
+
+    Args:
+        tree (lxml.html.HtmlElement): The parsed page.
+        name (str): The name attribute of the select.
+
+    Returns:
+        list: The option values (their text when they have no value attribute), in page order.
+    """
+    values = []
+    for option in SELECT_OPTIONS(tree, name=name):
+        value = option.get('value', option.text_content()).strip()
+        if value and not value.startswith('---'):
+            values.append(value)
+    return values
@@ -0,0 +1,254 @@
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import time
+
+# States of a URL in the frontier
+QUEUED, LEASED, DONE, FAILED = 0, 1, 2, 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS urls (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL UNIQUE,
+    kind TEXT NOT NULL,
+    data TEXT,
+    state INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_until REAL,
+    attempts INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS urls_state ON urls (state, lease_until);
+CREATE TABLE IF NOT EXISTS records (
+    url_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (url_id, position)
+);
+"""
+
+class BloomFilter:
+    """
+    Compact probabilistic set of the URLs a worker has already seen.
+
+    It never misses a URL that was added, and wrongly reports an unseen URL with
+    probability `error_rate` once `capacity` URLs were added. A million URLs take
+    1.2 MB at 1%, against about 100 MB for a Python set of the strings.
+    """
+
+    def __init__(self, capacity=1_000_000, error_rate=0.01):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        # Double hashing: the k positions are derived from two 64-bit halves of one digest
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+class Frontier:
+    """
+    Crawl frontier shared by worker processes, possibly on several machines, through one SQLite file.
+
+    Every URL is stored once: the unique `url` column is the exact seen-set,
+    fronted in each process by a Bloom filter of the URLs that process already
+    saw, so the links found again and again (sidebars, pagers) cost a read
+    instead of a write. Workers lease URLs (lease), and acknowledge them with
+    the records they extracted (ack) or give them back (fail). Leasing and
+    acknowledging are atomic transactions, and an ack only counts while the
+    worker still holds the lease, so no page is processed twice. A worker that
+    is still busy with its URLs renews their leases (renew); a lease that is not
+    acknowledged or renewed within `lease_seconds` (a worker died) expires and
+    its URL is leased again, up to `max_attempts` times.
+
+    The database runs in WAL mode so readers do not block the writer; on
+    several machines, the file must live on storage with working locks.
+    """
+
+    def __init__(self, path, lease_seconds=60.0, max_attempts=3, bloom_capacity=1_000_000):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.seen = BloomFilter(bloom_capacity)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Transactions are explicit (BEGIN IMMEDIATE) so that a lease takes the write lock up front
+        self.db = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def add(self, urls, kind, data=None):
+        """
+        Queues the URLs that were never seen by any worker.
+
+        Args:
+            urls (iterable): Absolute URLs.
+            kind (str): What the URLs point to, which decides how they are handled.
+            data (dict): JSON-serializable context passed along with the URLs.
+
+        Returns:
+            int: Number of URLs queued.
+        """
+        urls = list(dict.fromkeys(urls))
+        maybe_seen = [url for url in urls if url in self.seen]
+        fresh = [url for url in urls if url not in self.seen]
+        if maybe_seen:
+            # A Bloom filter hit may be a false positive: the table has the final word
+            known = set()
+            for start in range(0, len(maybe_seen), 500):
+                chunk = maybe_seen[start:start + 500]
+                known.update(row[0] for row in self.db.execute(
+                    f"SELECT url FROM urls WHERE url IN ({','.join('?' * len(chunk))})", chunk))
+            fresh += [url for url in maybe_seen if url not in known]
+        added = 0
+        if fresh:
+            encoded = json.dumps(data) if data is not None else None
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                for url in fresh:
+                    added += self.db.execute("INSERT OR IGNORE INTO urls (url, kind, data) VALUES (?, ?, ?)",
+                                             (url, kind, encoded)).rowcount
+                self.db.execute("COMMIT")
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+        for url in urls:
+            self.seen.add(url)
+        return added
+
+    def lease(self, worker, count=1):
+        """
+        Leases queued URLs, and URLs whose lease expired, to a worker.
+
+        Args:
+            worker (str): Identifier of the worker.
+            count (int): Maximum number of URLs leased.
+
+        Returns:
+            list: (url, kind, data) tuples, in the order the URLs were queued; empty if
+            nothing is available right now.
+        """
+        now = time.time()
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            # Expired leases first, then the queue; both are read from the (state, lease_until) index
+            # A URL whose lease expired `max_attempts` times is given up
+            self.db.execute("UPDATE urls SET state = ?, worker = NULL, lease_until = NULL "
+                            "WHERE state = ? AND lease_until < ? AND attempts >= ?",
+                            (FAILED, LEASED, now, self.max_attempts))
+            rows = self.db.execute("SELECT id, url, kind, data FROM urls WHERE state = ? AND lease_until < ? "
+                                   "ORDER BY id LIMIT ?", (LEASED, now, count)).fetchall()
+            if len(rows) < count:
+                rows += self.db.execute("SELECT id, url, kind, data FROM urls WHERE state = ? ORDER BY id LIMIT ?",
+                                        (QUEUED, count - len(rows))).fetchall()
+            leased = []
+            for row_id, url, kind, data in rows:
+                self.db.execute("UPDATE urls SET state = ?, worker = ?, lease_until = ?, attempts = attempts + 1 "
+                                "WHERE id = ?", (LEASED, worker, now + self.lease_seconds, row_id))
+                leased.append((url, kind, json.loads(data) if data else None))
+            self.db.execute("COMMIT")
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        return leased
+
+    def renew(self, worker, urls):
+        """
+        Extends the leases a worker still holds, so that a slow fetch does not hand its URL to another worker.
+
+        Args:
+            worker (str): The worker holding the leases.
+            urls (iterable): The leased URLs.
+
+        Returns:
+            None
+        """
+        lease_until = time.time() + self.lease_seconds
+        self.db.executemany("UPDATE urls SET lease_until = ? WHERE url = ? AND state = ? AND worker = ?",
+                            [(lease_until, url, LEASED, worker) for url in urls])
+
+    def ack(self, worker, url, records=()):
+        """
+        Marks a leased URL as done and stores the records extracted from it.
+
+        Args:
+            worker (str): The worker holding the lease.
+            url (str): The URL.
+            records (iterable): JSON-serializable records.
+
+        Returns:
+            bool: False if the lease had expired and was taken by another worker;
+            the records are then dropped.
+        """
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            row = self.db.execute("SELECT id FROM urls WHERE url = ? AND state = ? AND worker = ?",
+                                  (url, LEASED, worker)).fetchone()
+            if row is not None:
+                self.db.execute("UPDATE urls SET state = ?, lease_until = NULL WHERE id = ?", (DONE, row[0]))
+                self.db.executemany("INSERT OR REPLACE INTO records (url_id, position, data) VALUES (?, ?, ?)",
+                                    [(row[0], position, json.dumps(record, ensure_ascii=False))
+                                     for position, record in enumerate(records)])
+            self.db.execute("COMMIT")
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        return row is not None
+
+    def fail(self, worker, url):
+        """
+        Gives a leased URL back, or marks it failed once it was leased `max_attempts` times.
+
+        Args:
+            worker (str): The worker holding the lease.
+            url (str): The URL.
+
+        Returns:
+            None
+        """
+        self.db.execute(
+            "UPDATE urls SET state = CASE WHEN attempts >= ? THEN ? ELSE ? END, worker = NULL, lease_until = NULL "
+            "WHERE url = ? AND state = ? AND worker = ?",
+            (self.max_attempts, FAILED, QUEUED, url, LEASED, worker))
+
+    def counts(self):
+        """
+        Counts the URLs per state.
+
+        Returns:
+            dict: Numbers of 'queued', 'leased', 'done' and 'failed' URLs.
+        """
+        counts = dict.fromkeys(('queued', 'leased', 'done', 'failed'), 0)
+        names = {QUEUED: 'queued', LEASED: 'leased', DONE: 'done', FAILED: 'failed'}
+        for state, count in self.db.execute("SELECT state, COUNT(*) FROM urls GROUP BY state"):
+            counts[names[state]] = count
+        return counts
+
+    def finished(self):
+        """Tells whether no URL is queued or leased any more."""
+        return self.db.execute("SELECT 1 FROM urls WHERE state IN (?, ?) LIMIT 1", (QUEUED, LEASED)).fetchone() is None
+
+    def records(self):
+        """Yields the stored records, in the order their URLs were queued."""
+        for (data,) in self.db.execute("SELECT data FROM records ORDER BY url_id, position"):
+            yield json.loads(data)
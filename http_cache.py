@@ -0,0 +1,293 @@
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+from http.cookies import SimpleCookie
+from urllib.parse import parse_qsl, urlencode
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+import metrics
+
+DEFAULT_CACHE_DIR = '.http_cache'
+DEFAULT_TTL = 24 * 60 * 60  # One day, the target pages almost never change
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+
+# Request headers that change the content of the response
+VARY_HEADERS = ('Accept', 'Accept-Language')
+
+# Form fields that change on every visit and must not split the cache
+VOLATILE_FIELDS = ('csrf_token', '__VIEWSTATE')
+
+# Response headers that describe the wire encoding rather than the stored body
+DROPPED_HEADERS = ('Content-Encoding', 'Content-Length', 'Transfer-Encoding', 'Set-Cookie')
+
+class CacheStore:
+    """
+    Size-capped LRU store of compressed response bodies.
+
+    Bodies are written zlib-compressed under <cache_dir>/bodies and indexed in a
+    SQLite table that keeps the validators (ETag/Last-Modified), the storage time
+    used for the TTL and the last access time used for eviction.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.join(cache_dir, 'bodies'), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(cache_dir, 'index.sqlite'), check_same_thread=False)
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS entries ('
+            ' key TEXT PRIMARY KEY, url TEXT, status INTEGER, headers TEXT, encoding TEXT,'
+            ' cookies TEXT, etag TEXT, last_modified TEXT, stateful INTEGER,'
+            ' stored_at REAL, accessed_at REAL, size INTEGER)'
+        )
+        self._db.commit()
+
+    def _body_path(self, key):
+        return os.path.join(self.cache_dir, 'bodies', key[:2], key + '.zz')
+
+    def get(self, key):
+        """
+        Looks up an entry and marks it as recently used.
+
+        Args:
+            key (str): The cache key of the request.
+
+        Returns:
+            dict or None: The entry with its decompressed 'body', or None on a miss.
+        """
+        with self._lock:
+            row = self._db.execute(
+                'SELECT url, status, headers, encoding, cookies, etag, last_modified, stateful, stored_at'
+                ' FROM entries WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            try:
+                with open(self._body_path(key), 'rb') as f:
+                    body = zlib.decompress(f.read())
+            except (OSError, zlib.error):
+                self._delete(key)
+                self._db.commit()
+                return None
+            self._db.execute('UPDATE entries SET accessed_at = ? WHERE key = ?', (time.time(), key))
+            self._db.commit()
+
+        url, status, headers, encoding, cookies, etag, last_modified, stateful, stored_at = row
+        return {
+            'url': url,
+            'status': status,
+            'headers': json.loads(headers),
+            'encoding': encoding,
+            'cookies': json.loads(cookies),
+            'etag': etag,
+            'last_modified': last_modified,
+            'stateful': bool(stateful),
+            'stored_at': stored_at,
+            'body': body,
+        }
+
+    def put(self, key, url, status, headers, encoding, cookies, body, stateful):
+        """
+        Stores a response body and its metadata, then evicts the least recently
+        used entries if the cache is over its size cap. `headers` is looked up
+        case-insensitively, as servers spell header names as they like.
+        """
+        headers = CaseInsensitiveDict(headers)
+        compressed = zlib.compress(body, 6)
+        path = self._body_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # A unique temporary file: the cache is shared by threads and by processes (crawl workers, parsers)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(compressed)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, url, status, json.dumps(dict(headers.items())), encoding, json.dumps(cookies),
+                 headers.get('ETag'), headers.get('Last-Modified'), int(stateful),
+                 now, now, len(compressed)),
+            )
+            self._evict()
+            self._db.commit()
+
+    def touch(self, key):
+        """Resets the storage time of an entry after a successful revalidation."""
+        with self._lock:
+            now = time.time()
+            self._db.execute('UPDATE entries SET stored_at = ?, accessed_at = ? WHERE key = ?', (now, now, key))
+            self._db.commit()
+
+    def total_size(self):
+        with self._lock:
+            return self._db.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+
+    def _evict(self):
+        total = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._db.execute('SELECT key, size FROM entries ORDER BY accessed_at').fetchall():
+            self._delete(key)
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def _delete(self, key):
+        self._db.execute('DELETE FROM entries WHERE key = ?', (key,))
+        try:
+            os.remove(self._body_path(key))
+        except OSError:
+            pass
+
+class CachedSession(requests.Session):
+    """
+    requests.Session that answers from an on-disk cache.
+
+    GET responses younger than the TTL are served from disk without any network
+    access; older ones are revalidated with If-None-Match/If-Modified-Since. POST
+    responses and responses that set cookies (login pages with a CSRF token, for
+    instance) are stored as well, but only replayed in offline mode, where every
+    request is answered from the cache and a miss raises a ConnectionError.
+    A request sent with 'Cache-Control: no-cache' skips the stored copy.
+
+    The cache key is the method, the final URL, the VARY_HEADERS, the form body
+    without its VOLATILE_FIELDS and the names (not the values) of the cookies
+    sent, so an authenticated page is cached apart from its anonymous version
+    while staying reusable across logins.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES, offline=False):
+        super().__init__()
+        self.store = CacheStore(cache_dir, max_bytes)
+        self.ttl = ttl
+        self.offline = offline
+        self.cache_stats = {'hits': 0, 'misses': 0, 'revalidated': 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, counter, result):
+        # Crawl threads share the session: the counters are updated under a lock
+        with self._stats_lock:
+            self.cache_stats[counter] += 1
+        metrics.increment('cache', result=result)
+
+    def request(self, method, url, **kwargs):
+        if kwargs.get('stream'):
+            return super().request(method, url, **kwargs)
+
+        key = self._cache_key(method, url, kwargs)
+        entry = self.store.get(key)
+        # Cache-Control: no-cache asks for a fresh copy, which then replaces the stored one
+        if not self.offline and 'no-cache' in CaseInsensitiveDict(kwargs.get('headers')).get('Cache-Control', ''):
+            entry = None
+
+        if entry and (self.offline or (not entry['stateful'] and time.time() - entry['stored_at'] < self.ttl)):
+            self._count('hits', 'hit')
+            return self._replay(entry)
+        if self.offline:
+            raise requests.ConnectionError(f"{method.upper()} {url} is not in the cache (offline mode)")
+
+        if entry and not entry['stateful']:
+            validators = {}
+            if entry['etag']:
+                validators['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                validators['If-Modified-Since'] = entry['last_modified']
+            kwargs['headers'] = {**(kwargs.get('headers') or {}), **validators}
+
+        response = super().request(method, url, **kwargs)
+
+        if response.status_code == 304 and entry:
+            self._count('revalidated', 'revalidated')
+            self.store.touch(key)
+            return self._replay(entry)
+
+        self._count('misses', 'miss')
+        if response.status_code == 200:
+            cookies = {}
+            for hop in response.history + [response]:
+                cookies.update(hop.cookies.get_dict())
+            headers = CaseInsensitiveDict(response.headers)
+            for name in DROPPED_HEADERS:
+                headers.pop(name, None)
+            self.store.put(
+                key, response.url, response.status_code, headers, response.encoding, cookies,
+                response.content, stateful=method.upper() != 'GET' or bool(cookies),
+            )
+        return response
+
+    def _cache_key(self, method, url, kwargs):
+        prepared = self.prepare_request(requests.Request(
+            method=method.upper(),
+            url=url,
+            headers=kwargs.get('headers'),
+            params=kwargs.get('params'),
+            data=kwargs.get('data'),
+            json=kwargs.get('json'),
+            cookies=kwargs.get('cookies'),
+        ))
+
+        body = prepared.body or ''
+        if isinstance(body, bytes):
+            body = body.decode('utf-8', 'replace')
+        if prepared.headers.get('Content-Type', '').startswith('application/x-www-form-urlencoded'):
+            fields = [(name, value) for name, value in parse_qsl(body, keep_blank_values=True)
+                      if name not in VOLATILE_FIELDS]
+            body = urlencode(sorted(fields))
+
+        cookie_names = sorted(SimpleCookie(prepared.headers.get('Cookie', '')).keys())
+        state = [prepared.method, prepared.url, body, cookie_names]
+        state += [prepared.headers.get(name, '') for name in VARY_HEADERS]
+        return hashlib.sha256(json.dumps(state).encode('utf-8')).hexdigest()
+
+    def _replay(self, entry):
+        response = requests.Response()
+        response.status_code = entry['status']
+        response.reason = 'OK'
+        response.url = entry['url']
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        response.encoding = entry['encoding']
+        response._content = entry['body']
+        response.from_cache = True
+        # Replaying the cookies keeps the cache key of the following requests stable
+        self.cookies.update(entry['cookies'])
+        return response
+
+def cached_session(**overrides):
+    """
+    Builds the session used by the scrapers, configured from the environment.
+
+    SCRAPER_CACHE=0 disables the cache; SCRAPER_CACHE_DIR, SCRAPER_CACHE_TTL
+    (seconds), SCRAPER_CACHE_MAX_MB and SCRAPER_OFFLINE=1 tune it.
+
+    Args:
+        **overrides: Keyword arguments passed to CachedSession instead of the environment values.
+
+    Returns:
+        requests.Session: A CachedSession, or a plain Session when the cache is disabled.
+    """
+    if os.environ.get('SCRAPER_CACHE', '1') == '0' and not overrides:
+        return requests.Session()
+
+    options = {
+        'cache_dir': os.environ.get('SCRAPER_CACHE_DIR', DEFAULT_CACHE_DIR),
+        'ttl': float(os.environ.get('SCRAPER_CACHE_TTL', DEFAULT_TTL)),
+        'max_bytes': int(float(os.environ.get('SCRAPER_CACHE_MAX_MB', DEFAULT_MAX_BYTES / 1024 / 1024)) * 1024 * 1024),
+        'offline': os.environ.get('SCRAPER_OFFLINE', '0') == '1',
+    }
+    options.update(overrides)
+    return CachedSession(**options)
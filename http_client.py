@@ -0,0 +1,136 @@
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import metrics
+from http_cache import cached_session
+from rate_limiter import THROTTLE_STATUSES, shared_limiter
+
+try:
+    import brotli  # noqa: F401  (lets urllib3 decode 'br' responses)
+    ACCEPT_ENCODING = 'gzip, deflate, br'
+except ImportError:
+    ACCEPT_ENCODING = 'gzip, deflate'
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+DEFAULT_TIMEOUT = (5, 15)  # (connect, read) in seconds
+
+# Responses worth retrying: rate limiting and transient server errors
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+class PoliteHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that applies a default (connect, read) timeout to every request
+    sent without an explicit one and, with a limiter, paces the requests per host.
+
+    The limiter is told about the latency and status of every response,
+    including the 429/503 answers that urllib3 retried on its own.
+    """
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, limiter=None, **kwargs):
+        self.timeout = timeout
+        self.limiter = limiter
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        host = urlsplit(request.url).netloc
+        if self.limiter is not None:
+            metrics.observe('rate_limit_wait_seconds', self.limiter.acquire(host))
+
+        started = time.monotonic()
+        with metrics.timer('fetch'):
+            response = super().send(request, **kwargs)
+        latency = time.monotonic() - started
+
+        retries = getattr(response.raw, 'retries', None)
+        history = getattr(retries, 'history', ())
+        metrics.increment('requests', status=response.status_code)
+        if history:
+            metrics.increment('retries', len(history))
+        if self.limiter is not None:
+            for attempt in history:
+                if attempt.status in THROTTLE_STATUSES:
+                    self.limiter.observe(host, 0.0, attempt.status)
+            self.limiter.observe(host, latency, response.status_code, response.headers.get('Retry-After'))
+        return response
+
+def count_downloaded_bytes(response, **kwargs):
+    """
+    Response hook adding the size of a response body to the metrics, as sent over
+    the wire (compressed) and once decoded. Streamed responses are not counted.
+    """
+    if metrics.enabled() and not kwargs.get('stream'):
+        metrics.increment('bytes_decoded', len(response.content))
+        metrics.increment('bytes_downloaded', response.raw.tell())
+
+def create_session(pool_size=DEFAULT_POOL_SIZE, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF,
+                   timeout=DEFAULT_TIMEOUT, cache=True, rate_limit=True):
+    """
+    Builds the HTTP session shared by the scrapers.
+
+    The session keeps up to `pool_size` keep-alive connections per host, retries
+    connection errors, 429 and 5xx responses with exponential backoff (honouring
+    Retry-After), applies connect/read timeouts and accepts gzip (and brotli when
+    the brotli package is installed) compressed responses. With `cache`, it is
+    the on-disk CachedSession configured from the environment (see http_cache.py),
+    and with `rate_limit` its requests are paced by the per-host limiter shared by
+    the whole process (see rate_limiter.py); cache hits are not paced. Fetch
+    times, retries and downloaded bytes are recorded in the metrics (see metrics.py).
+
+    Args:
+        pool_size (int): Maximum number of pooled connections per host.
+        retries (int): Maximum number of retries of a request.
+        backoff (float): Backoff factor; retry n waits backoff * 2 ** (n - 1) seconds.
+        timeout (tuple): Default (connect, read) timeout in seconds.
+        cache (bool): Whether to answer from the on-disk HTTP cache.
+        rate_limit (bool): Whether to pace requests with the shared per-host rate limiter.
+
+    Returns:
+        requests.Session: The configured session.
+    """
+    session = cached_session() if cache else requests.Session()
+
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=backoff,
+        status_forcelist=RETRY_STATUSES,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = PoliteHTTPAdapter(
+        timeout=timeout,
+        limiter=shared_limiter() if rate_limit else None,
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        max_retries=retry,
+    )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers['Accept-Encoding'] = ACCEPT_ENCODING
+    session.hooks['response'].append(count_downloaded_bytes)
+    return session
+
+_default_session = None
+
+def default_session():
+    """
+    Returns a session created on first use and shared by the library functions
+    that are called without an explicit session or get function.
+
+    Returns:
+        requests.Session: The shared session.
+    """
+    global _default_session
+    if _default_session is None:
+        _default_session = create_session()
+    return _default_session
@@ -0,0 +1,281 @@
+import atexit
+import bisect
+import contextlib
+import functools
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+
+# Upper bounds of the latency histogram buckets, in seconds
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+
+PREFIX = 'scraper_'
+
+_enabled = False
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+
+# Shared by every disabled timer: entering it costs one attribute lookup
+_NULL_TIMER = contextlib.nullcontext()
+
+def enabled():
+    return _enabled
+
+def enable():
+    """Starts recording metrics."""
+    global _enabled
+    _enabled = True
+
+def disable():
+    global _enabled
+    _enabled = False
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items()))) if labels else (name, ())
+
+def increment(name, value=1, **labels):
+    """
+    Adds to a counter, such as the bytes downloaded or the cache hits.
+
+    Args:
+        name (str): The counter name.
+        value (int or float): The amount to add.
+        **labels: Label values distinguishing series of the counter.
+
+    Returns:
+        None
+    """
+    if not _enabled:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def observe(name, value, **labels):
+    """
+    Records a value, in seconds, in a histogram.
+
+    Args:
+        name (str): The histogram name.
+        value (float): The observed value.
+        **labels: Label values distinguishing series of the histogram.
+
+    Returns:
+        None
+    """
+    if not _enabled:
+        return
+    key = _key(name, labels)
+    index = bisect.bisect_left(BUCKETS, value)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = {'buckets': [0] * len(BUCKETS), 'sum': 0.0, 'count': 0}
+        histogram['buckets'][index] += 1
+        histogram['sum'] += value
+        histogram['count'] += 1
+
+class _Timer:
+    __slots__ = ('stage', 'started')
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        observe('stage_seconds', time.perf_counter() - self.started, stage=self.stage)
+
+def timer(stage):
+    """
+    Times a block of code as one of the stages of a crawl (fetch, parse, extract, save...).
+
+    Args:
+        stage (str): The stage name, the 'stage' label of scraper_stage_seconds.
+
+    Returns:
+        A context manager; a shared no-op one when metrics are disabled.
+    """
+    if not _enabled:
+        return _NULL_TIMER
+    return _Timer(stage)
+
+def timed(stage):
+    """
+    Decorator timing every call of a function as a stage (see timer).
+
+    Args:
+        stage (str): The stage name.
+
+    Returns:
+        callable: The decorator.
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            with _Timer(stage):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def snapshot():
+    """
+    Returns the recorded metrics.
+
+    Returns:
+        dict: 'counters' and 'histograms', lists of series with their 'name' and 'labels'.
+    """
+    with _lock:
+        return {
+            'counters': [
+                {'name': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in sorted(_counters.items())
+            ],
+            'histograms': [
+                {'name': name, 'labels': dict(labels), 'buckets': list(BUCKETS[:-1]),
+                 'counts': list(histogram['buckets']), 'sum': histogram['sum'], 'count': histogram['count']}
+                for (name, labels), histogram in sorted(_histograms.items())
+            ],
+        }
+
+def _format_labels(labels, **extra):
+    labels = {**labels, **extra}
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{value}"' for name, value in labels.items()) + '}'
+
+def to_prometheus(data=None):
+    """
+    Formats the metrics in the Prometheus text exposition format.
+
+    Args:
+        data (dict): A snapshot; the current metrics by default.
+
+    Returns:
+        str: The exposition text.
+    """
+    data = data or snapshot()
+    lines = []
+    typed = set()
+    for series in data['counters']:
+        name = f"{PREFIX}{series['name']}_total"
+        if name not in typed:
+            lines.append(f"# TYPE {name} counter")
+            typed.add(name)
+        lines.append(f"{name}{_format_labels(series['labels'])} {series['value']}")
+    for series in data['histograms']:
+        name = PREFIX + series['name']
+        if name not in typed:
+            lines.append(f"# TYPE {name} histogram")
+            typed.add(name)
+        cumulative = 0
+        for bound, count in zip(series['buckets'] + ['+Inf'], series['counts']):
+            cumulative += count
+            lines.append(f"{name}_bucket{_format_labels(series['labels'], le=bound)} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(series['labels'])} {series['sum']}")
+        lines.append(f"{name}_count{_format_labels(series['labels'])} {series['count']}")
+    return '\n'.join(lines) + '\n'
+
+def export(path):
+    """
+    Writes the metrics to a file, as JSON if its name ends in .json, else as Prometheus text.
+
+    Args:
+        path (str): The output file.
+
+    Returns:
+        None
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        if path.endswith('.json'):
+            json.dump(snapshot(), f, indent=4)
+        else:
+            f.write(to_prometheus())
+
+def summary():
+    """
+    Summarizes the time spent per stage and the counters, for the end of a run.
+
+    Returns:
+        str: One line per stage and per counter.
+    """
+    data = snapshot()
+    lines = []
+    for series in data['histograms']:
+        if series['name'] == 'stage_seconds' and series['count']:
+            lines.append(f"{series['labels']['stage']:<12}{series['count']:>8} calls {series['sum']:>9.3f}s "
+                         f"{series['sum'] / series['count'] * 1000:>8.2f} ms/call")
+    for series in data['counters']:
+        labels = ','.join(f"{name}={value}" for name, value in series['labels'].items())
+        lines.append(f"{series['name'] + (f'[{labels}]' if labels else ''):<32}{series['value']:>12}")
+    return '\n'.join(lines)
+
+def start_profiler(path):
+    """
+    Profiles the rest of the run and writes the profile to `path` at exit.
+
+    A path ending in .html uses pyinstrument when it is installed; any other
+    path gets a cProfile dump, readable with `python -m pstats`. cProfile only
+    sees the thread that started it.
+
+    Args:
+        path (str): The profile output file.
+
+    Returns:
+        None
+    """
+    if path.endswith('.html'):
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            path = path[:-len('.html')] + '.prof'
+        else:
+            profiler = Profiler()
+            profiler.start()
+
+            def write_html():
+                profiler.stop()
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write(profiler.output_html())
+
+            atexit.register(write_html)
+            return
+
+    import cProfile
+    profiler = cProfile.Profile()
+    profiler.enable()
+
+    def write_stats():
+        profiler.disable()
+        profiler.dump_stats(path)
+
+    atexit.register(write_stats)
+
+def _export_at_exit(path):
+    export(path)
+    print(f"\nMetrics written to '{path}':\n{summary()}", file=sys.stderr)
+
+# SCRAPER_METRICS=<file.prom|file.json> records the metrics of the run and exports them at exit;
+# SCRAPER_PROFILE=<file.prof|file.html> profiles the run
+# (only in the main process: parser processes inherit the environment but not the run)
+if os.environ.get('SCRAPER_METRICS') and multiprocessing.parent_process() is None:
+    enable()
+    atexit.register(_export_at_exit, os.environ['SCRAPER_METRICS'])
+if os.environ.get('SCRAPER_PROFILE') and multiprocessing.parent_process() is None:
+    start_profiler(os.environ['SCRAPER_PROFILE'])
@@ -1,21 +1,190 @@
-import requests
-from bs4 import BeautifulSoup
+import argparse
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urljoin
 
-def get_viewstate(soup):
+import extractors
+from http_client import create_session
+from output_sink import JsonlSink
+from quote_index import QuoteIndex, build_index
+
+INDEX_PATH = os.path.join('output', 'quotes_index.json')
+
+def get_viewstate(tree):
     """
     Extracts the value of the __VIEWSTATE hidden field from the form.
     
     Args:
-        soup (BeautifulSoup): Parsed HTML content of the page.
+        tree (lxml.html.HtmlElement): Parsed HTML content of the page.
         
     Returns:
         str: The value of the __VIEWSTATE field or an empty string if not found.
     """
-    viewstate = soup.find('input', {'name': '__VIEWSTATE'})
-    if viewstate:
-        return viewstate.get('value', '')
-    return ''
+    return extractors.input_value(tree, '__VIEWSTATE') or ''
+
+# Headers that mimic a real browser
+BROWSER_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
+                  'AppleWebKit/537.36 (KHTML, like Gecko) '
+                  'Chrome/91.0.4472.124 Safari/537.36',
+    'Accept-Language': 'en-US,en;q=0.9',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+}
+
+class SearchClient:
+    """
+    Client of the search.aspx form that runs many author/tag searches over one session.
+
+    The __VIEWSTATE of the form is fetched once and reused by every search;
+    the one the server returns after an author is chosen is kept for that
+    author's searches. A ViewState is only fetched again when the server
+    rejects it: the answer is not a 200 or no longer carries the form. The
+    ViewStates are shared by the threads of search_many() and only read or
+    updated under a lock.
+    """
+
+    def __init__(self, base_url, session=None, workers=4):
+        self.search_url = urljoin(base_url, "search.aspx")
+        self.filter_url = urljoin(base_url, "filter.aspx")
+        self.workers = workers
+        # One pooled keep-alive connection per search that can be in flight
+        self.session = session or create_session(pool_size=max(workers, 10))
+        self.session.headers.update(BROWSER_HEADERS)
+        self.session.headers['Referer'] = self.search_url
+        self.authors = []
+        self._viewstates = {}
+        self._lock = threading.Lock()
+
+    def _viewstate(self, author):
+        with self._lock:
+            return self._viewstates.get(author)
+
+    def _form_viewstate(self, stale=None):
+        # Threads that saw the same ViewState rejected trigger a single refresh
+        with self._lock:
+            if self._viewstates.get(None) in (None, stale):
+                response = self.session.get(self.search_url)
+                if response.status_code != 200:
+                    print(f"Error accessing the search page: {response.status_code}")
+                    return None
+                tree = extractors.parse_html(response.content)
+                viewstate = get_viewstate(tree)
+                if not viewstate:
+                    print("Unable to find the __VIEWSTATE field.")
+                    return None
+                self._viewstates[None] = viewstate
+                self.authors = extractors.select_options(tree, 'author')
+            return self._viewstates[None]
+
+    def _submit(self, viewstate, payload):
+        """Posts the form; returns the parsed answer, or None if the server rejected the ViewState, and the status."""
+        response = self.session.post(self.filter_url, data={**payload, '__VIEWSTATE': viewstate})
+        if response.status_code == 200:
+            tree = extractors.parse_html(response.content)
+            if get_viewstate(tree):
+                return tree, response.status_code
+        return None, response.status_code
+
+    def _choose_author(self, author, stale=None):
+        """Chooses an author in the form and keeps the ViewState returned for the author's searches."""
+        form_viewstate = self._form_viewstate(stale)
+        for attempt in range(2):
+            if not form_viewstate:
+                return None
+            tree, status = self._submit(form_viewstate, {'author': author, 'tag': '----------'})
+            if tree is not None:
+                with self._lock:
+                    self._viewstates[author] = get_viewstate(tree)
+                return tree
+            form_viewstate = self._form_viewstate(stale=form_viewstate)
+        print(f"Error submitting the form for {author!r}: {status}")
+        return None
+
+    def author_list(self):
+        """
+        Returns the authors offered by the form.
+
+        Returns:
+            list: The author names.
+        """
+        self._form_viewstate()
+        return self.authors
+
+    def tags_for(self, author):
+        """
+        Chooses an author in the form and returns the tags it then offers.
+
+        Args:
+            author (str): The name of the author.
+
+        Returns:
+            list: The tags of the author's quotes.
+        """
+        tree = self._choose_author(author)
+        return [] if tree is None else extractors.select_options(tree, 'tag')
+
+    def search(self, author, tag):
+        """
+        Searches for quotes by a specific author with a specific tag.
+
+        The search is posted with the author's ViewState, or the form's before
+        the author was chosen; if the server rejects it, the author is chosen
+        again and the search is posted with the ViewState that step returns.
+
+        Args:
+            author (str): The name of the author to search for.
+            tag (str): The tag associated with the quote.
+
+        Returns:
+            list: A list of dictionaries containing quote text, author, and tags.
+        """
+        payload = {'author': author, 'tag': tag, 'submit_button': 'Search'}
+        viewstate = self._viewstate(author) or self._form_viewstate()
+        if not viewstate:
+            return []
+        tree, status = self._submit(viewstate, payload)
+        if tree is None:
+            # Choose the author again, unless another thread already did after the same rejection;
+            # a rejected form ViewState is refreshed first
+            retry = self._viewstate(author)
+            if retry in (None, viewstate):
+                stale = viewstate if viewstate == self._viewstate(None) else None
+                if self._choose_author(author, stale) is None:
+                    return []
+                retry = self._viewstate(author)
+            tree, status = self._submit(retry, payload)
+        if tree is None:
+            print(f"Error submitting the form for {author!r}: {status}")
+            return []
+        return extract_quotes(tree)
+
+    def search_many(self, pairs):
+        """
+        Runs several searches concurrently, at most `workers` at a time.
+
+        Args:
+            pairs (iterable): (author, tag) tuples.
+
+        Returns:
+            dict: The list of quotes found for each (author, tag) pair, in input order.
+        """
+        pairs = list(dict.fromkeys(pairs))
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            results = executor.map(lambda pair: self.search(*pair), pairs)
+            return dict(zip(pairs, results))
+
+    def all_pairs(self):
+        """
+        Enumerates every author/tag combination the form offers.
+
+        Returns:
+            list: (author, tag) tuples, authors in form order.
+        """
+        authors = self.author_list()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            tags = executor.map(self.tags_for, authors)
+            return [(author, tag) for author, author_tags in zip(authors, tags) for tag in author_tags]
 
 def search_quote(base_url, author, tag):
     """
@@ -29,106 +198,38 @@ def search_quote(base_url, author, tag):
     Returns:
         list: A list of dictionaries containing quote text, author, and tags.
     """
-    search_url = urljoin(base_url, "search.aspx")
-    filter_url = urljoin(base_url, "filter.aspx")
-    
-    # Create a session to maintain cookies
-    session = requests.Session()
-    
-    # Define headers to mimic a real browser
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) ' 
-                      'AppleWebKit/537.36 (KHTML, like Gecko) '
-                      'Chrome/91.0.4472.124 Safari/537.36',
-        'Accept-Language': 'en-US,en;q=0.9',
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-        'Referer': search_url
-    }
-    
-    # Perform a GET request to access the search form
-    initial_response = session.get(search_url, headers=headers)
-    if initial_response.status_code != 200:
-        print(f"Error accessing the search page: {initial_response.status_code}")
-        return []
-    
-    # Parse the HTML content to extract __VIEWSTATE
-    soup = BeautifulSoup(initial_response.text, 'html.parser')
-    viewstate = get_viewstate(soup)
-    
-    if not viewstate:
-        print("Unable to find the __VIEWSTATE field.")
-        return []
-    
-    # Prepare the payload for the POST request
-    payload = {
-        'author': author,
-        'tag': tag,
-        'submit_button': 'Search',
-        '__VIEWSTATE': viewstate
-    }
-    
-    # Submit the form with a POST request to filter.aspx
-    post_response = session.post(filter_url, data=payload, headers=headers)
-    
-    if post_response.status_code != 200:
-        print(f"Error submitting the form: {post_response.status_code}")
-        return []
-    
-    # Parse the response to extract quotes
-    post_soup = BeautifulSoup(post_response.text, 'html.parser')
-    quotes = extract_quotes(post_soup)
-    
-    return quotes
+    return SearchClient(base_url).search(author, tag)
 
-def extract_quotes(soup):
+def extract_quotes(tree):
     """
     Extracts quotes, authors, and tags from the parsed HTML content.
     
+    The quote text is read from 'span.text' or 'span.content' and the author
+    from 'small.author' or 'span.author' (see extractors.extract_quote).
+    
     Args:
-        soup (BeautifulSoup): Parsed HTML content of the page.
+        tree (lxml.html.HtmlElement): Parsed HTML content of the page.
         
     Returns:
         list: A list of dictionaries containing quote text, author, and tags.
     """
-    quotes = []
-    for quote in soup.find_all('div', class_='quote'):
-        # Attempt to find the quote text in either 'span.text' or 'span.content'
-        text_tag = quote.find('span', class_='text')
-        if not text_tag:
-            text_tag = quote.find('span', class_='content')
-        
-        text = text_tag.get_text(strip=True) if text_tag else None
-        
-        # Attempt to find the author in either 'small.author' or 'span.author'
-        author_tag = quote.find('small', class_='author')
-        if not author_tag:
-            author_tag = quote.find('span', class_='author')
-        
-        author_name = author_tag.get_text(strip=True) if author_tag else None
-        
-        # Extract all tags associated with the quote
-        tags = [tag.get_text(strip=True) for tag in quote.find_all('a', class_='tag')]
-        
-        quotes.append({'text': text, 'author': author_name, 'tags': tags})
-    return quotes
+    return extractors.extract_quotes(tree)
 
 def answer_specific_question(quotes, author_name, keyword):
     """
     Filters the quotes to find the unique quote by the specified author containing the keyword.
     
     Args:
-        quotes (list): A list of dictionaries containing quote details.
+        quotes (list or QuoteIndex): The quote dictionaries, or an index of them.
         author_name (str): The name of the author to filter by.
         keyword (str): The keyword to search for within the quote text.
         
     Returns:
         None
     """
-    # Filter quotes by author and keyword in text
-    filtered_quotes = [
-        quote for quote in quotes 
-        if quote['author'] == author_name and quote['text'] and keyword.lower() in quote['text'].lower()
-    ]
+    # Filter quotes by author and keyword in text (see quote_index.py)
+    index = quotes if isinstance(quotes, QuoteIndex) else QuoteIndex(quotes)
+    filtered_quotes = index.query(author=author_name, text=keyword)
     
     if len(filtered_quotes) == 1:
         print(f"The unique quote by {author_name} on music is:")
@@ -150,14 +251,41 @@ def main():
     Returns:
         None
     """
-    base_url = "https://quotes.toscrape.com/"
+    parser = argparse.ArgumentParser(description="Search quotes.toscrape.com through its ViewState form.")
+    parser.add_argument('--all', action='store_true',
+                        help="Export the site by searching every author/tag combination of the form.")
+    parser.add_argument('--workers', type=int, default=4,
+                        help="Number of searches run concurrently.")
+    parser.add_argument('--base-url', default="https://quotes.toscrape.com/")
+    args = parser.parse_args()
+    base_url = args.base_url
+    
+    if args.all:
+        client = SearchClient(base_url, workers=args.workers)
+        pairs = client.all_pairs()
+        print(f"Searching {len(pairs)} author/tag combinations...")
+        index = build_index(INDEX_PATH)
+        with JsonlSink(os.path.join('output', 'search.jsonl')) as sink:
+            for (author, tag), quotes in client.search_many(pairs).items():
+                for quote in quotes:
+                    sink.write({'author_query': author, 'tag_query': tag, **quote})
+                index.add_many(quotes)
+        index.save(INDEX_PATH)
+        print(f"{len(index)} distinct quotes indexed.")
+        return
     
     # Search parameters
     author = "Albert Einstein"
     tag = "music"  # Use 'music' as the tag
     
-    # Perform the search
-    quotes = search_quote(base_url, author, tag)
+    # Answer from the index of the quotes collected so far, searching the site only
+    # when it knows no quote by the author with the tag
+    index = build_index(INDEX_PATH)
+    quotes = index.query(author=author, tag=tag)
+    if not quotes:
+        quotes = search_quote(base_url, author, tag)
+        if index.add_many(quotes):
+            index.save(INDEX_PATH)
     
     # Display the result
     answer_specific_question(quotes, author_name=author, keyword=tag)
@@ -1,22 +1,53 @@
-import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin
-import time
+import argparse
+import os
+import sys
+from urllib.parse import urljoin, urlsplit
+from concurrent.futures import ThreadPoolExecutor
+import threading
 
-def extract_categories(base_url):
-    response = requests.get(base_url)
+from analytics import category_statistics, load_books
+from checkpoint import Checkpoint
+from delta import FingerprintStore
+from extractors import extract_books, extract_category_links, parse_html
+from http_client import create_session, default_session
+from output_sink import JsonlSink
+from pagination import UNCHANGED, ParsedPage, crawl_pages, parse_listing
+from pipeline import ParserPool
+
+class HostGate:
+    """
+    Per-host concurrency gate shared by the worker threads of a concurrent crawl.
+
+    Caps the number of requests in flight against a single host; the request
+    rate itself is paced by the session's rate limiter (see rate_limiter.py).
+    """
+
+    def __init__(self, get, max_per_host=2):
+        self._get = get
+        self.max_per_host = max_per_host
+        self._lock = threading.Lock()
+        self._slots = {}
+
+    def _slot(self, host):
+        with self._lock:
+            if host not in self._slots:
+                self._slots[host] = threading.BoundedSemaphore(self.max_per_host)
+            return self._slots[host]
+
+    def get(self, url, **kwargs):
+        with self._slot(urlsplit(url).netloc):
+            return self._get(url, **kwargs)
+
+def extract_categories(base_url, get=None):
+    get = get or default_session().get
+    response = get(base_url)
     category_links = {}
 
     if response.status_code == 200:
-        soup = BeautifulSoup(response.text, 'html.parser')
-        categories_section = soup.find('div', class_='side_categories')
-        if categories_section:
-            categories = categories_section.find_all('a')
-            for category in categories:
-                category_name = category.text.strip()
-                href = category.get('href')
-                category_url = urljoin(base_url, href)
-                category_links[category_name] = category_url
+        tree = parse_html(response.content)
+        for category_name, href in extract_category_links(tree):
+            category_url = urljoin(base_url, href)
+            category_links[category_name] = category_url
 
         # Print extracted categories
         print("Categories extracted:")
@@ -27,36 +58,42 @@ def extract_categories(base_url):
 
     return category_links
 
-def scrape_books_in_category(category_url):
-    all_books = []
-    current_url = category_url
-    page_number = 1
+def scrape_books_in_category(category_url, get=None, page_workers=1, sink=None, category=None, checkpoint=None,
+                             parser_pool=None, fingerprints=None):
+    # The default session paces its requests per host, so no fixed sleep is needed between pages
+    get = get or default_session().get
 
-    while current_url:
-        print(f"Fetching page {page_number}: {current_url}")
-        response = requests.get(current_url)
+    def fetch_page(url, page_number):
+        print(f"Fetching page {page_number}: {url}")
+        response = get(url)
 
         if response.status_code != 200:
-            print(f"Failed to retrieve page at {current_url}, status code: {response.status_code}")
-            break
+            print(f"Failed to retrieve page at {url}, status code: {response.status_code}")
+            return None
+
+        if fingerprints and fingerprints.unchanged(url, response.content):
+            # Same bytes as in the previous run: nothing to extract
+            return UNCHANGED
+
+        if parser_pool:
+            # Parsed in a parser process while this thread fetches the next page
+            return parser_pool.submit(parse_listing, extract_books, response.content)
+        return parse_html(response.content)
 
-        soup = BeautifulSoup(response.text, 'html.parser')
+    def extract_page(tree, page_number):
+        page_books = []
 
         # Find all book elements on the current page
-        books = soup.find_all('article', class_='product_pod')
+        books = tree.records if isinstance(tree, ParsedPage) else extract_books(tree)
 
         if not books:
             print(f"No books found on page {page_number} of {category_url}")
-            break
+            return None
 
         print(f"Found {len(books)} books on page {page_number}")
 
-        for book in books:
-            # Extract the title of the book
-            title = book.h3.a['title']
-
-            # Extract the price of the book and sanitize it
-            price_text = book.find('p', class_='price_color').text.strip()
+        for title, price_text in books:
+            # Sanitize the price of the book
             price_text = price_text.encode('ascii', 'ignore').decode('ascii')  # Remove any non-ASCII characters
             try:
                 price = float(price_text.replace('£', '').strip())  # Remove the "£" symbol and convert to float
@@ -65,19 +102,69 @@ def scrape_books_in_category(category_url):
                 price = 0.0
 
             # Append title and price to the book list
-            all_books.append((title, price))
-
-        # Check if there is a next page
-        next_button = soup.find('li', class_='next')
-        if next_button:
-            next_href = next_button.find('a')['href']
-            current_url = urljoin(current_url, next_href)
-            page_number += 1
-            time.sleep(1)  # Add delay to avoid overwhelming the server
-        else:
-            current_url = None  # No more pages
+            page_books.append((title, price))
+            if sink:
+                sink.write({'category': category or category_url, 'title': title, 'price': price})
+
+        return page_books
+
+    # Pages 2..N are computed from the "Page 1 of N" pager and fetched by
+    # page_workers threads; categories without a pager follow the "next" links
+    books = crawl_pages(category_url, fetch_page, extract_page, workers=page_workers, checkpoint=checkpoint,
+                        fingerprints=fingerprints)
+
+    # Books restored from a checkpoint come back from JSON as lists
+    return [tuple(book) for book in books]
+
+def scrape_categories(category_links, workers=1, page_workers=1, max_per_host=2, get=None, sink=None,
+                      checkpoint=None, parser_pool=None, fingerprints=None):
+    """
+    Scrapes every category except the "Books" root, serially or with a worker pool.
+
+    With workers > 1 each category is crawled by a pool thread, and with
+    page_workers > 1 the pages of a category are fetched in parallel too; all
+    threads share one HostGate so the per-host limits hold across the whole crawl.
+
+    Args:
+        category_links (dict): Mapping of category name to category URL.
+        workers (int): Number of categories crawled at the same time.
+        page_workers (int): Number of pages of one category fetched at the same time.
+        max_per_host (int): Maximum number of requests in flight per host.
+        get (callable): Function used to fetch a URL, a session's get; defaults to the
+            shared session of http_client, whose rate limiter paces the requests per host.
+        sink (JsonlSink): Optional sink receiving each book as soon as its page is parsed.
+        checkpoint (Checkpoint): Optional crawl state; pages it records as completed are not fetched again.
+        parser_pool (ParserPool): Optional pool of parser processes the pages are parsed in
+            (see pipeline.py), so that parsing does not hold up the fetching threads.
+        fingerprints (FingerprintStore): Optional fingerprints of the previous run (see delta.py);
+            pages that did not change are skipped and their books left out of the result.
 
-    return all_books
+    Returns:
+        dict: Mapping of category name to its list of (title, price) tuples, in
+        the order of category_links.
+    """
+    # Skip the "Books" root category which contains all books
+    names = [name for name in category_links if name.lower() != 'books']
+    if checkpoint:
+        checkpoint.enqueue(category_links[name] for name in names)
+
+    def scrape(name, **options):
+        books = scrape_books_in_category(category_links[name], sink=sink, category=name, checkpoint=checkpoint,
+                                         parser_pool=parser_pool, fingerprints=fingerprints, **options)
+        if checkpoint:
+            checkpoint.complete(category_links[name])
+        return books
+
+    if workers <= 1 and page_workers <= 1:
+        return {name: scrape(name, get=get) for name in names}
+
+    gate = HostGate(get or default_session().get, max_per_host=max_per_host)
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        results = executor.map(
+            lambda name: scrape(name, get=gate.get, page_workers=page_workers),
+            names,
+        )
+        return dict(zip(names, results))
 
 def calculate_statistics(books):
     total_books = len(books)
@@ -90,23 +177,100 @@ def calculate_statistics(books):
 
 # Main script to extract categories, scrape books, and calculate statistics
 if __name__ == "__main__":
-    base_url = "https://books.toscrape.com/"
-    category_links = extract_categories(base_url)
-
-    # Iterate through each category and scrape books
-    for category_name, category_link in category_links.items():
-        # Skip the "Books" root category which contains all books
-        if category_name.lower() == 'books':
-            continue
+    parser = argparse.ArgumentParser(description="Scrape books.toscrape.com categories.")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Number of categories crawled concurrently (1 keeps the serial crawl).")
+    parser.add_argument('--page-workers', type=int, default=1,
+                        help="Number of pages of one category fetched concurrently.")
+    parser.add_argument('--max-per-host', type=int, default=2,
+                        help="Maximum number of requests in flight per host in concurrent mode.")
+    parser.add_argument('--resume', action='store_true',
+                        help="Resume an interrupted crawl from its checkpoint instead of starting over.")
+    parser.add_argument('--checkpoint', default=os.path.join('output', 'nombre_livres.checkpoint.json'),
+                        help="Path of the checkpoint file.")
+    parser.add_argument('--parse-workers', type=int, default=0,
+                        help="Number of parser processes (0 parses in the fetching threads).")
+    parser.add_argument('--delta', action='store_true',
+                        help="Only write the books added, modified or removed since the previous --delta run, "
+                             "to output/books.changes.jsonl.")
+    parser.add_argument('--fingerprints', default=os.path.join('output', 'nombre_livres.fingerprints.json'),
+                        help="Path of the fingerprints kept between --delta runs.")
+    parser.add_argument('--base-url', default="https://books.toscrape.com/",
+                        help="Base URL of the books website.")
+    args = parser.parse_args()
+
+    base_url = args.base_url
+    # One pooled keep-alive connection per request that can be in flight
+    session = create_session(pool_size=max(args.workers * args.page_workers, args.max_per_host, 10))
+    category_links = extract_categories(base_url, get=session.get)
+
+    # With --parse-workers, the fetching threads hand the raw pages to parser processes
+    parser_pool = ParserPool(args.parse_workers) if args.parse_workers else None
+
+    # Books are streamed to output/books.jsonl as each page is parsed; with --delta,
+    # only the changes since the previous run go to output/books.changes.jsonl
+    output_name = 'books.changes.jsonl' if args.delta else 'books.jsonl'
+    with JsonlSink(os.path.join('output', output_name), append=args.resume) as sink:
+        # Completed pages are checkpointed with the size of the output; on --resume they are
+        # restored instead of fetched, and the output is cut back to the books of those pages
+        if args.resume:
+            checkpoint = Checkpoint.load(args.checkpoint, sink=sink)
+        else:
+            checkpoint = Checkpoint(args.checkpoint, sink=sink)
+
+        # Books are identified by title within their category, and logged like the records of books.jsonl
+        category_names = {url: name for name, url in category_links.items()}
+        fingerprints = None
+        if args.delta:
+            fingerprints = FingerprintStore.load(
+                args.fingerprints, key=lambda book: book[0], changelog=sink,
+                describe=lambda listing, book: {'category': category_names.get(listing, listing),
+                                                'title': book[0], 'price': book[1]},
+            )
+        try:
+            books_by_category = scrape_categories(
+                category_links,
+                workers=args.workers,
+                page_workers=args.page_workers,
+                max_per_host=args.max_per_host,
+                get=session.get,
+                sink=None if fingerprints else sink,
+                checkpoint=checkpoint,
+                parser_pool=parser_pool,
+                fingerprints=fingerprints,
+            )
+        except BaseException:
+            checkpoint.close()
+            print(f"\nCrawl interrupted, run again with --resume to continue from '{args.checkpoint}'.")
+            raise
+        finally:
+            if parser_pool:
+                parser_pool.close()
+        if fingerprints:
+            changes = fingerprints.finish(complete=not args.resume)
+    checkpoint.discard()
+
+    if fingerprints:
+        print(f"\n{changes['added']} books added, {changes['modified']} modified, {changes['removed']} removed "
+              f"({changes['unchanged_pages']} pages unchanged), written to '{sink.path}'.")
+        sys.exit()
+
+    # Price distribution of every category at once (see analytics.py)
+    statistics = category_statistics(load_books(books_by_category))
+
+    # Iterate through each category and report its books
+    for category_name, books in books_by_category.items():
         print(f"\nProcessing category: {category_name}")
-        books = scrape_books_in_category(category_link)
-        
-        # Calculate statistics
+
+        # Count and average from the scraped float64 prices, exactly as the serial report printed them
         total_books, average_price = calculate_statistics(books)
-        
+
         # Display the results
         print(f" - Number of Books: {total_books}")
         print(f" - Average Price: £{average_price}")
+        if category_name in statistics.index:
+            row = statistics.loc[category_name]
+            print(f" - Min / Median / Max Price: £{row['min']:.2f} / £{row['p50']:.2f} / £{row['max']:.2f}")
         
         # Optionally, print all books
         for title, price in books:
@@ -0,0 +1,138 @@
+import json
+import os
+import sys
+import threading
+import time
+
+import metrics
+
+class JsonlSink:
+    """
+    Append-only JSON Lines writer for records accepted during a crawl.
+
+    Each record is written as one line and flushed to the OS as soon as it is
+    accepted, so a crash of the scraper loses nothing already written; the file
+    is also fsync'ed every `fsync_interval` seconds to survive a system crash.
+    Writes are serialized with a lock so worker threads can share one sink.
+    """
+
+    def __init__(self, path, append=False, fsync_interval=1.0):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.fsync_interval = fsync_interval
+        self.count = 0
+        self._file = open(path, 'a' if append else 'w', encoding='utf-8')
+        self._lock = threading.Lock()
+        self._last_fsync = time.monotonic()
+
+    def write(self, record):
+        """
+        Appends one record to the file.
+
+        Args:
+            record (dict): A JSON-serializable record.
+
+        Returns:
+            None
+        """
+        with metrics.timer('save'):
+            line = json.dumps(record, ensure_ascii=False) + '\n'
+            with self._lock:
+                self._file.write(line)
+                self._file.flush()
+                self.count += 1
+                if time.monotonic() - self._last_fsync >= self.fsync_interval:
+                    os.fsync(self._file.fileno())
+                    self._last_fsync = time.monotonic()
+
+    def sync(self):
+        """
+        Forces the records written so far to disk.
+
+        Returns:
+            int: Size of the file in bytes.
+        """
+        with self._lock:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._last_fsync = time.monotonic()
+            return os.fstat(self._file.fileno()).st_size
+
+    def truncate(self, size):
+        """Cuts the file back to `size` bytes, dropping the records written after that point."""
+        with self._lock:
+            self._file.flush()
+            if os.fstat(self._file.fileno()).st_size > size:
+                os.ftruncate(self._file.fileno(), size)
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+def read_jsonl(path):
+    """
+    Iterates over the records of a JSON Lines file.
+
+    A truncated last line, left by a run killed in the middle of a write, is skipped.
+
+    Args:
+        path (str): Path of the JSONL file.
+
+    Yields:
+        dict: One record per line.
+    """
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                if line.endswith('\n'):
+                    raise
+
+@metrics.timed('save')
+def jsonl_to_json(jsonl_path, json_path, indent=4):
+    """
+    Converts a JSON Lines file into a pretty-printed JSON array, one record at a time.
+
+    The output is byte-for-byte what json.dump(records, f, ensure_ascii=False,
+    indent=indent) writes, without holding the records in memory.
+
+    Args:
+        jsonl_path (str): Path of the JSONL file to read.
+        json_path (str): Path of the JSON file to write.
+        indent (int): Indentation of the JSON array.
+
+    Returns:
+        int: Number of records converted.
+    """
+    padding = ' ' * indent
+    count = 0
+    tmp_path = json_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as out:
+        for record in read_jsonl(jsonl_path):
+            element = json.dumps(record, ensure_ascii=False, indent=indent)
+            out.write('[\n' if count == 0 else ',\n')
+            out.write(padding + element.replace('\n', '\n' + padding))
+            count += 1
+        out.write('\n]' if count else '[]')
+    os.replace(tmp_path, json_path)
+    return count
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("Usage: python output_sink.py <input.jsonl> <output.json>")
+    converted = jsonl_to_json(sys.argv[1], sys.argv[2])
+    print(f"Converted {converted} records to '{sys.argv[2]}'")
@@ -0,0 +1,209 @@
+import re
+import time
+from collections import namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import nullcontext
+from urllib.parse import urljoin, urlsplit
+
+from extractors import NEXT_HREF, PAGER_CURRENT, parse_html
+
+PAGE_COUNT_PATTERN = re.compile(r'Page\s+\d+\s+of\s+(\d+)')
+LAST_NUMBER_PATTERN = re.compile(r'(\d+)(?=\D*$)')
+
+# Marks a page restored from the checkpoint instead of fetched
+RESTORED = object()
+
+# Returned by fetch_page for a page whose bytes match the previous run (see delta.py)
+UNCHANGED = object()
+
+# A listing page parsed in a parser process (see pipeline.ParserPool): its
+# extracted records and the pager links crawl_pages needs, without the tree
+ParsedPage = namedtuple('ParsedPage', ['records', 'next_href', 'total_pages'])
+
+def parse_page_count(tree):
+    """
+    Reads the total number of pages from a "Page X of N" pager.
+
+    Args:
+        tree (lxml.html.HtmlElement): The parsed listing page.
+
+    Returns:
+        int or None: The total number of pages, or None if the pager does not print it.
+    """
+    match = PAGE_COUNT_PATTERN.search(PAGER_CURRENT(tree))
+    if match:
+        return int(match.group(1))
+    return None
+
+def find_next_url(tree, current_url):
+    """
+    Resolves the href of the "next" pager button against the current page URL.
+
+    Args:
+        tree (lxml.html.HtmlElement): The parsed listing page.
+        current_url (str): The URL the page was fetched from.
+
+    Returns:
+        str or None: The absolute URL of the next page, or None on the last page.
+    """
+    next_href = NEXT_HREF(tree)
+    if next_href:
+        return urljoin(current_url, next_href)
+    return None
+
+def parse_listing(extract, content):
+    """
+    Parses a listing page in a parser process (see pipeline.ParserPool).
+
+    Args:
+        extract (callable): A module-level extractor taking the parsed page, such as
+            extractors.extract_books.
+        content (bytes): The raw page.
+
+    Returns:
+        ParsedPage: The extracted records and the pager links.
+    """
+    tree = parse_html(content)
+    return ParsedPage(extract(tree), NEXT_HREF(tree) or None, parse_page_count(tree))
+
+def plan_page_urls(page_two_url, total_pages):
+    """
+    Computes the URLs of pages 2..N from the URL of page 2.
+
+    The page number is taken to be the last number in the URL path, as in
+    'page-2.html' on books.toscrape.com or '/page/2/' on quotes.toscrape.com.
+
+    Args:
+        page_two_url (str): The absolute URL of the second page.
+        total_pages (int): The total number of pages.
+
+    Returns:
+        list or None: The URLs of pages 2..N, or None if the URL does not carry the page number.
+    """
+    parts = urlsplit(page_two_url)
+    match = LAST_NUMBER_PATTERN.search(parts.path)
+    if not match or match.group(1) != '2':
+        return None
+
+    start, end = match.span(1)
+    return [
+        parts._replace(path=parts.path[:start] + str(page) + parts.path[end:]).geturl()
+        for page in range(2, total_pages + 1)
+    ]
+
+def crawl_pages(first_url, fetch_page, extract_page, workers=1, delay=0, checkpoint=None, fingerprints=None):
+    """
+    Crawls a paginated listing, fetching pages 2..N in parallel when the pager gives N.
+
+    Page 1 is fetched first. If it prints "Page 1 of N", the remaining page URLs
+    are computed up front and fetched by a pool of workers; otherwise the crawl
+    falls back to following the "next" links one page at a time.
+
+    With a checkpoint, every completed page is saved with its records, and pages
+    completed by a previous run are restored from it instead of being fetched.
+    extract_page runs inside Checkpoint.recording(), so the records it writes to
+    the checkpoint's sink are saved together with the page.
+
+    With fingerprints (see delta.FingerprintStore), fetch_page may return
+    UNCHANGED for a page whose bytes match the previous run: the page is not
+    extracted and contributes no records, and the records of the other pages
+    are compared with the previous run under the listing `first_url`.
+
+    Args:
+        first_url (str): The URL of the first page of the listing.
+        fetch_page (callable): fetch_page(url, page_number) returning the parsed page
+            (see extractors.parse_html), or None if the page could not be retrieved.
+            It may also return a ParsedPage, or the Future of one submitted to a
+            pipeline.ParserPool with parse_listing, so that pages are parsed in other
+            processes while the fetching threads go on fetching.
+        extract_page (callable): extract_page(tree, page_number) returning the list of
+            records on the page, or None to stop the crawl at this page; it receives
+            the ParsedPage when fetch_page returns one.
+        workers (int): Number of pages fetched at the same time once the URLs are planned.
+        delay (float): Pause in seconds between two pages when fetching one at a time.
+        checkpoint (Checkpoint): Optional crawl state to resume from and save to.
+        fingerprints (FingerprintStore): Optional fingerprints of the previous run.
+
+    Returns:
+        list: The records of every page (of every changed page with fingerprints), in page order.
+    """
+    def fetch(url, page_number):
+        if checkpoint and checkpoint.page(url) is not None:
+            return RESTORED
+        if delay and page_number > 1 and workers <= 1:
+            time.sleep(delay)  # Pause to avoid overwhelming the server
+        return fetch_page(url, page_number)
+
+    def process(url, page_number, tree):
+        # Returns (records, next_url, total_pages), or None to stop the crawl
+        if tree is RESTORED:
+            page = checkpoint.page(url)
+            if fingerprints:
+                # Its changes were logged by the run that completed it
+                fingerprints.complete_page(first_url, url, page['records'], page['next_url'], page['total_pages'],
+                                           log=False)
+            return page['records'], page['next_url'], page['total_pages']
+        if tree is UNCHANGED:
+            fingerprints.keep_page(first_url, url)
+            next_url, total_pages = fingerprints.page(url)
+            return [], next_url, total_pages
+        if isinstance(tree, Future):
+            tree = tree.result()
+        with checkpoint.recording() if checkpoint else nullcontext():
+            records = extract_page(tree, page_number) if tree is not None else None
+            if records is None:
+                if fingerprints:
+                    fingerprints.fail(first_url)
+                return None
+            if isinstance(tree, ParsedPage):
+                next_url = urljoin(url, tree.next_href) if tree.next_href else None
+                total_pages = tree.total_pages
+            else:
+                next_url = find_next_url(tree, url)
+                total_pages = parse_page_count(tree)
+            if fingerprints:
+                fingerprints.complete_page(first_url, url, records, next_url, total_pages)
+            if checkpoint:
+                checkpoint.complete_page(url, records, next_url, total_pages)
+        return records, next_url, total_pages
+
+    first_page = process(first_url, 1, fetch(first_url, 1))
+    if first_page is None:
+        return []
+    records, next_url, total_pages = first_page
+    records = list(records)
+
+    planned_urls = plan_page_urls(next_url, total_pages) if next_url and total_pages else None
+
+    if planned_urls is None:
+        # Total unknown: follow the "next" links
+        page_number = 1
+        while next_url:
+            page_number += 1
+            page = process(next_url, page_number, fetch(next_url, page_number))
+            if page is None:
+                break
+            page_records, next_url, _ = page
+            records.extend(page_records)
+        return records
+
+    if checkpoint:
+        checkpoint.enqueue(planned_urls)
+    page_numbers = range(2, len(planned_urls) + 2)
+    if workers <= 1:
+        trees = map(fetch, planned_urls, page_numbers)
+        return records + _collect(planned_urls, page_numbers, trees, process)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        trees = executor.map(fetch, planned_urls, page_numbers)
+        return records + _collect(planned_urls, page_numbers, trees, process)
+
+def _collect(urls, page_numbers, trees, process):
+    # Stop at the first failed or empty page, like the "next"-link crawl does
+    records = []
+    for url, page_number, tree in zip(urls, page_numbers, trees):
+        page = process(url, page_number, tree)
+        if page is None:
+            break
+        records.extend(page[0])
+    return records
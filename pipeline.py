@@ -0,0 +1,73 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from extractors import parse_html
+
+def parse_document(extract, content):
+    """
+    Parses raw page bytes and runs an extractor on the tree, in a parser process.
+
+    Args:
+        extract (callable): A module-level extractor taking the parsed page, such as
+            extractors.extract_book_detail.
+        content (bytes): The raw page.
+
+    Returns:
+        The extractor's result.
+    """
+    return extract(parse_html(content))
+
+class ParserPool:
+    """
+    Pool of parser processes fed with raw response bytes by the fetching threads.
+
+    Parsing and extraction hold the GIL, so once fetching is concurrent they
+    become the bottleneck of a crawl; the pool runs them on every core instead.
+    A fetching thread hands its page over with submit() and goes back to
+    fetching. At most `max_pending` pages wait for or go through the parsers;
+    beyond that, submit() blocks, which slows the fetching down to the pace of
+    the parsers (backpressure) instead of piling up pages in memory.
+
+    The functions and arguments sent to the pool must be picklable: module-level
+    functions, bytes and plain data.
+    """
+
+    def __init__(self, workers=None, max_pending=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or 2 * self.workers
+        # Forking a process that runs threads can deadlock; start the parsers from a clean server process
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+
+    def submit(self, function, *args):
+        """
+        Queues a parsing job, blocking while `max_pending` jobs are already queued.
+
+        Args:
+            function (callable): A module-level function, parse_document for instance.
+            *args: Its picklable arguments.
+
+        Returns:
+            concurrent.futures.Future: The future result of the job.
+        """
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(function, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def close(self):
+        self._executor.shutdown(cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -1,7 +1,18 @@
-import requests
-from bs4 import BeautifulSoup
+import argparse
+import os
 from urllib.parse import urljoin
-import time
+
+from analytics import load_quotes, top_tags
+from checkpoint import Checkpoint
+from delta import FingerprintStore
+from extractors import extract_quotes as extract_page_quotes, input_value, parse_html
+from http_client import create_session
+from output_sink import JsonlSink
+from pagination import UNCHANGED, ParsedPage, crawl_pages, find_next_url, parse_listing, parse_page_count
+from pipeline import ParserPool
+from quote_sources import SOURCES, crawl_quotes
+from records import quote_key
+from session_pool import SessionPool
 
 def login(session, login_url, username, password):
     """
@@ -13,8 +24,7 @@ def login(session, login_url, username, password):
         print(f"Échec de l'accès à la page de login, code d'état : {response.status_code}")
         return False
     
-    soup = BeautifulSoup(response.text, 'html.parser')
-    csrf_token = soup.find('input', {'name': 'csrf_token'})['value']
+    csrf_token = input_value(parse_html(response.content), 'csrf_token')
     
     # Préparer les données de connexion
     payload = {
@@ -41,67 +51,60 @@ def get_total_pages(session, base_url):
         print(f"Échec de l'accès à la page, code d'état : {response.status_code}")
         return 0
     
-    soup = BeautifulSoup(response.text, 'html.parser')
-    pagination = soup.find('ul', class_='pager')
-    if pagination:
-        next_button = pagination.find('li', class_='next')
-        if next_button:
-            # Supposons qu'il y a un bouton "next", donc au moins 2 pages
-            # Pour déterminer le nombre exact, on peut parcourir jusqu'à ce qu'il n'y ait plus de "next"
-            page_count = 1
-            while next_button:
-                page_count += 1
-                next_href = next_button.find('a')['href']
-                next_url = urljoin(base_url, next_href)
-                response = session.get(next_url)
-                if response.status_code != 200:
-                    break
-                soup = BeautifulSoup(response.text, 'html.parser')
-                pagination = soup.find('ul', class_='pager')
-                next_button = pagination.find('li', class_='next') if pagination else None
-            return page_count
-        else:
-            # Une seule page
-            return 1
-    else:
-        # Pas de pagination, une seule page
-        return 1
+    tree = parse_html(response.content)
+
+    # Si la pagination affiche « Page 1 of N », inutile de parcourir les pages
+    page_count = parse_page_count(tree)
+    if page_count:
+        return page_count
+
+    # Sinon on parcourt jusqu'à ce qu'il n'y ait plus de bouton "next"
+    page_count = 1
+    next_url = find_next_url(tree, base_url)
+    while next_url:
+        page_count += 1
+        response = session.get(next_url)
+        if response.status_code != 200:
+            break
+        next_url = find_next_url(parse_html(response.content), next_url)
+    return page_count
 
-def extract_quotes(session, base_url):
+def extract_quotes(session, base_url, workers=1, sink=None, checkpoint=None, parser_pool=None, fingerprints=None):
     """
     Extrait toutes les citations du site.
+
+    Si la pagination affiche « Page X of N », les pages 2..N sont calculées à
+    partir de la première et récupérées par `workers` threads ; sinon on suit
+    les liens « next » page par page. Si un `sink` (JsonlSink) est fourni, chaque
+    citation y est écrite dès que sa page est analysée. Avec un `checkpoint`, les
+    pages déjà traitées lors d'une exécution précédente ne sont pas récupérées à nouveau.
+    Avec un `parser_pool` (voir pipeline.py), les pages sont analysées dans des processus
+    séparés pendant que les threads continuent à récupérer les suivantes.
+    Avec des `fingerprints` (voir delta.py), les pages identiques à l'exécution précédente
+    ne sont pas analysées et leurs citations ne sont pas renvoyées.
     """
-    all_quotes = []
-    current_url = base_url
-    page_number = 1
-    
-    while current_url:
-        print(f"Extraction des citations de la page {page_number}: {current_url}")
-        response = session.get(current_url)
+    def fetch_page(url, page_number):
+        print(f"Extraction des citations de la page {page_number}: {url}")
+        response = session.get(url)
         if response.status_code != 200:
-            print(f"Échec de l'accès à la page {current_url}, code d'état : {response.status_code}")
-            break
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
-        quotes = soup.find_all('div', class_='quote')
-        
-        for quote in quotes:
-            text = quote.find('span', class_='text').get_text(strip=True)
-            author = quote.find('small', class_='author').get_text(strip=True)
-            tags = [tag.get_text(strip=True) for tag in quote.find_all('a', class_='tag')]
-            all_quotes.append({'text': text, 'author': author, 'tags': tags})
-        
-        # Vérifier s'il y a une page suivante
-        next_button = soup.find('li', class_='next')
-        if next_button:
-            next_href = next_button.find('a')['href']
-            current_url = urljoin(current_url, next_href)
-            page_number += 1
-            time.sleep(1)  # Pause pour ne pas surcharger le serveur
-        else:
-            current_url = None  # Plus de pages
-    
-    return all_quotes
+            print(f"Échec de l'accès à la page {url}, code d'état : {response.status_code}")
+            return None
+        if fingerprints and fingerprints.unchanged(url, response.content):
+            return UNCHANGED
+        if parser_pool:
+            return parser_pool.submit(parse_listing, extract_page_quotes, response.content)
+        return parse_html(response.content)
+
+    def extract_page(tree, page_number):
+        page_quotes = tree.records if isinstance(tree, ParsedPage) else extract_page_quotes(tree)
+        if sink:
+            for quote in page_quotes:
+                sink.write(quote)
+        return page_quotes
+
+    # Le rythme des requêtes est réglé par le limiteur de débit de la session (voir rate_limiter.py)
+    return crawl_pages(base_url, fetch_page, extract_page, workers=workers, checkpoint=checkpoint,
+                       fingerprints=fingerprints)
 
 def answer_questions(quotes):
     """
@@ -122,40 +125,113 @@ def answer_questions(quotes):
     else:
         print("Moins de cinq citations trouvées.")
     
-    # Calculer le tag le plus répétitif
-    tag_counts = {}
-    for quote in quotes:
-        for tag in quote['tags']:
-            tag_counts[tag] = tag_counts.get(tag, 0) + 1
+    # Calculer le tag le plus répétitif (comptage vectorisé, voir analytics.py)
+    _, tags = load_quotes(quotes)
+    tag_counts = top_tags(tags, k=1)
     
-    if tag_counts:
-        most_repetitive_tag = max(tag_counts, key=tag_counts.get)
-        print(f"Tag le plus répétitif : {most_repetitive_tag} (apparaît {tag_counts[most_repetitive_tag]} fois)")
+    if not tag_counts.empty:
+        most_repetitive_tag = tag_counts.index[0]
+        print(f"Tag le plus répétitif : {most_repetitive_tag} (apparaît {tag_counts.iloc[0]} fois)")
     else:
         print("Aucun tag trouvé.")
 
 def main():
-    base_url = "https://quotes.toscrape.com/"
+    parser = argparse.ArgumentParser(description="Extrait les citations de quotes.toscrape.com après connexion.")
+    parser.add_argument('--resume', action='store_true',
+                        help="Reprend une extraction interrompue à partir de son checkpoint.")
+    parser.add_argument('--checkpoint', default=os.path.join('output', 'question_2_to_6.checkpoint.json'),
+                        help="Chemin du fichier de checkpoint.")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Nombre de sessions connectées et de pages récupérées en parallèle.")
+    parser.add_argument('--cookies', default=os.path.join('output', 'sessions.json'),
+                        help="Fichier où les cookies des sessions sont conservés entre deux exécutions.")
+    parser.add_argument('--parse-workers', type=int, default=0,
+                        help="Nombre de processus d'analyse des pages (0 : analyse dans les threads de récupération).")
+    parser.add_argument('--delta', action='store_true',
+                        help="N'écrit que les citations ajoutées, modifiées ou supprimées depuis la précédente "
+                             "exécution --delta, dans output/quotes_login.changes.jsonl.")
+    parser.add_argument('--fingerprints', default=os.path.join('output', 'question_2_to_6.fingerprints.json'),
+                        help="Fichier des empreintes conservées entre deux exécutions --delta.")
+    parser.add_argument('--source', choices=('html', 'auto', *SOURCES), default='html',
+                        help="'html' lit les pages de citations après connexion ; 'api' lit l'API JSON, 'js' les "
+                             "données des pages /js, 'browser' les pages /js rendues par un navigateur headless, "
+                             "et 'auto' essaie ces trois sources dans l'ordre, sans connexion.")
+    parser.add_argument('--base-url', default="https://quotes.toscrape.com/")
+    args = parser.parse_args()
+
+    base_url = args.base_url
     login_url = urljoin(base_url, "login")
     
     # Informations de connexion 
     username = "username"  
     password = "password" 
     
-    # Créer une session
-    session = requests.Session()
+    if args.source == 'html':
+        # Un pool de sessions connectées (voir session_pool.py) : les cookies sont restaurés
+        # depuis le disque s'ils existent, et une session expirée se reconnecte d'elle-même
+        session = SessionPool(
+            lambda pooled: login(pooled, login_url, username, password),
+            size=args.workers,
+            cookie_path=args.cookies,
+        )
+    else:
+        # L'API JSON et les pages /js sont publiques : une session simple suffit
+        session = create_session()
     
     # Se connecter
-    if login(session, login_url, username, password):
-        # Déterminer le nombre total de pages
-        total_pages = get_total_pages(session, base_url)
-        print(f"Nombre total de pages : {total_pages}")
+    if args.source != 'html' or session.open():
+        if args.source == 'html':
+            # Déterminer le nombre total de pages
+            total_pages = get_total_pages(session, base_url)
+            print(f"Nombre total de pages : {total_pages}")
         
-        # Extraire toutes les citations
-        quotes = extract_quotes(session, base_url)
+        # Extraire toutes les citations, enregistrées au fil de l'eau dans output/quotes_login.jsonl ;
+        # avec --delta, seules les modifications depuis l'exécution précédente sont écrites
+        output_name = 'quotes_login.changes.jsonl' if args.delta else 'quotes_login.jsonl'
+        with JsonlSink(os.path.join('output', output_name), append=args.resume) as sink:
+            # Les pages terminées sont enregistrées dans le checkpoint avec la taille du fichier de sortie ;
+            # avec --resume elles sont restaurées au lieu d'être récupérées, et le fichier est ramené
+            # aux citations de ces pages
+            if args.resume:
+                checkpoint = Checkpoint.load(args.checkpoint, sink=sink)
+            else:
+                checkpoint = Checkpoint(args.checkpoint, sink=sink)
+            # Les citations sont identifiées par l'empreinte de leur texte normalisé
+            fingerprints = None
+            if args.delta:
+                fingerprints = FingerprintStore.load(args.fingerprints, key=lambda quote: quote_key(quote['text']).hex(),
+                                                     changelog=sink)
+            parser_pool = ParserPool(args.parse_workers) if args.parse_workers else None
+            try:
+                if args.source == 'html':
+                    quotes = extract_quotes(session, base_url, workers=args.workers,
+                                            sink=None if fingerprints else sink, checkpoint=checkpoint,
+                                            parser_pool=parser_pool, fingerprints=fingerprints)
+                else:
+                    # Sans analyser les pages rendues (voir quote_sources.py)
+                    quotes, source = crawl_quotes(base_url, get=session.get, source=args.source,
+                                                  sink=None if fingerprints else sink, checkpoint=checkpoint,
+                                                  fingerprints=fingerprints)
+                    print(f"Source des citations : {source}")
+            except BaseException:
+                checkpoint.close()
+                print(f"\nExtraction interrompue, relancez avec --resume pour reprendre depuis '{args.checkpoint}'.")
+                raise
+            finally:
+                if parser_pool:
+                    parser_pool.close()
+            if fingerprints:
+                # Comme pour les livres : une reprise ne signale pas comme supprimé ce qu'elle n'a pas parcouru
+                changes = fingerprints.finish(complete=not args.resume)
+        checkpoint.discard()
         
-        # Répondre aux questions
-        answer_questions(quotes)
+        if fingerprints:
+            print(f"\n{changes['added']} citations ajoutées, {changes['modified']} modifiées, "
+                  f"{changes['removed']} supprimées ({changes['unchanged_pages']} pages inchangées), "
+                  f"écrites dans '{sink.path}'.")
+        else:
+            # Répondre aux questions
+            answer_questions(quotes)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,251 @@
+import argparse
+import json
+import os
+import re
+import threading
+import time
+
+from output_sink import read_jsonl
+from records import quote_key
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# Files the scrapers write quotes to, in the order they are indexed
+QUOTE_SOURCES = (
+    os.path.join('output', 'quotes.json'),
+    os.path.join('output', 'quotes.jsonl'),
+    os.path.join('output', 'quotes_login.jsonl'),
+    os.path.join('output', 'quotes_api.jsonl'),
+)
+
+def tokenize(text):
+    """
+    Splits a text into lowercase word tokens.
+
+    Args:
+        text (str): The text to split.
+
+    Returns:
+        list: The tokens, in order.
+    """
+    return TOKEN_PATTERN.findall(text.lower()) if text else []
+
+class QuoteIndex:
+    """
+    In-memory inverted index over quotes, with postings per text token, author and tag.
+
+    Quotes are added incrementally and deduplicated by their normalized text
+    (see records.quote_key). A text query keeps the semantics of a
+    case-insensitive substring search: its tokens select candidate quotes from
+    the postings of every indexed token containing them, and the candidates are
+    then checked against the whole phrase. Token expansions are cached, so a
+    repeated query only intersects a few small sets.
+    """
+
+    def __init__(self, quotes=()):
+        self.quotes = []
+        self.tokens = {}
+        self.authors = {}
+        self.tags = {}
+        self._keys = {}
+        self._expansions = {}
+        self._lock = threading.Lock()
+        self.add_many(quotes)
+
+    def __len__(self):
+        return len(self.quotes)
+
+    def add(self, quote):
+        """
+        Indexes a quote unless a quote with the same normalized text is already indexed.
+
+        Args:
+            quote (dict): A dictionary with 'text', 'author' and 'tags'.
+
+        Returns:
+            int or None: The id of the new quote, or None if it was a duplicate.
+        """
+        if not quote.get('text'):
+            return None
+        key = quote_key(quote['text'])
+        with self._lock:
+            if key in self._keys:
+                return None
+            quote_id = len(self.quotes)
+            self.quotes.append(quote)
+            self._keys[key] = quote_id
+            for token in set(tokenize(quote['text'])):
+                if token not in self.tokens:
+                    self.tokens[token] = set()
+                    # Keep the cached expansions of the query tokens up to date
+                    for fragment, expansion in self._expansions.items():
+                        if fragment in token:
+                            expansion.add(token)
+                self.tokens[token].add(quote_id)
+            self.authors.setdefault(quote.get('author'), set()).add(quote_id)
+            for tag in quote.get('tags') or ():
+                self.tags.setdefault(tag, set()).add(quote_id)
+            return quote_id
+
+    def add_many(self, quotes):
+        """
+        Indexes several quotes.
+
+        Args:
+            quotes (iterable): Quote dictionaries.
+
+        Returns:
+            int: Number of quotes that were new.
+        """
+        return sum(self.add(quote) is not None for quote in quotes)
+
+    def update_from(self, path):
+        """
+        Indexes the new quotes of a .json or .jsonl file written by the scrapers.
+
+        Args:
+            path (str): Path of the file; a missing file is ignored.
+
+        Returns:
+            int: Number of quotes that were new.
+        """
+        if not os.path.exists(path):
+            return 0
+        if path.endswith('.jsonl'):
+            return self.add_many(read_jsonl(path))
+        with open(path, encoding='utf-8') as f:
+            return self.add_many(json.load(f))
+
+    def _text_candidates(self, token):
+        if token not in self._expansions:
+            self._expansions[token] = {indexed for indexed in self.tokens if token in indexed}
+        candidates = set()
+        for indexed in self._expansions[token]:
+            candidates |= self.tokens[indexed]
+        return candidates
+
+    def query(self, author=None, tag=None, text=None):
+        """
+        Returns the quotes matching every given criterion.
+
+        Args:
+            author (str): Exact author name.
+            tag (str): Exact tag.
+            text (str): Phrase the quote text must contain, case-insensitively.
+
+        Returns:
+            list: The matching quote dictionaries, in the order they were indexed.
+        """
+        with self._lock:
+            postings = []
+            if author is not None:
+                postings.append(self.authors.get(author, set()))
+            if tag is not None:
+                postings.append(self.tags.get(tag, set()))
+            for token in set(tokenize(text)):
+                postings.append(self._text_candidates(token))
+
+            if postings:
+                postings.sort(key=len)
+                matches = set(postings[0]).intersection(*postings[1:])
+            else:
+                matches = range(len(self.quotes))
+            if text:
+                phrase = text.lower()
+                matches = [quote_id for quote_id in matches if phrase in self.quotes[quote_id]['text'].lower()]
+            return [self.quotes[quote_id] for quote_id in sorted(matches)]
+
+    def save(self, path):
+        """
+        Writes the index atomically (temporary file + rename) as JSON.
+
+        Args:
+            path (str): Path of the index file.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            state = json.dumps({
+                'quotes': self.quotes,
+                'tokens': {token: sorted(ids) for token, ids in self.tokens.items()},
+                'authors': [[author, sorted(ids)] for author, ids in self.authors.items()],
+                'tags': {tag: sorted(ids) for tag, ids in self.tags.items()},
+            }, ensure_ascii=False)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(state)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Reads an index written by save.
+
+        Args:
+            path (str): Path of the index file.
+
+        Returns:
+            QuoteIndex: The saved index, or an empty index if the file does not exist.
+        """
+        index = cls()
+        if not os.path.exists(path):
+            return index
+        with open(path, encoding='utf-8') as f:
+            state = json.load(f)
+        index.quotes = state['quotes']
+        index._keys = {quote_key(quote['text']): quote_id for quote_id, quote in enumerate(index.quotes)}
+        index.tokens = {token: set(ids) for token, ids in state['tokens'].items()}
+        index.authors = {author: set(ids) for author, ids in state['authors']}
+        index.tags = {tag: set(ids) for tag, ids in state['tags'].items()}
+        return index
+
+def build_index(path=os.path.join('output', 'quotes_index.json'), sources=QUOTE_SOURCES):
+    """
+    Loads the saved index and adds the quotes the scrapers collected since.
+
+    Args:
+        path (str): Path of the index file; it is rewritten when new quotes were added.
+        sources (iterable): Quote files to index.
+
+    Returns:
+        QuoteIndex: The up-to-date index.
+    """
+    index = QuoteIndex.load(path)
+    added = sum(index.update_from(source) for source in sources)
+    if added:
+        index.save(path)
+    return index
+
+def main():
+    """
+    Answers a query from the index of the collected quotes.
+
+    Args:
+        None
+
+    Returns:
+        None
+    """
+    parser = argparse.ArgumentParser(description="Query the quotes collected by the scrapers.")
+    parser.add_argument('--author', help="Exact author name.")
+    parser.add_argument('--tag', help="Exact tag.")
+    parser.add_argument('--text', help="Phrase the quote must contain.")
+    parser.add_argument('--index', default=os.path.join('output', 'quotes_index.json'),
+                        help="Path of the index file.")
+    args = parser.parse_args()
+
+    index = build_index(args.index)
+    started = time.perf_counter()
+    quotes = index.query(author=args.author, tag=args.tag, text=args.text)
+    elapsed = time.perf_counter() - started
+
+    print(f"{len(quotes)} of {len(index)} quotes match ({elapsed * 1e6:.0f} µs):")
+    for quote in quotes:
+        print(f" - \"{quote['text']}\" ({quote['author']}; {', '.join(quote['tags'])})")
+
+if __name__ == "__main__":
+    main()
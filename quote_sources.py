@@ -0,0 +1,219 @@
+import argparse
+import os
+from urllib.parse import urljoin
+
+from extractors import extract_api_quotes, extract_inline_quotes, extract_quotes
+from http_client import create_session
+from output_sink import JsonlSink
+from pagination import UNCHANGED, ParsedPage, crawl_pages, parse_listing
+
+# Browserless sources first: the JSON API, then the data inlined in the /js pages;
+# a headless browser rendering /js is the last resort
+SOURCES = ('api', 'js', 'browser')
+
+def fetch_api_page(get, url, fingerprints=None):
+    """
+    Fetches one page of the JSON API (/api/quotes?page=N).
+
+    Args:
+        get (callable): Function used to fetch a URL, a session's get.
+        url (str): The URL of the page.
+        fingerprints (FingerprintStore): Optional fingerprints of the previous run (see delta.py).
+
+    Returns:
+        ParsedPage, UNCHANGED or None: The quotes and the next page, or None if the page
+        could not be retrieved or is not JSON.
+    """
+    response = get(url)
+    if response.status_code != 200:
+        print(f"Failed to retrieve {url}, status code: {response.status_code}")
+        return None
+    if fingerprints and fingerprints.unchanged(url, response.content):
+        return UNCHANGED
+    try:
+        payload = response.json()
+    except ValueError:
+        print(f"No JSON at {url}")
+        return None
+    quotes, has_next = extract_api_quotes(payload)
+    # The next page is the same URL with the next page number
+    next_href = f"?page={int(payload.get('page') or 1) + 1}" if has_next else None
+    return ParsedPage(quotes, next_href, None)
+
+def fetch_js_page(get, url, fingerprints=None):
+    """
+    Fetches one JavaScript-rendered page (/js) and reads the quotes inlined in its script.
+
+    Args:
+        get (callable): Function used to fetch a URL, a session's get.
+        url (str): The URL of the page.
+        fingerprints (FingerprintStore): Optional fingerprints of the previous run (see delta.py).
+
+    Returns:
+        ParsedPage, UNCHANGED or None: The quotes and the "next" link, or None if the page
+        could not be retrieved.
+    """
+    response = get(url)
+    if response.status_code != 200:
+        print(f"Failed to retrieve {url}, status code: {response.status_code}")
+        return None
+    if fingerprints and fingerprints.unchanged(url, response.content):
+        return UNCHANGED
+    return parse_listing(extract_inline_quotes, response.content)
+
+class BrowserFetcher:
+    """
+    Headless Chrome rendering the /js pages, for when their source cannot be read directly.
+
+    It costs hundreds of MB and about a second per page, against milliseconds
+    for the browserless sources, so it is only started when they fail. Selenium
+    and a Chrome install are optional: without them, open() returns False.
+    """
+
+    def __init__(self, timeout=10):
+        self.timeout = timeout
+        self.driver = None
+
+    def open(self):
+        """
+        Starts the headless browser.
+
+        Returns:
+            bool: True if the browser is running.
+        """
+        try:
+            from selenium import webdriver
+            from selenium.common.exceptions import WebDriverException
+        except ImportError:
+            print("Selenium is not installed, no browser fallback.")
+            return False
+        options = webdriver.ChromeOptions()
+        options.add_argument('--headless=new')
+        try:
+            self.driver = webdriver.Chrome(options=options)
+        except WebDriverException as e:
+            print(f"Could not start a headless browser: {e.msg}")
+            return False
+        return True
+
+    def __call__(self, url):
+        """
+        Renders a page and extracts its quotes from the resulting DOM.
+
+        Args:
+            url (str): The URL of the page.
+
+        Returns:
+            ParsedPage: The quotes and the "next" link.
+        """
+        from selenium.common.exceptions import TimeoutException
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        self.driver.get(url)
+        try:
+            WebDriverWait(self.driver, self.timeout).until(
+                expected_conditions.presence_of_element_located((By.CSS_SELECTOR, 'div.quote'))
+            )
+        except TimeoutException:
+            print(f"No quote rendered at {url}")
+        return parse_listing(extract_quotes, self.driver.page_source.encode('utf-8'))
+
+    def close(self):
+        if self.driver:
+            self.driver.quit()
+            self.driver = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def crawl_quotes(base_url, get=None, source='auto', sink=None, checkpoint=None, fingerprints=None):
+    """
+    Collects every quote without parsing the rendered quote pages.
+
+    With source='auto', the JSON API is tried first, then the data inlined in
+    the /js pages, then a headless browser; the next source is only tried when
+    the first page of the previous one cannot be read.
+
+    Args:
+        base_url (str): The base URL of the quotes website.
+        get (callable): Function used to fetch a URL; defaults to a new session's get.
+        source (str): 'api', 'js', 'browser' or 'auto'.
+        sink (JsonlSink): Optional sink receiving each quote as soon as its page is read.
+        checkpoint (Checkpoint): Optional crawl state (see crawl_pages).
+        fingerprints (FingerprintStore): Optional fingerprints of the previous run (see delta.py).
+
+    Returns:
+        tuple: (quotes, source), the list of quotes in page order and the source they came
+        from, or ([], None) if no source could be read.
+    """
+    get = get or create_session().get
+    sources = SOURCES if source == 'auto' else (source,)
+
+    for name in sources:
+        pages_read = 0
+
+        def extract_page(page, page_number):
+            nonlocal pages_read
+            if not page.records:
+                return None
+            pages_read += 1
+            if sink:
+                for quote in page.records:
+                    sink.write(quote)
+            return page.records
+
+        def track(page):
+            # Unchanged pages are not extracted, but they show the source works
+            nonlocal pages_read
+            if page is UNCHANGED:
+                pages_read += 1
+            return page
+
+        first_url = urljoin(base_url, 'api/quotes?page=1' if name == 'api' else 'js/')
+        # A first page restored from the checkpoint was read from this source by the interrupted run
+        if checkpoint and checkpoint.page(first_url) is not None:
+            pages_read += 1
+
+        if name == 'browser':
+            with BrowserFetcher() as browser:
+                if not browser.open():
+                    continue
+                quotes = crawl_pages(first_url, lambda url, page_number: browser(url),
+                                     extract_page, checkpoint=checkpoint, fingerprints=fingerprints)
+        else:
+            fetch = fetch_api_page if name == 'api' else fetch_js_page
+            quotes = crawl_pages(first_url, lambda url, page_number: track(fetch(get, url, fingerprints)),
+                                 extract_page, checkpoint=checkpoint, fingerprints=fingerprints)
+        if pages_read:
+            return quotes, name
+        print(f"No quotes from the '{name}' source.")
+    return [], None
+
+def main():
+    """
+    Collects every quote from the JSON API or the /js pages, with a browser as a fallback.
+
+    Args:
+        None
+
+    Returns:
+        None
+    """
+    parser = argparse.ArgumentParser(description="Collect the quotes of quotes.toscrape.com without a browser.")
+    parser.add_argument('--source', choices=('auto', *SOURCES), default='auto',
+                        help="Where the quotes are read; 'auto' tries each source in turn.")
+    parser.add_argument('--base-url', default="https://quotes.toscrape.com/",
+                        help="Base URL of the quotes website.")
+    args = parser.parse_args()
+
+    with JsonlSink(os.path.join('output', 'quotes_api.jsonl')) as sink:
+        quotes, source = crawl_quotes(args.base_url, source=args.source, sink=sink)
+    print(f"\n{len(quotes)} quotes read from the '{source}' source, written to '{sink.path}'.")
+
+if __name__ == "__main__":
+    main()
@@ -1,65 +1,243 @@
+import argparse
 import requests
-from bs4 import BeautifulSoup
+import threading
 import time
-import json
 import os
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
 
-def fetch_random_quote(session):
+from extractors import extract_first_quote, extract_quotes, parse_html
+from http_client import create_session
+from output_sink import JsonlSink, jsonl_to_json
+from pagination import crawl_pages
+from pipeline import ParserPool, parse_document
+from records import quote_key
+
+# Random draws needed before the coverage estimate is trusted: with a handful of
+# draws, two identical ones leave no singleton and the estimate reads 100%
+MIN_ESTIMATE_DRAWS = 20
+
+def fetch_random_quote(session, base_url="https://quotes.toscrape.com/", parser_pool=None):
     """
     Fetches a random quote from the website.
     
     Args:
         session (requests.Session): The session object to make requests.
+        base_url (str): The base URL of the website.
+        parser_pool (ParserPool): Optional pool of parser processes the page is parsed in (see pipeline.py).
         
     Returns:
         dict or None: A dictionary containing the quote text, author, and tags if successful; otherwise, None.
     """
-    url = "https://quotes.toscrape.com/random"
+    url = urljoin(base_url, "random")
     try:
         response = session.get(url, timeout=5)
         if response.status_code == 200:
-            soup = BeautifulSoup(response.text, 'html.parser')
-            quote_div = soup.find('div', class_='quote')
-            if quote_div:
-                # Attempt to find the quote text in 'span.text' or 'span.content'
-                text_tag = quote_div.find('span', class_='text') or quote_div.find('span', class_='content')
-                # Attempt to find the author in 'small.author' or 'span.author'
-                author_tag = quote_div.find('small', class_='author') or quote_div.find('span', class_='author')
-                
-                # Extract text and author if tags are found
-                text = text_tag.get_text(strip=True) if text_tag else "No text found"
-                author = author_tag.get_text(strip=True) if author_tag else "No author found"
-                # Extract all tags associated with the quote
-                tags = [tag.get_text(strip=True) for tag in quote_div.find_all('a', class_='tag')]
+            # Text comes from 'span.text' or 'span.content', author from 'small.author' or 'span.author'
+            if parser_pool:
+                quote = parser_pool.submit(parse_document, extract_first_quote, response.content).result()
+            else:
+                quote = extract_first_quote(parse_html(response.content))
+            if quote:
+                # Fill in placeholders if the text or author was not found
+                if quote['text'] is None:
+                    quote['text'] = "No text found"
+                if quote['author'] is None:
+                    quote['author'] = "No author found"
                 
-                return {'text': text, 'author': author, 'tags': tags}
+                return quote
     except requests.RequestException as e:
         print(f"Request failed: {e}")
     return None
 
-def save_quotes_to_file(quotes, output_dir='output', filename='quotes.json'):
+def estimate_coverage(sighting_counts):
     """
-    Saves the collected quotes to a JSON file in the specified directory.
+    Estimates how much of the quote population the random draws have already seen.
+    
+    Uses the Good-Turing sample coverage (1 - f1/n) and the Chao1 estimate of the
+    number of distinct quotes (S + f1^2 / 2 f2), where f1 and f2 are the number of
+    quotes drawn exactly once and exactly twice, and n the number of draws.
     
     Args:
-        quotes (list): A list of dictionaries containing quote details.
-        output_dir (str): The directory where the JSON file will be saved.
-        filename (str): The name of the JSON file.
+        sighting_counts (dict): Mapping of quote key to the number of times it was drawn.
         
     Returns:
-        None
+        tuple: (coverage, estimated_distinct) with coverage between 0.0 and 1.0.
     """
-    # Ensure the output directory exists
-    os.makedirs(output_dir, exist_ok=True)
-    # Define the full path to the output file
-    output_path = os.path.join(output_dir, filename)
+    draws = sum(sighting_counts.values())
+    if draws == 0:
+        return 0.0, 0.0
+    seen = len(sighting_counts)
+    singletons = sum(1 for count in sighting_counts.values() if count == 1)
+    doubletons = sum(1 for count in sighting_counts.values() if count == 2)
     
-    try:
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(quotes, f, ensure_ascii=False, indent=4)
-        print(f"\nQuotes have been successfully saved to '{output_path}'")
-    except IOError as e:
-        print(f"Failed to save quotes to file: {e}")
+    coverage = 1.0 - singletons / draws
+    if doubletons:
+        estimated_distinct = seen + singletons ** 2 / (2 * doubletons)
+    else:
+        # Bias-corrected form when no quote has been drawn twice yet
+        estimated_distinct = seen + singletons * (singletons - 1) / 2
+    return coverage, estimated_distinct
+
+def fill_from_listing(session, base_url, collected_quotes, total_unique_quotes, sink=None):
+    """
+    Adds the quotes still missing by crawling the paginated listing in order.
+    
+    Args:
+        session (requests.Session): The session object to make requests.
+        base_url (str): The base URL of the website.
+        collected_quotes (dict): Quotes collected so far, keyed by quote_key; updated in place.
+        total_unique_quotes (int): Number of unique quotes wanted.
+        sink (JsonlSink): Optional sink receiving each new quote as soon as it is collected.
+        
+    Returns:
+        int: Number of listing pages requested.
+    """
+    pages_requested = 0
+    
+    def fetch_page(url, page_number):
+        nonlocal pages_requested
+        pages_requested += 1
+        try:
+            response = session.get(url, timeout=5)
+        except requests.RequestException as e:
+            print(f"Request failed: {e}")
+            return None
+        if response.status_code != 200:
+            print(f"Failed to retrieve listing page {url}, status code: {response.status_code}")
+            return None
+        return parse_html(response.content)
+    
+    def extract_page(tree, page_number):
+        page_quotes = extract_quotes(tree)
+        if not page_quotes:
+            return None
+        for quote in page_quotes:
+            unique_id = quote_key(quote['text'])
+            if unique_id not in collected_quotes:
+                collected_quotes[unique_id] = quote
+                if sink:
+                    sink.write(quote)
+                print(f"Collected {len(collected_quotes)}/{total_unique_quotes} from page {page_number}: "
+                      f"\"{quote['text']}\" - {quote['author']}")
+        # Stop paging as soon as the target is reached
+        return [] if len(collected_quotes) < total_unique_quotes else None
+    
+    crawl_pages(base_url, fetch_page, extract_page)
+    return pages_requested
+
+def collect_until_saturation(session, base_url, total_unique_quotes, max_attempts, coverage_threshold, sink=None):
+    """
+    Draws random quotes until the estimated coverage passes a threshold, then
+    fills in the missing quotes from the paginated listing.
+    
+    Random draws are cheap while most quotes are new, but the last few quotes of
+    a coupon-collector run cost hundreds of draws; the listing crawl returns every
+    remaining quote in a handful of requests. The threshold is only checked once
+    MIN_ESTIMATE_DRAWS quotes have been drawn.
+    
+    Args:
+        session (requests.Session): The session object to make requests.
+        base_url (str): The base URL of the website.
+        total_unique_quotes (int): Number of unique quotes wanted.
+        max_attempts (int): Safety limit on the number of random draws.
+        coverage_threshold (float): Estimated coverage at which random draws stop.
+        sink (JsonlSink): Optional sink receiving each new quote as soon as it is collected.
+        
+    Returns:
+        tuple: (collected_quotes, requests_made) with quotes keyed by quote_key.
+    """
+    collected_quotes = {}
+    sighting_counts = {}
+    attempt = 0
+    draws = 0
+    coverage = 0.0
+    
+    while len(collected_quotes) < total_unique_quotes and attempt < max_attempts:
+        quote = fetch_random_quote(session, base_url)
+        attempt += 1
+        if quote:
+            unique_id = quote_key(quote['text'])
+            draws += 1
+            sighting_counts[unique_id] = sighting_counts.get(unique_id, 0) + 1
+            coverage, estimated_distinct = estimate_coverage(sighting_counts)
+            if unique_id not in collected_quotes:
+                collected_quotes[unique_id] = quote
+                if sink:
+                    sink.write(quote)
+                print(f"Collected {len(collected_quotes)}/{total_unique_quotes} "
+                      f"(coverage ~{coverage:.0%}, ~{estimated_distinct:.0f} distinct, "
+                      f"{len(collected_quotes) / attempt:.2f} new/request): "
+                      f"\"{quote['text']}\" - {quote['author']}")
+            if draws >= MIN_ESTIMATE_DRAWS and coverage >= coverage_threshold:
+                print(f"\nEstimated coverage {coverage:.0%} reached after {attempt} random requests, "
+                      f"switching to the paginated listing.")
+                break
+    
+    pages_requested = 0
+    if len(collected_quotes) < total_unique_quotes:
+        pages_requested = fill_from_listing(session, base_url, collected_quotes, total_unique_quotes, sink)
+    return collected_quotes, attempt + pages_requested
+
+def collect_concurrently(base_url, total_unique_quotes, max_attempts, concurrency, sink=None, parser_pool=None):
+    """
+    Draws random quotes from several worker threads at once until the target is reached.
+    
+    Each worker keeps its own pooled session, so up to `concurrency` requests are
+    in flight; all of them share the per-host rate limiter of http_client. The
+    fetched quotes go through one deduplication stage keyed by quote_key. Once
+    the target is reached, the workers stop issuing requests, and the quotes of
+    requests still in flight are discarded; if a worker fails, the others stop too.
+    
+    Args:
+        base_url (str): The base URL of the website.
+        total_unique_quotes (int): Number of unique quotes wanted.
+        max_attempts (int): Safety limit on the total number of requests.
+        concurrency (int): Number of requests in flight.
+        sink (JsonlSink): Optional sink receiving each new quote as soon as it is collected.
+        parser_pool (ParserPool): Optional pool of parser processes the pages are parsed in.
+        
+    Returns:
+        tuple: (collected_quotes, requests_made) with quotes keyed by quote_key.
+    """
+    collected_quotes = {}
+    attempt = 0
+    lock = threading.Lock()
+    done = threading.Event()
+    
+    def worker():
+        nonlocal attempt
+        with create_session(pool_size=1, cache=False) as session:
+            while not done.is_set():
+                with lock:
+                    if attempt >= max_attempts:
+                        return
+                    attempt += 1
+                quote = fetch_random_quote(session, base_url, parser_pool)
+                if quote:
+                    unique_id = quote_key(quote['text'])
+                    with lock:
+                        if not done.is_set() and unique_id not in collected_quotes:
+                            collected_quotes[unique_id] = quote
+                            if sink:
+                                sink.write(quote)
+                            print(f"Collected {len(collected_quotes)}/{total_unique_quotes}: \"{quote['text']}\" - {quote['author']}")
+                            if len(collected_quotes) >= total_unique_quotes:
+                                done.set()
+    
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(worker) for _ in range(concurrency)]
+        try:
+            for future in futures:
+                future.result()
+        finally:
+            # A failed worker (or Ctrl-C) stops the others too. Every worker runs from the
+            # start, so there is nothing queued to cancel: a request already sent cannot be
+            # interrupted, and at most concurrency - 1 of them complete after the target is
+            # reached; their quotes are discarded. These extra requests are expected.
+            done.set()
+            executor.shutdown(cancel_futures=True)
+    return collected_quotes, attempt
 
 def main():
     """
@@ -71,7 +249,22 @@ def main():
     Returns:
         None
     """
-    base_url = "https://quotes.toscrape.com/"
+    parser = argparse.ArgumentParser(description="Collect unique quotes from quotes.toscrape.com/random.")
+    parser.add_argument('--strategy', choices=('random', 'saturation', 'concurrent'), default='random',
+                        help="'random' only draws /random; 'saturation' switches to the listing pages "
+                             "once the estimated coverage passes --coverage; 'concurrent' draws /random "
+                             "from --concurrency workers at once.")
+    parser.add_argument('--concurrency', type=int, default=8,
+                        help="Number of requests in flight with the concurrent strategy.")
+    parser.add_argument('--parse-workers', type=int, default=0,
+                        help="Number of parser processes of the concurrent strategy (0 parses in the fetching threads).")
+    parser.add_argument('--coverage', type=float, default=0.8,
+                        help="Estimated coverage at which the saturation strategy stops drawing.")
+    parser.add_argument('--base-url', default="https://quotes.toscrape.com/",
+                        help="Base URL of the quotes website.")
+    args = parser.parse_args()
+    
+    base_url = args.base_url
     total_unique_quotes = 100  # Known number of unique quotes on the site
     collected_quotes = {}
     attempt = 0
@@ -81,26 +274,53 @@ def main():
     output_dir = 'output'
     output_filename = 'quotes.json'
     
-    with requests.Session() as session:
-        while len(collected_quotes) < total_unique_quotes and attempt < max_attempts:
-            quote = fetch_random_quote(session)
-            if quote:
-                unique_id = quote['text']
-                if unique_id not in collected_quotes:
-                    collected_quotes[unique_id] = quote
-                    print(f"Collected {len(collected_quotes)}/{total_unique_quotes}: \"{quote['text']}\" - {quote['author']}")
-            attempt += 1
-            time.sleep(0.5)  # Pause between requests to be polite to the server
+    # Quotes are streamed to a JSONL file as they are collected, so a crash keeps them
+    jsonl_path = os.path.join(output_dir, 'quotes.jsonl')
+    
+    started = time.monotonic()
+    with JsonlSink(jsonl_path) as sink:
+        if args.strategy == 'concurrent':
+            parser_pool = ParserPool(args.parse_workers) if args.parse_workers else None
+            try:
+                collected_quotes, attempt = collect_concurrently(
+                    base_url, total_unique_quotes, max_attempts, args.concurrency, sink=sink, parser_pool=parser_pool
+                )
+            finally:
+                if parser_pool:
+                    parser_pool.close()
+        elif args.strategy == 'saturation':
+            with create_session(cache=False) as session:
+                collected_quotes, attempt = collect_until_saturation(
+                    session, base_url, total_unique_quotes, max_attempts, args.coverage, sink=sink
+                )
+        else:
+            with create_session(cache=False) as session:
+                while len(collected_quotes) < total_unique_quotes and attempt < max_attempts:
+                    quote = fetch_random_quote(session, base_url)
+                    if quote:
+                        unique_id = quote_key(quote['text'])
+                        if unique_id not in collected_quotes:
+                            collected_quotes[unique_id] = quote
+                            sink.write(quote)
+                            print(f"Collected {len(collected_quotes)}/{total_unique_quotes}: \"{quote['text']}\" - {quote['author']}")
+                    attempt += 1
+    elapsed = time.monotonic() - started
     
     # Check if all unique quotes were collected
     if len(collected_quotes) == total_unique_quotes:
         print("\nSuccessfully collected all unique quotes!")
     else:
         print(f"\nStopped after {attempt} attempts. Collected {len(collected_quotes)} unique quotes.")
+    if attempt:
+        print(f"{attempt} requests in {elapsed:.1f}s, {len(collected_quotes) / attempt:.2f} unique quotes per request.")
     
-    # Save the collected quotes to a file
-    quotes_list = list(collected_quotes.values())
-    save_quotes_to_file(quotes_list, output_dir, output_filename)
+    # Convert the streamed quotes to the pretty JSON array file
+    output_path = os.path.join(output_dir, output_filename)
+    try:
+        jsonl_to_json(jsonl_path, output_path)
+        print(f"\nQuotes have been successfully saved to '{output_path}'")
+    except IOError as e:
+        print(f"Failed to save quotes to file: {e}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,182 @@
+import os
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+# Requests per second allowed per host unless configured otherwise: four times the pace
+# of the one-second pauses between pages and twice that of the 0.5 s pauses between
+# /random draws, which the limiter replaced
+DEFAULT_RATE = 4.0
+MIN_RATE = 0.2
+LATENCY_TARGET = 1.0  # Seconds; slower responses are taken as a sign of server load
+
+# Statuses by which a server asks its clients to slow down
+THROTTLE_STATUSES = (429, 503)
+
+class HostRateLimiter:
+    """
+    Token-bucket rate limiter with one bucket per host, shared by all threads.
+
+    Each host starts at its configured cap (requests per second) and adapts:
+    a 429/503 response halves its rate and a Retry-After header pauses the host
+    until the given time, a response slower than `latency_target` lowers the
+    rate by a fifth, and every fast response raises it back towards the cap.
+    """
+
+    def __init__(self, default_rate=DEFAULT_RATE, host_rates=None, min_rate=MIN_RATE,
+                 latency_target=LATENCY_TARGET):
+        self.default_rate = default_rate
+        self.host_rates = dict(host_rates or {})
+        self.min_rate = min_rate
+        self.latency_target = latency_target
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def share(self, parts):
+        """
+        Divides every cap between `parts` processes that crawl the same hosts, each with its own limiter.
+
+        Args:
+            parts (int): Number of processes sharing the caps.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self.default_rate /= parts
+            self.host_rates = {host: rate / parts for host, rate in self.host_rates.items()}
+            for bucket in self._buckets.values():
+                bucket['cap'] /= parts
+                bucket['rate'] = min(bucket['rate'], bucket['cap'])
+
+    def _bucket(self, host):
+        with self._lock:
+            if host not in self._buckets:
+                cap = self.host_rates.get(host, self.default_rate)
+                self._buckets[host] = {
+                    'cap': cap,
+                    'rate': cap,
+                    'tokens': 1.0,
+                    'updated': time.monotonic(),
+                    'blocked_until': 0.0,
+                    'lock': threading.Lock(),
+                }
+            return self._buckets[host]
+
+    def rate(self, host):
+        """Returns the current rate of a host, in requests per second."""
+        return self._bucket(host)['rate']
+
+    def acquire(self, host):
+        """
+        Blocks until a request to the host is allowed.
+
+        Args:
+            host (str): The host (netloc) of the request.
+
+        Returns:
+            float: Time spent waiting, in seconds.
+        """
+        bucket = self._bucket(host)
+        waited = 0.0
+        while True:
+            with bucket['lock']:
+                now = time.monotonic()
+                # Refill, allowing bursts of up to one second worth of requests
+                capacity = max(1.0, bucket['rate'])
+                bucket['tokens'] = min(capacity, bucket['tokens'] + (now - bucket['updated']) * bucket['rate'])
+                bucket['updated'] = now
+                if now < bucket['blocked_until']:
+                    wait = bucket['blocked_until'] - now
+                elif bucket['tokens'] >= 1.0:
+                    bucket['tokens'] -= 1.0
+                    return waited
+                else:
+                    wait = (1.0 - bucket['tokens']) / bucket['rate']
+            time.sleep(wait)
+            waited += wait
+
+    def observe(self, host, latency, status, retry_after=None):
+        """
+        Adapts the rate of a host to the outcome of a request.
+
+        Args:
+            host (str): The host (netloc) of the request.
+            latency (float): Time the request took, in seconds.
+            status (int): The HTTP status code of the response.
+            retry_after (str): The Retry-After header of the response, if any.
+
+        Returns:
+            None
+        """
+        bucket = self._bucket(host)
+        with bucket['lock']:
+            if status in THROTTLE_STATUSES:
+                bucket['rate'] = max(self.min_rate, bucket['rate'] / 2)
+                bucket['tokens'] = 0.0
+                delay = parse_retry_after(retry_after)
+                if delay:
+                    bucket['blocked_until'] = max(bucket['blocked_until'], time.monotonic() + delay)
+            elif latency > self.latency_target:
+                bucket['rate'] = max(self.min_rate, bucket['rate'] * 0.8)
+            else:
+                bucket['rate'] = min(bucket['cap'], bucket['rate'] + bucket['cap'] * 0.05)
+
+def parse_retry_after(value):
+    """
+    Converts a Retry-After header, in seconds or as an HTTP date, to a delay.
+
+    Args:
+        value (str): The header value, or None.
+
+    Returns:
+        float or None: The delay in seconds, or None if the header is missing or invalid.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def parse_host_rates(value):
+    """
+    Parses a per-host cap list such as 'books.toscrape.com=4,quotes.toscrape.com=2'.
+
+    Args:
+        value (str): Comma-separated host=rate pairs.
+
+    Returns:
+        dict: Mapping of host to requests per second.
+    """
+    host_rates = {}
+    for item in filter(None, (part.strip() for part in value.split(','))):
+        host, _, rate = item.partition('=')
+        host_rates[host.strip()] = float(rate)
+    return host_rates
+
+_shared_limiter = None
+_shared_lock = threading.Lock()
+
+def shared_limiter():
+    """
+    Returns the process-wide limiter, configured from the environment on first use.
+
+    SCRAPER_RATE_LIMIT sets the default cap in requests per second per host and
+    SCRAPER_RATE_LIMITS the per-host caps, as 'host=rate,host=rate'.
+
+    Returns:
+        HostRateLimiter: The limiter shared by every session of the process.
+    """
+    global _shared_limiter
+    with _shared_lock:
+        if _shared_limiter is None:
+            _shared_limiter = HostRateLimiter(
+                default_rate=float(os.environ.get('SCRAPER_RATE_LIMIT', DEFAULT_RATE)),
+                host_rates=parse_host_rates(os.environ.get('SCRAPER_RATE_LIMITS', '')),
+            )
+        return _shared_limiter
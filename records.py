@@ -0,0 +1,364 @@
+import argparse
+import hashlib
+import json
+import threading
+import tracemalloc
+import unicodedata
+from array import array
+
+from output_sink import JsonlSink, read_jsonl
+
+def quote_key(text):
+    """
+    Computes the deduplication key of a quote from its normalized text.
+
+    The text is NFKC-normalized, case-folded and has its whitespace collapsed, so
+    the same quote served with different spacing or typography yields one key.
+
+    Args:
+        text (str): The quote text.
+
+    Returns:
+        bytes: A 16-byte BLAKE2b digest of the normalized text.
+    """
+    normalized = ' '.join(unicodedata.normalize('NFKC', text).casefold().split())
+    return hashlib.blake2b(normalized.encode('utf-8'), digest_size=16).digest()
+
+class Interner:
+    """
+    Two-way mapping between strings (author names, tags, categories) and small integer IDs.
+
+    IDs are assigned in order of first appearance. A record then stores the
+    ID instead of its own copy of the string, and every record with the same
+    author or tag shares one string. Assignments are serialized with a lock so
+    crawl threads can share an interner.
+    """
+
+    def __init__(self, names=()):
+        self.names = []
+        self._ids = {}
+        self._lock = threading.Lock()
+        for name in names:
+            self.id(name)
+
+    def id(self, name):
+        """
+        Returns the ID of a string, assigning the next one to a new string.
+
+        Args:
+            name (str): The string; None is interned like any other value.
+
+        Returns:
+            int: Its ID.
+        """
+        found = self._ids.get(name)
+        if found is not None:
+            return found
+        with self._lock:
+            found = self._ids.get(name)
+            if found is None:
+                found = self._ids[name] = len(self.names)
+                self.names.append(name)
+            return found
+
+    def name(self, id):
+        return self.names[id]
+
+    def __len__(self):
+        return len(self.names)
+
+# Shared by every Quote and Book of the process
+AUTHORS = Interner()
+TAGS = Interner()
+CATEGORIES = Interner()
+
+# Identical tag combinations share one tuple of IDs
+_TAG_TUPLES = {}
+
+def intern_tags(tags):
+    """
+    Converts tag names to a shared tuple of tag IDs.
+
+    Args:
+        tags (iterable): The tag names.
+
+    Returns:
+        tuple: The tag IDs, the same tuple object for every record with the same tags.
+    """
+    ids = tuple(TAGS.id(tag) for tag in tags)
+    return _TAG_TUPLES.setdefault(ids, ids)
+
+class Quote:
+    """
+    Compact quote record: its text, the ID of its author and a shared tuple of tag IDs.
+
+    The dictionary of the extractors ({'text', 'author', 'tags'}) converts to
+    and from it with from_dict and to_dict.
+    """
+
+    __slots__ = ('text', 'author_id', 'tag_ids')
+
+    def __init__(self, text, author, tags=()):
+        self.text = text
+        self.author_id = AUTHORS.id(author)
+        self.tag_ids = intern_tags(tags)
+
+    @classmethod
+    def from_dict(cls, record):
+        return cls(record['text'], record['author'], record.get('tags') or ())
+
+    @property
+    def author(self):
+        return AUTHORS.names[self.author_id]
+
+    @property
+    def tags(self):
+        return [TAGS.names[tag_id] for tag_id in self.tag_ids]
+
+    def to_dict(self):
+        return {'text': self.text, 'author': self.author, 'tags': self.tags}
+
+    def __eq__(self, other):
+        if not isinstance(other, Quote):
+            return NotImplemented
+        return (self.text, self.author_id, self.tag_ids) == (other.text, other.author_id, other.tag_ids)
+
+    def __hash__(self):
+        return hash((self.text, self.author_id, self.tag_ids))
+
+    def __repr__(self):
+        return f"Quote({self.text!r}, {self.author!r}, {self.tags!r})"
+
+class Book:
+    """
+    Compact book record: the ID of its category, its title and its price.
+
+    It converts to and from the records of output/books.jsonl
+    ({'category', 'title', 'price'}) with from_dict and to_dict.
+    """
+
+    __slots__ = ('category_id', 'title', 'price')
+
+    def __init__(self, category, title, price):
+        self.category_id = CATEGORIES.id(category)
+        self.title = title
+        self.price = price
+
+    @classmethod
+    def from_dict(cls, record):
+        return cls(record['category'], record['title'], record['price'])
+
+    @property
+    def category(self):
+        return CATEGORIES.names[self.category_id]
+
+    def to_dict(self):
+        return {'category': self.category, 'title': self.title, 'price': self.price}
+
+    def __eq__(self, other):
+        if not isinstance(other, Book):
+            return NotImplemented
+        return (self.category_id, self.title, self.price) == (other.category_id, other.title, other.price)
+
+    def __hash__(self):
+        return hash((self.category_id, self.title, self.price))
+
+    def __repr__(self):
+        return f"Book({self.category!r}, {self.title!r}, {self.price!r})"
+
+class QuoteTable:
+    """
+    Columnar store of quotes for corpora of millions of records.
+
+    The texts are concatenated in one UTF-8 buffer: a str holding the curly
+    quotes of the site takes 2 bytes per character, the buffer about 1.
+    Authors and tags are 32-bit IDs in arrays, with the tags of quote i at
+    tag_ids[tag_offsets[i]:tag_offsets[i + 1]]. Past its text, a quote costs
+    20 bytes plus 4 per tag, against several hundred for a dictionary with its
+    own author and tag strings. The table has its own interners, so IDs follow
+    the order of first appearance in the table, like the categories of
+    analytics.load_quotes.
+    """
+
+    def __init__(self, records=()):
+        self.authors = Interner()
+        self.tags = Interner()
+        self.text_buffer = bytearray()
+        self.text_offsets = array('q', [0])
+        # Positions of the quotes whose text is missing (None), which the buffer cannot hold
+        self.missing_texts = set()
+        self.author_ids = array('i')
+        self.tag_ids = array('i')
+        self.tag_offsets = array('q', [0])
+        self.extend(records)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Reads a quotes .json or .jsonl file.
+
+        Args:
+            path (str): The file, as written by the quote scrapers.
+
+        Returns:
+            QuoteTable: The quotes; a JSON Lines file is read one record at a time.
+        """
+        if path.endswith('.jsonl'):
+            return cls(read_jsonl(path))
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def append(self, record):
+        """
+        Adds one quote.
+
+        Args:
+            record (dict or Quote): The quote.
+
+        Returns:
+            None
+        """
+        if isinstance(record, Quote):
+            text, author, tags = record.text, record.author, record.tags
+        else:
+            text, author, tags = record['text'], record['author'], record.get('tags') or ()
+        if text is None:
+            self.missing_texts.add(len(self))
+        else:
+            self.text_buffer += text.encode('utf-8')
+        self.text_offsets.append(len(self.text_buffer))
+        self.author_ids.append(self.authors.id(author))
+        self.tag_ids.extend(self.tags.id(tag) for tag in tags)
+        self.tag_offsets.append(len(self.tag_ids))
+
+    def extend(self, records):
+        for record in records:
+            self.append(record)
+
+    def __len__(self):
+        return len(self.author_ids)
+
+    def text(self, index):
+        if index in self.missing_texts:
+            return None
+        return self.text_buffer[self.text_offsets[index]:self.text_offsets[index + 1]].decode('utf-8')
+
+    def record(self, index):
+        """
+        Returns one quote as the dictionary of the extractors.
+
+        Args:
+            index (int): Its position in the table.
+
+        Returns:
+            dict: The quote text, author, and tags.
+        """
+        tag_names = self.tags.names
+        return {
+            'text': self.text(index),
+            'author': self.authors.names[self.author_ids[index]],
+            'tags': [tag_names[tag_id] for tag_id in
+                     self.tag_ids[self.tag_offsets[index]:self.tag_offsets[index + 1]]],
+        }
+
+    def __getitem__(self, index):
+        return Quote.from_dict(self.record(index))
+
+    def records(self):
+        """Yields every quote as a dictionary, in table order."""
+        for index in range(len(self)):
+            yield self.record(index)
+
+    def save(self, path):
+        """
+        Writes the quotes as JSON Lines, the format of the scrapers' output.
+
+        Args:
+            path (str): The output file.
+
+        Returns:
+            None
+        """
+        with JsonlSink(path) as sink:
+            for record in self.records():
+                sink.write(record)
+
+def synthetic_lines(rows, authors=500, tag_vocabulary=1000, max_tags=5, seed=0):
+    """
+    Generates quotes as JSON lines, like a merged crawl read back from disk.
+
+    Args:
+        rows (int): Number of quotes.
+        authors (int): Number of distinct authors.
+        tag_vocabulary (int): Number of distinct tags.
+        max_tags (int): Maximum number of tags per quote.
+        seed (int): Random seed.
+
+    Yields:
+        str: One JSON-encoded quote per line.
+    """
+    import random
+    rng = random.Random(seed)
+    for index in range(rows):
+        tags = [f"tag{int(tag_vocabulary ** rng.random()) - 1}" for _ in range(rng.randint(1, max_tags))]
+        yield json.dumps({
+            'text': f"“Synthetic quote number {index}, long enough to look like a real one.”",
+            'author': f"Author {rng.randrange(authors)}",
+            'tags': tags,
+        }, ensure_ascii=False)
+
+def measure(build, lines):
+    """
+    Measures the memory held by a structure built from JSON lines.
+
+    Args:
+        build (callable): build(records) returning the structure, from an iterator of dicts.
+        lines (list): The JSON lines.
+
+    Returns:
+        tuple: (structure, bytes held once it is built).
+    """
+    tracemalloc.start()
+    try:
+        structure = build(json.loads(line) for line in lines)
+        held, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return structure, held
+
+def main():
+    """
+    Compares the memory of dictionaries, Quote objects and a QuoteTable holding the same quotes.
+
+    Args:
+        None
+
+    Returns:
+        None
+    """
+    parser = argparse.ArgumentParser(description="Measure the memory of the quote record models.")
+    parser.add_argument('--rows', type=int, default=200_000, help="Number of synthetic quotes.")
+    parser.add_argument('--quotes', help="Measure this quotes .json/.jsonl file instead.")
+    args = parser.parse_args()
+
+    if args.quotes:
+        lines = [json.dumps(record, ensure_ascii=False) for record in QuoteTable.load(args.quotes).records()]
+    else:
+        lines = list(synthetic_lines(args.rows))
+    models = (
+        ('dict', list),
+        ('Quote (__slots__)', lambda records: [Quote.from_dict(record) for record in records]),
+        ('QuoteTable', QuoteTable),
+    )
+
+    print(f"{len(lines)} quotes")
+    print(f"{'model':<20}{'MB':>10}{'bytes/quote':>14}{'vs dict':>10}")
+    baseline = None
+    for name, build in models:
+        structure, held = measure(build, lines)
+        baseline = baseline or held
+        print(f"{name:<20}{held / 1e6:>10.1f}{held / len(lines):>14.0f}{baseline / held:>9.1f}x")
+        del structure
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,369 @@
+import argparse
+import os
+import time
+from collections import Counter
+from urllib.parse import urljoin, urlsplit
+
+from scrapy import FormRequest, Request, Spider
+from scrapy.crawler import CrawlerProcess
+
+from crawl_workers import listing_pages, listing_price
+from extractors import extract_books, extract_category_links, extract_first_quote, extract_quotes, input_value, \
+    parse_html
+from http_cache import DEFAULT_CACHE_DIR, DEFAULT_TTL
+from http_client import DEFAULT_RETRIES, DEFAULT_TIMEOUT, RETRY_STATUSES
+from music_einstein import BROWSER_HEADERS, answer_specific_question
+from nombre_livres import calculate_statistics
+from output_sink import JsonlSink
+from question_2_to_6 import answer_questions
+from records import quote_key
+from rate_limiter import DEFAULT_RATE
+
+# Requests that must reach the site every time: logins, forms carrying a fresh
+# token or ViewState, and /random, whose answer changes on every call
+NO_CACHE = {'dont_cache': True}
+
+class BooksSpider(Spider):
+    """
+    Crawls every category of the books site and yields its books, like nombre_livres.py.
+
+    The pages of a category are planned from its "Page 1 of N" pager (see
+    crawl_workers.listing_pages), so they are all requested at once.
+    """
+
+    name = 'books'
+    output = 'books.jsonl'
+
+    def __init__(self, base_url="https://books.toscrape.com/", **kwargs):
+        super().__init__(**kwargs)
+        self.base_url = base_url
+
+    async def start(self):
+        yield Request(self.base_url, callback=self.parse)
+
+    def parse(self, response):
+        for name, href in extract_category_links(parse_html(response.body)):
+            # Skip the "Books" root category which contains all books
+            if name.lower() != 'books':
+                yield Request(urljoin(response.url, href), callback=self.parse_listing, cb_kwargs={'category': name})
+
+    def parse_listing(self, response, category):
+        tree = parse_html(response.body)
+        for title, price_text in extract_books(tree):
+            yield {'category': category, 'title': title, 'price': listing_price(title, price_text)}
+        # The pages already requested are dropped by the duplicate filter
+        for page_url in listing_pages(tree, response.url):
+            yield Request(page_url, callback=self.parse_listing, cb_kwargs={'category': category})
+
+    def answer(self, books):
+        """Prints the number of books and the average price of every category."""
+        by_category = {}
+        for book in books:
+            by_category.setdefault(book['category'], []).append((book['title'], book['price']))
+        for category_name, category_books in by_category.items():
+            total_books, average_price = calculate_statistics(category_books)
+            print(f"\nProcessing category: {category_name}")
+            print(f" - Number of Books: {total_books}")
+            print(f" - Average Price: £{average_price}")
+
+class QuotesSpider(Spider):
+    """
+    Logs into the quotes site and yields every quote of the listing, like question_2_to_6.py.
+
+    Each quote carries the number of its page, so the answers see the quotes
+    in site order whatever order the pages arrived in.
+    """
+
+    name = 'quotes'
+    output = 'quotes_login.jsonl'
+
+    def __init__(self, base_url="https://quotes.toscrape.com/", username="username", password="password",
+                 **kwargs):
+        super().__init__(**kwargs)
+        self.base_url = base_url
+        self.username = username
+        self.password = password
+
+    async def start(self):
+        yield Request(urljoin(self.base_url, 'login'), callback=self.login, meta=NO_CACHE)
+
+    def login(self, response):
+        csrf_token = input_value(parse_html(response.body), 'csrf_token')
+        yield FormRequest(response.url, formdata={'csrf_token': csrf_token or '', 'username': self.username,
+                                                  'password': self.password},
+                          callback=self.after_login, meta=NO_CACHE, dont_filter=True)
+
+    def after_login(self, response):
+        if "Logout" not in response.text:
+            self.logger.error("Login failed, check the credentials.")
+            return
+        if response.url == self.base_url:
+            # The login redirects to the first page of the listing
+            yield from self.parse_page(response, 1)
+        else:
+            yield Request(self.base_url, callback=self.parse_page, cb_kwargs={'page_number': 1}, dont_filter=True)
+
+    def parse_page(self, response, page_number):
+        tree = parse_html(response.body)
+        for quote in extract_quotes(tree):
+            yield {'page': page_number, **quote}
+        # Pages 2..N from the pager of the first page, else the next page; the pages already
+        # requested are dropped by the duplicate filter, so the numbers stay right
+        for offset, page_url in enumerate(listing_pages(tree, response.url), 1):
+            yield Request(page_url, callback=self.parse_page, cb_kwargs={'page_number': page_number + offset})
+
+    def answer(self, quotes):
+        """Answers the questions of question_2_to_6.py on the quotes, in page order."""
+        answer_questions(sorted(quotes, key=lambda quote: quote['page']))
+
+class SearchSpider(Spider):
+    """
+    Searches the quotes of an author with a tag through the search.aspx form, like music_einstein.py.
+
+    The form is posted twice, once to choose the author and once to search
+    with the tag, each time with the __VIEWSTATE of the previous answer.
+    """
+
+    name = 'search'
+    output = 'search.jsonl'
+
+    def __init__(self, base_url="https://quotes.toscrape.com/", author="Albert Einstein", tag="music", **kwargs):
+        super().__init__(**kwargs)
+        self.base_url = base_url
+        self.author = author
+        self.tag = tag
+
+    async def start(self):
+        yield Request(urljoin(self.base_url, 'search.aspx'), callback=self.choose_author, headers=BROWSER_HEADERS,
+                      meta=NO_CACHE)
+
+    def _post(self, response, formdata, callback):
+        viewstate = input_value(parse_html(response.body), '__VIEWSTATE')
+        if not viewstate:
+            self.logger.error("Unable to find the __VIEWSTATE field.")
+            return None
+        return FormRequest(urljoin(self.base_url, 'filter.aspx'), formdata={**formdata, '__VIEWSTATE': viewstate},
+                           callback=callback, headers={**BROWSER_HEADERS, 'Referer': response.url}, meta=NO_CACHE,
+                           dont_filter=True)
+
+    def choose_author(self, response):
+        request = self._post(response, {'author': self.author, 'tag': '----------'}, self.search)
+        if request:
+            yield request
+
+    def search(self, response):
+        request = self._post(response, {'author': self.author, 'tag': self.tag, 'submit_button': 'Search'},
+                             self.parse_results)
+        if request:
+            yield request
+
+    def parse_results(self, response):
+        for quote in extract_quotes(parse_html(response.body)):
+            yield {'author_query': self.author, 'tag_query': self.tag, **quote}
+
+    def answer(self, quotes):
+        """Prints the quote of the author containing the tag, as music_einstein.py does."""
+        answer_specific_question(quotes, author_name=self.author, keyword=self.tag)
+
+class RandomSpider(Spider):
+    """
+    Draws /random until `total_unique_quotes` distinct quotes are collected, like random_question.py.
+
+    `concurrency` draws are in flight at a time: every answer sends the next
+    draw, and once the target is reached no draw is sent any more. Quotes are
+    deduplicated by records.quote_key and only new ones are yielded.
+    """
+
+    name = 'random'
+    output = 'quotes.jsonl'
+
+    def __init__(self, base_url="https://quotes.toscrape.com/", total_unique_quotes=100, max_attempts=10000,
+                 concurrency=8, **kwargs):
+        super().__init__(**kwargs)
+        self.random_url = urljoin(base_url, 'random')
+        self.total_unique_quotes = total_unique_quotes
+        self.max_attempts = max_attempts
+        self.concurrency = concurrency
+        self.attempts = 0
+        self.collected = set()
+
+    def _draw(self):
+        if len(self.collected) >= self.total_unique_quotes or self.attempts >= self.max_attempts:
+            return None
+        self.attempts += 1
+        return Request(self.random_url, callback=self.parse, errback=self.draw_again, meta=NO_CACHE,
+                       dont_filter=True)
+
+    async def start(self):
+        for _ in range(self.concurrency):
+            request = self._draw()
+            if request:
+                yield request
+
+    def parse(self, response):
+        quote = extract_first_quote(parse_html(response.body))
+        if quote and quote['text'] and len(self.collected) < self.total_unique_quotes:
+            unique_id = quote_key(quote['text'])
+            if unique_id not in self.collected:
+                self.collected.add(unique_id)
+                yield quote
+        request = self._draw()
+        if request:
+            yield request
+
+    def draw_again(self, failure):
+        # A draw that failed for good is replaced, so `concurrency` draws stay in flight
+        self.logger.warning(f"Request failed: {failure.value!r}")
+        request = self._draw()
+        if request:
+            yield request
+
+    def answer(self, quotes):
+        """Reports how many draws the distinct quotes took."""
+        print(f"\nCollected {len(quotes)}/{self.total_unique_quotes} unique quotes in {self.attempts} requests.")
+
+# Jobs of the engine, run in this order
+SPIDERS = {spider.name: spider for spider in (BooksSpider, QuotesSpider, SearchSpider, RandomSpider)}
+
+class JsonlPipeline:
+    """Streams the items of a spider to output/<spider.output>, as the standalone scripts do."""
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+        self.sink = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler)
+
+    # `spider` is passed by Scrapy 2.13 and dropped from 2.14 on, which reads crawler.spider
+    def open_spider(self, spider=None):
+        self.sink = JsonlSink(os.path.join('output', self.crawler.spider.output))
+
+    def process_item(self, item, spider=None):
+        self.sink.write(item)
+        return item
+
+    def close_spider(self, spider=None):
+        self.sink.close()
+
+class AnswerPipeline:
+    """Keeps the items of a spider and hands them to its answer() once the spider is done."""
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+        self.items = []
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler)
+
+    def process_item(self, item, spider=None):
+        self.items.append(item)
+        return item
+
+    def close_spider(self, spider=None):
+        spider = self.crawler.spider
+        print(f"\n== {spider.name}: {len(self.items)} items ==")
+        spider.answer(self.items)
+
+def engine_settings(concurrency=8, log_level='WARNING'):
+    """
+    Builds the Scrapy settings shared by the spiders, from the same environment as the requests scripts.
+
+    SCRAPER_RATE_LIMIT gives the smallest delay between two requests to a host,
+    from which AutoThrottle adapts to the latency of the site. SCRAPER_CACHE=0
+    disables Scrapy's HTTP cache, kept under SCRAPER_CACHE_DIR/scrapy for
+    SCRAPER_CACHE_TTL seconds; with SCRAPER_OFFLINE=1, requests missing from it fail.
+
+    Args:
+        concurrency (int): Maximum number of requests in flight per host.
+        log_level (str): Level of the Scrapy log.
+
+    Returns:
+        dict: The settings.
+    """
+    delay = 1 / float(os.environ.get('SCRAPER_RATE_LIMIT', DEFAULT_RATE))
+    cache_dir = os.environ.get('SCRAPER_CACHE_DIR', DEFAULT_CACHE_DIR)
+    return {
+        'AUTOTHROTTLE_ENABLED': True,
+        'AUTOTHROTTLE_START_DELAY': delay,
+        'AUTOTHROTTLE_TARGET_CONCURRENCY': concurrency,
+        'DOWNLOAD_DELAY': delay,
+        'CONCURRENT_REQUESTS': concurrency * 4,
+        'CONCURRENT_REQUESTS_PER_DOMAIN': concurrency,
+        'DOWNLOAD_TIMEOUT': sum(DEFAULT_TIMEOUT),
+        'RETRY_TIMES': DEFAULT_RETRIES,
+        'RETRY_HTTP_CODES': list(RETRY_STATUSES),
+        'HTTPCACHE_ENABLED': os.environ.get('SCRAPER_CACHE', '1') != '0',
+        'HTTPCACHE_DIR': os.path.abspath(os.path.join(cache_dir, 'scrapy')),
+        'HTTPCACHE_EXPIRATION_SECS': int(float(os.environ.get('SCRAPER_CACHE_TTL', DEFAULT_TTL))),
+        'HTTPCACHE_IGNORE_MISSING': os.environ.get('SCRAPER_OFFLINE', '0') == '1',
+        'HTTPCACHE_IGNORE_HTTP_CODES': list(RETRY_STATUSES),
+        'ITEM_PIPELINES': {JsonlPipeline: 300, AnswerPipeline: 800},
+        'ROBOTSTXT_OBEY': False,
+        'TELNETCONSOLE_ENABLED': False,
+        'LOG_LEVEL': log_level,
+    }
+
+def share_host(settings, jobs_on_host):
+    """
+    Splits the per-host budget of the settings between the crawlers of the jobs on one host.
+
+    Crawlers do not share their download slots, so each of the `jobs_on_host`
+    crawlers waits that many times the smallest delay between requests and
+    gets its share of the requests in flight; together they stay within the
+    rate and concurrency of one crawler.
+
+    Args:
+        settings (dict): Settings from engine_settings().
+        jobs_on_host (int): Number of jobs crawling the same host.
+
+    Returns:
+        dict: The settings overridden for one of these crawlers.
+    """
+    concurrency = max(1, settings['CONCURRENT_REQUESTS_PER_DOMAIN'] // jobs_on_host)
+    delay = settings['DOWNLOAD_DELAY'] * jobs_on_host
+    return {'DOWNLOAD_DELAY': delay, 'AUTOTHROTTLE_START_DELAY': delay,
+            'CONCURRENT_REQUESTS_PER_DOMAIN': concurrency, 'AUTOTHROTTLE_TARGET_CONCURRENCY': concurrency}
+
+def main():
+    """
+    Runs the scrape suite (books, login quotes, ViewState search, random quotes) in one Scrapy process.
+
+    Args:
+        None
+
+    Returns:
+        None
+    """
+    parser = argparse.ArgumentParser(description="Run every scraping job as Scrapy spiders in one reactor.")
+    parser.add_argument('--job', action='append', choices=list(SPIDERS),
+                        help="Job to run (repeatable); all by default.")
+    parser.add_argument('--books-url', default="https://books.toscrape.com/", help="Base URL of the books website.")
+    parser.add_argument('--quotes-url', default="https://quotes.toscrape.com/",
+                        help="Base URL of the quotes website.")
+    parser.add_argument('--concurrency', type=int, default=8,
+                        help="Maximum number of requests in flight per host, shared by the jobs on that host.")
+    parser.add_argument('--log-level', default='WARNING', help="Level of the Scrapy log.")
+    args = parser.parse_args()
+
+    settings = engine_settings(args.concurrency, args.log_level)
+    jobs = [(SPIDERS[name], args.books_url if name == 'books' else args.quotes_url) for name in args.job or SPIDERS]
+    jobs_per_host = Counter(urlsplit(base_url).netloc for _, base_url in jobs)
+
+    # One crawler per job; they share the reactor and its thread pool
+    process = CrawlerProcess(settings)
+    for spider, base_url in jobs:
+        overrides = share_host(settings, jobs_per_host[urlsplit(base_url).netloc])
+        crawler = process.create_crawler(spider)
+        crawler.settings.update(overrides, priority='spider')
+        options = {'concurrency': overrides['CONCURRENT_REQUESTS_PER_DOMAIN']} if spider is RandomSpider else {}
+        process.crawl(crawler, base_url=base_url, **options)
+
+    started = time.monotonic()
+    process.start()
+    print(f"\n{len(jobs)} jobs done in {time.monotonic() - started:.2f}s.")
+
+if __name__ == "__main__":
+    main()
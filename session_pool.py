@@ -0,0 +1,144 @@
+import json
+import os
+import queue
+import threading
+from contextlib import contextmanager
+
+from http_client import create_session
+
+def logged_in(response):
+    """
+    Tells whether a page was served to a logged-in user: it offers to log out.
+
+    Args:
+        response (requests.Response): The response to check.
+
+    Returns:
+        bool: True if the page contains "Logout".
+    """
+    return "Logout" in response.text
+
+class SessionPool:
+    """
+    Pool of authenticated sessions shared by the worker threads of a login-gated crawl.
+
+    Each of the `size` sessions logs in once with the `login` function and
+    its cookies are saved to `cookie_path`, so the next run restores them
+    instead of logging in again. A worker borrows a session for one request,
+    so the sessions run up to `size` requests in parallel.
+    When a 200 response shows that the session is no longer logged in, the
+    session logs in again and the request is retried once, transparently.
+    `is_logged_in` tells from a response whether its session was logged in.
+    """
+
+    def __init__(self, login, size=1, cookie_path=None, is_logged_in=logged_in):
+        self.login = login
+        self.size = size
+        self.cookie_path = cookie_path
+        self.is_logged_in = is_logged_in
+        self.sessions = [create_session(pool_size=1) for _ in range(size)]
+        self.logins = 0
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+
+    def open(self):
+        """
+        Restores the saved cookies, and logs in the sessions that have none.
+
+        Restored sessions are not checked here: the first response they get tells
+        whether they are still logged in.
+
+        Returns:
+            bool: True if every session is restored or logged in.
+        """
+        saved = self._load_cookies()
+        for slot, session in enumerate(self.sessions):
+            if slot < len(saved) and saved[slot]:
+                for cookie in saved[slot]:
+                    session.cookies.set(**cookie)
+            elif not self._login(session):
+                return False
+            self._idle.put(session)
+        self.save_cookies()
+        return True
+
+    def _login(self, session):
+        session.cookies.clear()
+        with self._lock:
+            self.logins += 1
+        return self.login(session)
+
+    @contextmanager
+    def session(self):
+        """Borrows an idle session for the duration of the `with` block."""
+        session = self._idle.get()
+        try:
+            yield session
+        finally:
+            self._idle.put(session)
+
+    def request(self, method, url, **kwargs):
+        """
+        Sends a request on an idle session, logging it in again if it has expired.
+
+        Args:
+            method (str): The HTTP method.
+            url (str): The URL to request.
+            **kwargs: Passed to requests.Session.request.
+
+        Returns:
+            requests.Response: The response.
+        """
+        with self.session() as session:
+            response = session.request(method, url, **kwargs)
+            if response.status_code == 200 and not self.is_logged_in(response):
+                if self._login(session):
+                    self.save_cookies()
+                    # The anonymous page may have been cached (see http_cache.py); fetch it anew
+                    headers = {**(kwargs.pop('headers', None) or {}), 'Cache-Control': 'no-cache'}
+                    response = session.request(method, url, headers=headers, **kwargs)
+            return response
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def _load_cookies(self):
+        if not self.cookie_path or not os.path.exists(self.cookie_path):
+            return []
+        with open(self.cookie_path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def save_cookies(self):
+        """
+        Writes the cookies of every session atomically to `cookie_path`.
+
+        Returns:
+            None
+        """
+        if not self.cookie_path:
+            return
+        state = json.dumps([
+            [
+                {
+                    'name': cookie.name,
+                    'value': cookie.value,
+                    'domain': cookie.domain,
+                    'path': cookie.path,
+                    'expires': cookie.expires,
+                    'secure': cookie.secure,
+                }
+                for cookie in session.cookies
+            ]
+            for session in self.sessions
+        ])
+        with self._lock:
+            directory = os.path.dirname(self.cookie_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = self.cookie_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(state)
+            os.replace(tmp_path, self.cookie_path)
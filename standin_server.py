@@ -0,0 +1,532 @@
+import argparse
+import base64
+import html
+import json
+import random
+import secrets
+import threading
+import time
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlsplit
+
+# Categories of the stand-in catalogue with their number of books; the slugs
+# follow the live site, so 'travel_2' is the Travel category of travel_category.py
+CATEGORIES = [
+    ('Travel', 11), ('Mystery', 32), ('Historical Fiction', 26), ('Sequential Art', 75),
+    ('Classics', 19), ('Philosophy', 11), ('Romance', 35), ('Womens Fiction', 17),
+    ('Fiction', 65), ('Childrens', 29), ('Religion', 7), ('Nonfiction', 110),
+    ('Music', 13), ('Default', 152), ('Science Fiction', 16), ('Poetry', 19),
+]
+# Renders the quotes of the /js pages from their `data` array
+RENDER_SCRIPT = '''    for (var i in data) {
+        var d = data[i];
+        var tags = d.tags.map(function(t) { return '<a class="tag">' + t + '<\\/a>'; }).join(' ');
+        document.write('<div class="quote"><span class="text">' + d.text + '<\\/span>'
+            + '<span>by <small class="author">' + d.author.name + '<\\/small><\\/span>'
+            + '<div class="tags">Tags: ' + tags + '<\\/div><\\/div>');
+    }
+'''
+
+# The infinite-scroll page loads the JSON API from the browser
+SCROLL_PAGE = '''<html><body><div class="container" id="quotes"></div><script>
+    var page = 1, hasNext = true;
+    function load() {
+        if (!hasNext) return;
+        fetch('/quotes/api/quotes?page=' + page).then(function(r) { return r.json(); }).then(function(data) {
+            data.quotes.forEach(function(d) {
+                var div = document.createElement('div');
+                div.className = 'quote';
+                div.innerHTML = '<span class="text"></span><span>by <small class="author"></small></span>';
+                div.querySelector('.text').textContent = d.text;
+                div.querySelector('.author').textContent = d.author.name;
+                document.getElementById('quotes').appendChild(div);
+            });
+            hasNext = data.has_next;
+            page += 1;
+        });
+    }
+    window.onscroll = function() {
+        if (window.innerHeight + window.scrollY >= document.body.offsetHeight) load();
+    };
+    load();
+</script></body></html>'''
+
+BOOKS_PER_PAGE = 20
+QUOTES_PER_PAGE = 10
+RATING_WORDS = ('One', 'Two', 'Three', 'Four', 'Five')
+
+AUTHORS = [
+    'Albert Einstein', 'J.K. Rowling', 'Jane Austen', 'Marilyn Monroe', 'André Gide',
+    'Thomas A. Edison', 'Eleanor Roosevelt', 'Steve Martin', 'Bob Marley', 'Dr. Seuss',
+    'Douglas Adams', 'Elie Wiesel', 'Friedrich Nietzsche', 'Mark Twain', 'Allen Saunders',
+    'Pablo Neruda', 'Ralph Waldo Emerson', 'Mother Teresa', 'Garrison Keillor', 'Jim Henson',
+]
+TAGS = [
+    'love', 'inspirational', 'life', 'humor', 'books', 'reading', 'friendship', 'friends',
+    'truth', 'simile', 'music', 'change', 'world', 'thinking', 'choices', 'success',
+]
+WORDS = ('the world we have made is a process of our thinking it cannot be changed without '
+         'changing our life love books music truth friends reading success choices').split()
+
+def generate_quotes(count=100, seed=0):
+    """
+    Generates the quote corpus of the stand-in: deterministic text, authors and tags.
+
+    The first quote is Albert Einstein's only 'music' quote, as on the live site.
+
+    Args:
+        count (int): Number of quotes.
+        seed (int): Random seed.
+
+    Returns:
+        list: Dictionaries with 'text', 'author' and 'tags'.
+    """
+    rng = random.Random(seed)
+    quotes = [{
+        'text': "“If I were not a physicist, I would probably be a musician. I often think in music.”",
+        'author': 'Albert Einstein',
+        'tags': ['music'],
+    }]
+    while len(quotes) < count:
+        author = rng.choice(AUTHORS)
+        tags = rng.sample([tag for tag in TAGS if author != 'Albert Einstein' or tag != 'music'], rng.randint(1, 4))
+        words = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(8, 40)))
+        quotes.append({'text': f"“{words.capitalize()} ({len(quotes)}).”", 'author': author, 'tags': tags})
+    return quotes
+
+def generate_books(seed=0):
+    """
+    Generates the book catalogue of the stand-in.
+
+    Args:
+        seed (int): Random seed.
+
+    Returns:
+        tuple: (categories, books). categories is a list of (name, slug, book ids);
+        books maps the product slug of each book to its fields.
+    """
+    rng = random.Random(seed)
+    categories = []
+    books = {}
+    for index, (name, count) in enumerate(CATEGORIES):
+        slug = f"{name.lower().replace(' ', '-')}_{index + 2}"
+        ids = []
+        for _ in range(count):
+            number = len(books) + 1
+            title = f"{name} Volume {len(ids) + 1}"
+            product = f"{title.lower().replace(' ', '-')}_{number}"
+            books[product] = {
+                'title': title,
+                'category': name,
+                'category_slug': slug,
+                'upc': f"{rng.getrandbits(64):016x}",
+                'price': f"{rng.uniform(10, 60):.2f}",
+                'available': rng.randint(1, 22),
+                'rating': rng.randint(1, 5),
+                'description': f"The {title} of the stand-in catalogue. " * 3,
+            }
+            ids.append(product)
+        categories.append((name, slug, ids))
+    return categories, books
+
+def api_item(item):
+    """
+    Formats a quote of the corpus the way the JSON API serves it.
+
+    Args:
+        item (dict): The quote, with 'text', 'author' and 'tags'.
+
+    Returns:
+        dict: The quote with its author as an object.
+    """
+    slug = item['author'].replace('.', '').replace(' ', '-')
+    return {
+        'author': {'goodreads_link': f"/author/show/{slug}", 'name': item['author'], 'slug': slug},
+        'tags': item['tags'],
+        'text': item['text'],
+    }
+
+class StandinSite:
+    """
+    Local stand-in for books.toscrape.com and quotes.toscrape.com, for offline benchmarks.
+
+    The books catalogue is served under /books/ and the quotes site under
+    /quotes/ (quote pages, /random, the JavaScript-rendered /js pages, the
+    /api/quotes JSON API behind the /scroll page, the login form and the
+    search.aspx ViewState form), with generated pages that the scrapers parse
+    like the live ones. Every response is delayed by `latency` seconds plus or minus
+    up to `jitter`, and answered with a 503 with probability `error_rate`.
+    The service time of every request is recorded (see stats).
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, jitter=0.0, error_rate=0.0, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.categories, self.books = generate_books(seed)
+        self.quotes = generate_quotes(seed=seed)
+        self.sessions = set()
+        self.viewstate_generation = 0
+        self.records = []
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), StandinHandler)
+        self.server.daemon_threads = True
+        self.server.site = self
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    @property
+    def books_url(self):
+        return self.base_url + 'books/'
+
+    @property
+    def quotes_url(self):
+        return self.base_url + 'quotes/'
+
+    def start(self):
+        """Serves requests from a background thread."""
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def random(self):
+        with self._lock:
+            return self.rng.random()
+
+    def record(self, path, status, seconds, size):
+        with self._lock:
+            self.records.append((path, status, seconds, size))
+
+    def reset_stats(self):
+        with self._lock:
+            self.records = []
+
+    def stats(self):
+        """
+        Summarizes the requests served since the last reset_stats.
+
+        Returns:
+            dict: 'requests', 'errors' (5xx), 'bytes' and the 'p50' and 'p99' service times in seconds.
+        """
+        with self._lock:
+            records = list(self.records)
+        times = sorted(seconds for _, _, seconds, _ in records)
+
+        def percentile(fraction):
+            return times[min(len(times) - 1, int(fraction * len(times)))] if times else 0.0
+
+        return {
+            'requests': len(records),
+            'errors': sum(status >= 500 for _, status, _, _ in records),
+            'bytes': sum(size for _, _, _, size in records),
+            'p50': percentile(0.5),
+            'p99': percentile(0.99),
+        }
+
+    def expire_sessions(self):
+        """Logs every client out, as when the server-side sessions expire."""
+        with self._lock:
+            self.sessions.clear()
+
+    def rotate_viewstate(self):
+        """Invalidates every __VIEWSTATE handed out so far."""
+        with self._lock:
+            self.viewstate_generation += 1
+
+class StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately; without TCP_NODELAY every
+    # keep-alive response would wait for the client's delayed ACK
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def site(self):
+        return self.server.site
+
+    def do_GET(self):
+        self._serve('GET')
+
+    def do_POST(self):
+        self._serve('POST')
+
+    def _serve(self, method):
+        started = time.perf_counter()
+        length = int(self.headers.get('Content-Length') or 0)
+        form = {name: values[0] for name, values in parse_qs(self.rfile.read(length).decode('utf-8')).items()}
+        path, query = urlsplit(self.path)[2:4]
+        # Query parameters (?page=N of the JSON API) are read like form fields
+        form = {**{name: values[0] for name, values in parse_qs(query).items()}, **form}
+
+        delay = self.site.latency + (self.site.random() * 2 - 1) * self.site.jitter
+        if delay > 0:
+            time.sleep(delay)
+        if self.site.random() < self.site.error_rate:
+            status, headers, body = 503, {}, "<html><body>Service Unavailable</body></html>"
+        elif path.startswith('/books/'):
+            status, headers, body = self._books(path[len('/books/'):])
+        elif path.startswith('/quotes/'):
+            status, headers, body = self._quotes(method, path[len('/quotes/'):], form)
+        else:
+            status, headers, body = 404, {}, "<html><body>Not found</body></html>"
+
+        content = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', headers.pop('Content-Type', 'text/html; charset=utf-8'))
+        self.send_header('Content-Length', str(len(content)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(content)
+        self.site.record(path, status, time.perf_counter() - started, len(content))
+
+    # books.toscrape.com
+
+    def _books(self, path):
+        if path in ('', 'index.html'):
+            links = ''.join(
+                f'<li><a href="catalogue/category/books/{slug}/index.html">\n    {name}\n</a></li>'
+                for name, slug, _ in self.site.categories
+            )
+            return 200, {}, (
+                '<html><body><div class="side_categories"><ul class="nav nav-list"><li>'
+                f'<a href="catalogue/category/books_1/index.html">Books</a><ul>{links}</ul>'
+                '</li></ul></div></body></html>'
+            )
+
+        parts = path.split('/')
+        if len(parts) == 5 and parts[:3] == ['catalogue', 'category', 'books']:
+            return self._category_page(parts[3], parts[4])
+        if len(parts) == 3 and parts[0] == 'catalogue' and parts[2] == 'index.html' and parts[1] in self.site.books:
+            return self._product_page(self.site.books[parts[1]])
+        return 404, {}, "<html><body>Not found</body></html>"
+
+    def _category_page(self, slug, page):
+        category = next((c for c in self.site.categories if c[1] == slug), None)
+        if category is None:
+            return 404, {}, "<html><body>Not found</body></html>"
+        _, _, ids = category
+        pages = max(1, -(-len(ids) // BOOKS_PER_PAGE))
+        if page == 'index.html':
+            number = 1
+        elif page.startswith('page-') and page.endswith('.html') and page[5:-5].isdigit():
+            number = int(page[5:-5])
+        else:
+            number = 0
+        if not 1 <= number <= pages:
+            return 404, {}, "<html><body>Not found</body></html>"
+
+        articles = []
+        for product in ids[(number - 1) * BOOKS_PER_PAGE:number * BOOKS_PER_PAGE]:
+            book = self.site.books[product]
+            title = html.escape(book['title'])
+            articles.append(
+                f'<li><article class="product_pod"><p class="star-rating {RATING_WORDS[book["rating"] - 1]}"></p>'
+                f'<h3><a href="../../../{product}/index.html" title="{title}">{title}</a></h3>'
+                f'<div class="product_price"><p class="price_color">£{book["price"]}</p>'
+                '<p class="instock availability">In stock</p></div></article></li>'
+            )
+        pager = ''
+        if pages > 1:
+            pager = f'<ul class="pager"><li class="current">\n    Page {number} of {pages}\n</li>'
+            if number < pages:
+                pager += f'<li class="next"><a href="page-{number + 1}.html">next</a></li>'
+            pager += '</ul>'
+        return 200, {}, f'<html><body><ol class="row">{"".join(articles)}</ol>{pager}</body></html>'
+
+    def _product_page(self, book):
+        title = html.escape(book['title'])
+        availability = f"In stock ({book['available']} available)"
+        rows = [
+            ('UPC', book['upc']), ('Product Type', 'Books'),
+            ('Price (excl. tax)', f"£{book['price']}"), ('Price (incl. tax)', f"£{book['price']}"),
+            ('Tax', '£0.00'), ('Availability', availability), ('Number of reviews', '0'),
+        ]
+        table = ''.join(f'<tr><th>{name}</th><td>{value}</td></tr>' for name, value in rows)
+        return 200, {}, (
+            '<html><body><ul class="breadcrumb"><li><a href="../../index.html">Home</a></li>'
+            '<li><a href="../category/books_1/index.html">Books</a></li>'
+            f'<li><a href="../category/books/{book["category_slug"]}/index.html">{book["category"]}</a></li>'
+            f'<li class="active">{title}</li></ul>'
+            f'<div class="col-sm-6 product_main"><h1>{title}</h1><p class="price_color">£{book["price"]}</p>'
+            f'<p class="instock availability">{availability}</p>'
+            f'<p class="star-rating {RATING_WORDS[book["rating"] - 1]}"></p></div>'
+            '<div id="product_description" class="sub-header"><h2>Product Description</h2></div>'
+            f'<p>{html.escape(book["description"])}</p>'
+            f'<table class="table table-striped">{table}</table></body></html>'
+        )
+
+    # quotes.toscrape.com
+
+    def _logged_in(self):
+        cookie = SimpleCookie(self.headers.get('Cookie', ''))
+        return 'session' in cookie and cookie['session'].value in self.site.sessions
+
+    def _quotes_page(self, quotes, next_href=None):
+        header = '<a href="/quotes/logout">Logout</a>' if self._logged_in() else '<a href="/quotes/login">Login</a>'
+        items = []
+        for item in quotes:
+            tags = ''.join(f'<a class="tag" href="/quotes/tag/{quote(tag)}/page/1/">{html.escape(tag)}</a>'
+                           for tag in item['tags'])
+            items.append(
+                f'<div class="quote" itemscope><span class="text" itemprop="text">{html.escape(item["text"])}</span>'
+                f'<span>by <small class="author" itemprop="author">{html.escape(item["author"])}</small></span>'
+                f'<div class="tags">Tags: {tags}</div></div>'
+            )
+        pager = ''
+        if next_href:
+            pager = f'<nav><ul class="pager"><li class="next"><a href="{next_href}">Next <span>&rarr;</span></a></li></ul></nav>'
+        return f'<html><body><div class="header-box"><p>{header}</p></div>{"".join(items) or "No quotes found!"}{pager}</body></html>'
+
+    def _quotes(self, method, path, form):
+        quotes = self.site.quotes
+        if path == '' or path.startswith('page/'):
+            number = int(path.split('/')[1]) if path else 1
+            page = quotes[(number - 1) * QUOTES_PER_PAGE:number * QUOTES_PER_PAGE]
+            next_href = f'/quotes/page/{number + 1}/' if number * QUOTES_PER_PAGE < len(quotes) else None
+            return 200, {}, self._quotes_page(page, next_href)
+        if path == 'random':
+            return 200, {}, self._quotes_page([quotes[int(self.site.random() * len(quotes))]])
+        if path == 'api/quotes':
+            return self._api_quotes(form.get('page', '1'))
+        if path == 'js/' or path.startswith('js/page/'):
+            number = int(path.split('/')[2]) if path != 'js/' else 1
+            page = quotes[(number - 1) * QUOTES_PER_PAGE:number * QUOTES_PER_PAGE]
+            next_href = f'/quotes/js/page/{number + 1}/' if number * QUOTES_PER_PAGE < len(quotes) else None
+            return 200, {}, self._js_page(page, next_href)
+        if path == 'scroll':
+            return 200, {}, SCROLL_PAGE
+        if path == 'login' and method == 'GET':
+            return 200, {}, (
+                '<html><body><form action="/quotes/login" method="post">'
+                f'<input type="hidden" name="csrf_token" value="{secrets.token_hex(16)}">'
+                '<input type="text" name="username"><input type="password" name="password">'
+                '<input type="submit" value="Login"></form></body></html>'
+            )
+        if path == 'login':
+            if not form.get('csrf_token') or not form.get('username'):
+                return 200, {}, self._quotes_page([])
+            token = secrets.token_hex(16)
+            with self.site._lock:
+                self.site.sessions.add(token)
+            return 302, {'Location': '/quotes/', 'Set-Cookie': f'session={token}; Path=/'}, ''
+        if path == 'search.aspx':
+            return 200, {}, self._search_form(None, None)
+        if path == 'filter.aspx' and method == 'POST':
+            return self._filter(form)
+        return 404, {}, "<html><body>Not found</body></html>"
+
+    def _api_quotes(self, number):
+        quotes = self.site.quotes
+        try:
+            number = int(number)
+        except ValueError:
+            return 400, {}, "<html><body>Bad page number</body></html>"
+        page = quotes[(number - 1) * QUOTES_PER_PAGE:number * QUOTES_PER_PAGE] if number > 0 else []
+        body = json.dumps({
+            'has_next': number * QUOTES_PER_PAGE < len(quotes),
+            'page': number,
+            'quotes': [api_item(item) for item in page],
+            'tag': None,
+            'top_ten_tags': [],
+        })
+        return 200, {'Content-Type': 'application/json'}, body
+
+    def _js_page(self, quotes, next_href=None):
+        # As on the live site, the quotes are only in the script, rendered by the browser
+        data = json.dumps([api_item(item) for item in quotes], indent=4, ensure_ascii=False).replace('</', '<\\/')
+        pager = ''
+        if next_href:
+            pager = f'<nav><ul class="pager"><li class="next"><a href="{next_href}">Next <span>&rarr;</span></a></li></ul></nav>'
+        return ('<html><body><div class="container"><script>\n'
+                f'    var data = {data};\n'
+                f'{RENDER_SCRIPT}</script>{pager}</div></body></html>')
+
+    def _viewstate(self, author):
+        state = f"{self.site.viewstate_generation}|{author or ''}"
+        return base64.b64encode(state.encode('utf-8')).decode('ascii')
+
+    def _search_form(self, author, tags):
+        authors = sorted({item['author'] for item in self.site.quotes})
+        options = ''.join(
+            f'<option value="{html.escape(name)}"{" selected" if name == author else ""}>{html.escape(name)}</option>'
+            for name in authors
+        )
+        form = (f'<form action="/quotes/filter.aspx" method="post"><select name="author" id="author">'
+                f'<option>----------</option>{options}</select>')
+        if tags is not None:
+            form += ('<select name="tag" id="tag"><option>----------</option>'
+                     + ''.join(f'<option value="{html.escape(tag)}">{html.escape(tag)}</option>' for tag in tags)
+                     + '</select>')
+        form += (f'<input type="hidden" name="__VIEWSTATE" value="{self._viewstate(author)}">'
+                 '<input type="submit" name="submit_button" value="Search"></form>')
+        return f'<html><body>{form}</body></html>'
+
+    def _filter(self, form):
+        try:
+            generation, _ = base64.b64decode(form.get('__VIEWSTATE', '')).decode('utf-8').split('|', 1)
+            valid = int(generation) == self.site.viewstate_generation
+        except ValueError:
+            valid = False
+        if not valid:
+            return 500, {}, "<html><body>Invalid postback or callback argument.</body></html>"
+
+        author = form.get('author', '')
+        by_author = [item for item in self.site.quotes if item['author'] == author]
+        tags = sorted({tag for item in by_author for tag in item['tags']})
+        page = self._search_form(author, tags)
+        tag = form.get('tag', '')
+        if form.get('submit_button') and not tag.startswith('---'):
+            results = ''.join(
+                f'<div class="quote"><span class="content">{html.escape(item["text"])}</span><br>'
+                f'<span class="author">{html.escape(item["author"])}</span><br>'
+                f'<span class="tag">{html.escape(tag)}</span></div>'
+                for item in by_author if tag in item['tags']
+            )
+            page = page.replace('</body>', f'{results}</body>')
+        return 200, {}, page
+
+def main():
+    """
+    Runs the stand-in server in the foreground.
+
+    Args:
+        None
+
+    Returns:
+        None
+    """
+    parser = argparse.ArgumentParser(description="Local stand-in for books.toscrape.com and quotes.toscrape.com.")
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency', type=float, default=0.0, help="Delay added to every response, in seconds.")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Random variation of the delay, in seconds.")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of requests answered with a 503.")
+    args = parser.parse_args()
+
+    site = StandinSite(port=args.port, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate)
+    print(f"Books:  {site.books_url}\nQuotes: {site.quotes_url}")
+    try:
+        site.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
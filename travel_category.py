@@ -1,28 +1,25 @@
-import requests
-from bs4 import BeautifulSoup
+import sys
 
-# Example category URL: Travel
-category_url = "https://books.toscrape.com/catalogue/category/books/travel_2/index.html"
+from extractors import extract_books, parse_html
+from http_client import create_session
 
-# Fetch the HTML content of the category page
-response = requests.get(category_url)
+# Example category URL: Travel (another category page can be given on the command line)
+category_url = sys.argv[1] if len(sys.argv) > 1 else "https://books.toscrape.com/catalogue/category/books/travel_2/index.html"
+
+# Fetch the HTML content of the category page (served from the on-disk cache when fresh)
+response = create_session().get(category_url)
 
 # Step 1: Check if the request was successful
 if response.status_code == 200:
-    # Parse the HTML using 'html.parser' with explicit encoding
-    response.encoding = 'utf-8'  # Set the correct encoding
-    soup = BeautifulSoup(response.text, 'html.parser')
+    # Parse the raw bytes with lxml (the page is UTF-8)
+    tree = parse_html(response.content)
 
     # Step 2: Find all book elements
-    books = soup.find_all('article', class_='product_pod')
+    books = extract_books(tree)
 
     # Step 3: Extract and print the title and price for each book
-    for book in books:
-        # Extract the title of the book
-        title = book.h3.a['title']
-
-        # Extract the price of the book and sanitize it
-        price_text = book.find('p', class_='price_color').text.strip()
+    for title, price_text in books:
+        # Sanitize the price of the book
         price_text = price_text.encode('ascii', 'ignore').decode('ascii')  # Remove any non-ASCII characters
         price = float(price_text.replace('£', '').strip())  # Remove the "£" symbol and convert to float
 